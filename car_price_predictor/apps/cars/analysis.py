@@ -0,0 +1,276 @@
+"""
+Análisis exploratorio de tbl_auto_raw_taller calculado en PostgreSQL
+
+Cada resumen del reporte de notebooks/01_analisis_exploratorio.py es una
+consulta agregada (COUNT, GROUP BY, percentile_cont, width_bucket): solo
+viajan los resultados, no las filas, así que el tiempo y la memoria del
+análisis no dependen del tamaño de la tabla.
+
+Las funciones reciben una conexión DB-API de PostgreSQL: la de Django o la
+de psycopg2/SQLAlchemy (engine.raw_connection()) en los scripts.
+"""
+
+import pandas as pd
+
+from .export import EXPORT_COLUMNS
+
+
+TABLE = 'tbl_auto_raw_taller'
+
+# Columnas categóricas del modelo (apps/predictor/ml INPUT_FIELDS sin year)
+CATEGORY_COLUMNS = ['brand', 'fuel', 'transmission', 'location', 'subcategory']
+
+# Índice de pandas.Series.describe(), para imprimir igual que antes
+DESCRIBE_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+def _column(name):
+    """Valida un nombre de columna antes de interpolarlo en el SQL"""
+    if name not in EXPORT_COLUMNS:
+        raise ValueError(f"Columna desconocida: '{name}'")
+    return name
+
+
+def query_frame(connection, sql, params=None):
+    """Ejecuta una consulta y devuelve el resultado como DataFrame"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params or {})
+        columns = [col[0] for col in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+def table_overview(connection):
+    """
+    Filas, columnas con su tipo y faltantes por columna
+
+    Returns:
+        dict: rows, columns (DataFrame con column, data_type, missing, missing_pct)
+    """
+    types = query_frame(
+        connection,
+        "SELECT column_name AS column, data_type FROM information_schema.columns "
+        "WHERE table_name = %(table)s ORDER BY ordinal_position",
+        {'table': TABLE},
+    )
+    counts = ', '.join(f'COUNT({_column(col)}) AS {col}' for col in types['column'] if col in EXPORT_COLUMNS)
+    row = query_frame(connection, f'SELECT COUNT(*) AS rows, {counts} FROM {TABLE}').iloc[0]
+
+    rows = int(row['rows'])
+    types = types[types['column'].isin(EXPORT_COLUMNS)].reset_index(drop=True)
+    types['missing'] = [rows - int(row[col]) for col in types['column']]
+    types['missing_pct'] = types['missing'] / rows * 100 if rows else 0.0
+    return {'rows': rows, 'columns': types}
+
+
+def price_summary(connection):
+    """
+    Estadísticas del precio (mismas que pandas describe) en una sola pasada
+
+    Returns:
+        pd.Series: count, mean, std, min, 25%, 50%, 75%, max
+    """
+    row = query_frame(connection, f"""
+        SELECT COUNT(price), AVG(price), STDDEV_SAMP(price), MIN(price),
+               percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY price),
+               MAX(price)
+        FROM {TABLE}
+        WHERE price IS NOT NULL
+    """).iloc[0].tolist()
+    count, mean, std, minimum, quartiles, maximum = row
+    values = [count, mean, std, minimum, *(quartiles or [None] * 3), maximum]
+    return pd.Series([float(v) if v is not None else float('nan') for v in values],
+                     index=DESCRIBE_INDEX, name='price')
+
+
+def value_counts(connection, column, limit=None, by_value=False):
+    """
+    Autos por valor de una columna (sin nulos, como pandas value_counts)
+
+    Args:
+        limit (int): Solo los primeros valores
+        by_value (bool): Ordenar por valor descendente en vez de por cantidad
+
+    Returns:
+        pd.Series: Cantidad indexada por valor
+    """
+    column = _column(column)
+    order = f'{column} DESC' if by_value else f'count DESC, {column}'
+    frame = query_frame(connection, f"""
+        SELECT {column}, COUNT(*) AS count
+        FROM {TABLE}
+        WHERE {column} IS NOT NULL
+        GROUP BY {column}
+        ORDER BY {order}
+        {'LIMIT %(limit)s' if limit else ''}
+    """, {'limit': limit})
+    return frame.set_index(column)['count'].rename('count')
+
+
+def price_by(connection, column, limit=None, by_value=False):
+    """
+    Precio promedio, mediana y cantidad por valor de una columna
+
+    Args:
+        by_value (bool): Ordenar por valor descendente en vez de por precio promedio
+
+    Returns:
+        pd.DataFrame: mean, median, count indexado por valor
+    """
+    column = _column(column)
+    order = f'{column} DESC' if by_value else 'mean DESC'
+    frame = query_frame(connection, f"""
+        SELECT {column},
+               AVG(price)::float AS mean,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY price) AS median,
+               COUNT(*) AS count
+        FROM {TABLE}
+        WHERE price IS NOT NULL AND {column} IS NOT NULL
+        GROUP BY {column}
+        ORDER BY {order}
+        {'LIMIT %(limit)s' if limit else ''}
+    """, {'limit': limit})
+    return frame.set_index(column)
+
+
+def price_histogram(connection, buckets=20):
+    """
+    Histograma del precio en intervalos de igual ancho (width_bucket)
+
+    Returns:
+        pd.DataFrame: low, high, count por intervalo (solo los que tienen autos)
+    """
+    return query_frame(connection, f"""
+        WITH bounds AS (
+            SELECT MIN(price) AS low, MAX(price) AS high FROM {TABLE} WHERE price IS NOT NULL
+        ),
+        bucketed AS (
+            -- El máximo cae en el intervalo buckets + 1: se junta con el último
+            SELECT LEAST(width_bucket(price, low, high, %(buckets)s), %(buckets)s) AS bucket,
+                   low, (high - low) / %(buckets)s AS width
+            FROM {TABLE}, bounds
+            WHERE price IS NOT NULL AND high > low
+        )
+        SELECT (low + (bucket - 1) * width)::float AS low,
+               (low + bucket * width)::float AS high,
+               COUNT(*) AS count
+        FROM bucketed
+        GROUP BY bucket, low, width
+        ORDER BY bucket
+    """, {'buckets': buckets})
+
+
+def feature_summary(connection):
+    """
+    Valores distintos de las columnas del modelo, rango de año y correlación año-precio
+
+    Returns:
+        dict: distinct (dict por columna), year_min, year_max, year_price_corr
+    """
+    distinct = ', '.join(f'COUNT(DISTINCT {col}) AS {col}' for col in CATEGORY_COLUMNS)
+    row = query_frame(connection, f"""
+        SELECT {distinct}, MIN(year) AS year_min, MAX(year) AS year_max,
+               CORR(year, price) FILTER (WHERE price IS NOT NULL) AS year_price_corr
+        FROM {TABLE}
+    """).iloc[0]
+    return {
+        'distinct': {col: int(row[col]) for col in CATEGORY_COLUMNS},
+        'year_min': int(row['year_min']) if pd.notna(row['year_min']) else None,
+        'year_max': int(row['year_max']) if pd.notna(row['year_max']) else None,
+        'year_price_corr': float(row['year_price_corr']) if pd.notna(row['year_price_corr']) else float('nan'),
+    }
+
+
+def exploratory_summary(connection):
+    """
+    Todos los resúmenes del reporte exploratorio
+
+    Returns:
+        dict: Resultados agregados (ver render_report)
+    """
+    return {
+        'overview': table_overview(connection),
+        'price': price_summary(connection),
+        'brands': value_counts(connection, 'brand', limit=15),
+        'years': value_counts(connection, 'year', limit=10, by_value=True),
+        'fuels': value_counts(connection, 'fuel'),
+        'transmissions': value_counts(connection, 'transmission'),
+        'locations': value_counts(connection, 'location', limit=10),
+        'price_by_brand': price_by(connection, 'brand', limit=10),
+        'price_by_year': price_by(connection, 'year', limit=10, by_value=True)['mean'],
+        'price_histogram': price_histogram(connection),
+        'features': feature_summary(connection),
+    }
+
+
+def render_report(summary, write=print):
+    """Imprime el reporte exploratorio a partir de exploratory_summary"""
+    def section(title):
+        write("\n" + "=" * 80)
+        write(title)
+        write("=" * 80)
+
+    overview = summary['overview']
+    columns = overview['columns']
+    price = summary['price']
+    features = summary['features']
+    rows = overview['rows']
+    with_price = int(price['count'])
+
+    section("1. INFORMACIÓN GENERAL DEL DATASET")
+    write(f"\nDimensiones: {rows} filas x {len(columns)} columnas")
+    write(f"\nColumnas: {list(columns['column'])}")
+    write("\nTipos de datos:")
+    write(columns.set_index('column')['data_type'].to_string())
+
+    section("2. DATOS FALTANTES")
+    missing = columns[columns['missing'] > 0].rename(columns={
+        'column': 'Columna', 'missing': 'Faltantes', 'missing_pct': 'Porcentaje',
+    })
+    write(missing[['Columna', 'Faltantes', 'Porcentaje']].to_string())
+
+    section("3. ANÁLISIS DE LA VARIABLE OBJETIVO: PRECIO")
+    write(f"\nRegistros con precio: {with_price} de {rows}")
+    write(f"Registros sin precio: {rows - with_price}")
+    write("\nEstadísticas del precio:")
+    write(price.to_string())
+    write("\nHistograma del precio:")
+    for bucket in summary['price_histogram'].itertuples():
+        write(f"  ${bucket.low:>10,.0f} - ${bucket.high:>10,.0f}: {bucket.count}")
+
+    section("4. DISTRIBUCIÓN POR MARCA (Top 15)")
+    write(summary['brands'].to_string())
+    section("5. DISTRIBUCIÓN POR AÑO")
+    write(summary['years'].to_string())
+    section("6. DISTRIBUCIÓN POR TIPO DE COMBUSTIBLE")
+    write(summary['fuels'].to_string())
+    section("7. DISTRIBUCIÓN POR TRANSMISIÓN")
+    write(summary['transmissions'].to_string())
+    section("8. DISTRIBUCIÓN POR UBICACIÓN (Top 10)")
+    write(summary['locations'].to_string())
+
+    section("9. PRECIO PROMEDIO POR MARCA (Top 10 marcas más caras)")
+    write(summary['price_by_brand'].to_string())
+    section("10. PRECIO PROMEDIO POR AÑO")
+    write(summary['price_by_year'].to_string())
+
+    section("11. CORRELACIÓN CON EL PRECIO")
+    corr = features['year_price_corr']
+    write(pd.DataFrame([[1.0, corr], [corr, 1.0]], index=['year', 'price'], columns=['year', 'price']).to_string())
+
+    distinct = features['distinct']
+    section("12. RESUMEN PARA EL MODELO DE ML")
+    write(f"""
+Features disponibles para el modelo:
+- brand: {distinct['brand']} categorías únicas
+- year: Rango {features['year_min']} - {features['year_max']}
+- fuel: {distinct['fuel']} tipos
+- transmission: {distinct['transmission']} tipos
+- location: {distinct['location']} ubicaciones
+- subcategory: {distinct['subcategory']} subcategorías
+
+Variable objetivo:
+- price: {with_price} registros válidos ({with_price / rows * 100 if rows else 0:.1f}%)
+- Rango: ${price['min']:,.0f} - ${price['max']:,.0f}
+- Promedio: ${price['mean']:,.0f}
+- Mediana: ${price['50%']:,.0f}
+""")
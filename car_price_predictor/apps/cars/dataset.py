@@ -0,0 +1,171 @@
+"""
+Dataset Parquet particionado con los autos de cada scraping
+
+Cada ScrapingJob completado escribe los autos que cargó en una partición:
+
+    <dataset>/scrape_date=AAAA-MM-DD/job_id=N/part-0.parquet
+
+El análisis y el entrenamiento leen el dataset en vez de la tabla de
+producción: solo se abren las particiones dentro del rango pedido (poda por
+scrape_date y job_id, sin leer los archivos) y solo las columnas pedidas.
+
+Un auto que aparece en varios scrapings está en varias particiones;
+read_dataset(latest=True) deja la versión más reciente de cada id, que es
+el estado de tbl_auto_raw_taller.
+
+La lectura no depende de Django (la usan los scripts de notebooks/); la
+escritura recibe la conexión de Django. Requiere pyarrow.
+"""
+
+import os
+import re
+from datetime import date
+
+from .export import (
+    CHUNK_SIZE, EXPORT_COLUMNS, ExportError, build_export_query, require_pyarrow, use_job_window,
+    write_parquet,
+)
+
+
+DEFAULT_DATASET_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'scrapes'
+)
+PART_FILE = 'part-0.parquet'
+PARTITION_COLUMNS = ('scrape_date', 'job_id')
+
+_DATE_DIR = re.compile(r'^scrape_date=(\d{4}-\d{2}-\d{2})$')
+_JOB_DIR = re.compile(r'^job_id=(\d+)$')
+
+
+def dataset_dir():
+    """Directorio del dataset (CARS_DATASET_DIR o data/scrapes del proyecto)"""
+    return os.path.abspath(os.getenv('CARS_DATASET_DIR') or DEFAULT_DATASET_DIR)
+
+
+def partition_path(root, scrape_date, job_id):
+    """Archivo Parquet de la partición de un job"""
+    return os.path.join(root, f'scrape_date={scrape_date.isoformat()}', f'job_id={job_id}', PART_FILE)
+
+
+def write_job_partition(connection, job, root=None, chunk_size=CHUNK_SIZE):
+    """
+    Escribe la partición de un ScrapingJob con los autos que cargó
+
+    Son los autos que el job guardó en cars_scrapingjoblisting (misma
+    selección que export_cars --job). La partición se reemplaza si ya
+    existía.
+
+    Args:
+        connection: Conexión de Django (PostgreSQL)
+        job (ScrapingJob): Job completado
+
+    Returns:
+        tuple: (ruta del archivo, filas escritas)
+
+    Raises:
+        ExportError: Si falta pyarrow o el job es anterior a
+            cars_scrapingjoblisting y ya no es el último
+    """
+    from django.utils import timezone
+
+    require_pyarrow()
+    job_window = use_job_window(job)
+    root = root or dataset_dir()
+    path = partition_path(root, timezone.localtime(job.started_at).date(), job.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sql, params = build_export_query(job=job, job_window=job_window)
+    return path, write_parquet(connection, path, sql, params, chunk_size)
+
+
+def list_partitions(root=None, since=None, until=None, job_ids=None):
+    """
+    Particiones del dataset dentro de los filtros (solo nombres de directorio)
+
+    Args:
+        since (date): scrape_date >= since
+        until (date): scrape_date <= until
+        job_ids (iterable): Solo estos jobs
+
+    Returns:
+        list: (scrape_date, job_id, ruta) ordenadas por fecha y job
+    """
+    root = root or dataset_dir()
+    if not os.path.isdir(root):
+        return []
+    job_ids = set(job_ids) if job_ids is not None else None
+
+    partitions = []
+    for date_name in os.listdir(root):
+        match = _DATE_DIR.match(date_name)
+        if not match:
+            continue
+        scrape_date = date.fromisoformat(match.group(1))
+        if (since and scrape_date < since) or (until and scrape_date > until):
+            continue
+        for job_name in os.listdir(os.path.join(root, date_name)):
+            match = _JOB_DIR.match(job_name)
+            if not match or (job_ids is not None and int(match.group(1)) not in job_ids):
+                continue
+            path = os.path.join(root, date_name, job_name, PART_FILE)
+            if os.path.exists(path):
+                partitions.append((scrape_date, int(match.group(1)), path))
+    return sorted(partitions)
+
+
+def has_partitions(root=None):
+    """True si el dataset tiene particiones y pyarrow está instalado"""
+    try:
+        require_pyarrow()
+    except ExportError:
+        return False
+    return bool(list_partitions(root))
+
+
+def read_dataset(root=None, columns=None, since=None, until=None, job_ids=None, latest=True, ids=None):
+    """
+    Lee el dataset como DataFrame
+
+    Las particiones guardan los autos como estaban en cada scraping: un auto
+    retirado después sigue ahí. Para quedarse con los publicados hoy se pasan
+    en ids los activos de tbl_auto_raw_taller.
+
+    Args:
+        columns (list): Columnas a leer (por defecto todas las de la tabla);
+            puede incluir scrape_date y job_id
+        since, until, job_ids: Filtros de partición (ver list_partitions)
+        latest (bool): Dejar solo la versión más reciente de cada auto
+        ids (iterable): Solo estos autos
+
+    Returns:
+        pd.DataFrame: Autos de las particiones seleccionadas
+    """
+    import pandas as pd
+
+    pa, pq = require_pyarrow()
+    import pyarrow.compute as pc
+
+    columns = list(columns or EXPORT_COLUMNS)
+    file_columns = [col for col in columns if col not in PARTITION_COLUMNS]
+    if (latest or ids is not None) and 'id' not in file_columns:
+        file_columns.append('id')
+    if ids is not None:
+        ids = pa.array(list(ids), pa.int64())
+
+    tables = []
+    for scrape_date, job_id, path in list_partitions(root, since, until, job_ids):
+        table = pq.read_table(path, columns=file_columns)
+        if ids is not None:
+            table = table.filter(pc.is_in(table['id'], value_set=ids))
+        if 'scrape_date' in columns:
+            table = table.append_column('scrape_date', pa.array([scrape_date] * table.num_rows, pa.date32()))
+        if 'job_id' in columns:
+            table = table.append_column('job_id', pa.array([job_id] * table.num_rows, pa.int64()))
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame(columns=columns)
+
+    df = pa.concat_tables(tables).to_pandas()
+    if latest:
+        # Las particiones van en orden de fecha: la última aparición de cada id es la más reciente
+        df = df.drop_duplicates('id', keep='last')
+    return df[columns].reset_index(drop=True)
@@ -0,0 +1,298 @@
+"""
+Exportación de tbl_auto_raw_taller en streaming
+
+A diferencia de exportar_csv.py (read_sql de toda la tabla y to_csv de una
+vez), las filas nunca están todas en memoria:
+
+- CSV y CSV comprimido a archivo: COPY ... TO STDOUT escribe directo en el
+  archivo (o en el gzip) desde PostgreSQL.
+- Respuestas HTTP y Parquet: cursor del servidor leído por bloques; cada
+  bloque se escribe (una línea CSV por auto o un row group de Parquet) y se
+  descarta.
+
+Los filtros son por fecha (since/until sobre la columna fecha) y por
+ScrapingJob: los autos que el job guardó en cars_scrapingjoblisting. Los
+jobs anteriores a esa tabla solo tienen la ventana de fecha de su corrida,
+que sirve únicamente para el último job (cada carga posterior mueve fecha
+de los autos que vuelve a ver); use_job_window decide cuál corresponde.
+"""
+
+import codecs
+import csv
+import io
+import os
+import zlib
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+EXPORT_COLUMNS = [
+    'id', 'title', 'link', 'tag', 'image', 'fuel', 'location', 'price', 'brand', 'year',
+    'subcategory', 'transmission', 'advertiser', 'category', 'slug', 'fecha',
+]
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Filas por bloque del cursor del servidor (y por row group de Parquet)
+CHUNK_SIZE = 10000
+
+
+class ExportError(ValueError):
+    """Parámetros de exportación inválidos o dependencia faltante"""
+
+
+def parse_bound(value, end=False):
+    """
+    Fecha o fecha-hora ISO 8601 de un filtro
+
+    Una fecha sin hora cubre el día completo: since=2026-10-01 desde las
+    00:00 y until=2026-10-01 hasta las 23:59:59.
+
+    Raises:
+        ExportError: Si el valor no es una fecha válida
+    """
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            # parse_datetime también acepta 'AAAA-MM-DD' (medianoche): la fecha sola va primero
+            day = parse_date(value)
+            parsed = datetime.combine(day, time.max if end else time.min) if day else parse_datetime(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ExportError(f"Fecha inválida: '{value}'. Usa AAAA-MM-DD o ISO 8601")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def use_job_window(job):
+    """
+    True si los autos del job se eligen por la ventana de fecha de su corrida
+
+    Los jobs que guardaron sus autos en cars_scrapingjoblisting se eligen
+    por job_id. Los anteriores solo tienen la ventana de fecha, que es
+    correcta mientras ningún job posterior haya movido fecha.
+
+    Args:
+        job (ScrapingJob): Job a exportar, o None
+
+    Raises:
+        ExportError: Si el job no tiene autos vistos y no es el último
+    """
+    if job is None or job.listings.exists():
+        return False
+    if type(job).objects.filter(started_at__gt=job.started_at).exists():
+        raise ExportError(
+            f'El ScrapingJob #{job.id} no tiene autos vistos (es anterior a cars_scrapingjoblisting) '
+            'y ya no es el último: sus autos no se pueden reconstruir'
+        )
+    return True
+
+
+def build_export_query(since=None, until=None, job=None, job_window=False):
+    """
+    SELECT de la exportación con los filtros
+
+    Args:
+        since (datetime): Autos con fecha >= since
+        until (datetime): Autos con fecha <= until
+        job (ScrapingJob): Autos vistos por el job
+        job_window (bool): Elegir los autos del job por la ventana de fecha
+            de su corrida (ver use_job_window)
+
+    Returns:
+        tuple: (sql, params) con marcadores %(nombre)s
+    """
+    conditions, params = [], {}
+    if job is not None and job_window:
+        conditions.append('fecha >= %(job_start)s AND fecha <= %(job_end)s')
+        params['job_start'] = job.started_at
+        params['job_end'] = job.completed_at or timezone.now()
+    elif job is not None:
+        conditions.append('id IN (SELECT car_id FROM cars_scrapingjoblisting WHERE job_id = %(job_id)s)')
+        params['job_id'] = job.id
+    if since is not None:
+        conditions.append('fecha >= %(since)s')
+        params['since'] = since
+    if until is not None:
+        conditions.append('fecha <= %(until)s')
+        params['until'] = until
+
+    # Sin ORDER BY: PostgreSQL entrega las filas en el orden del recorrido secuencial
+    sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM tbl_auto_raw_taller"
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    return sql, params
+
+
+def copy_to(connection, file, sql, params):
+    """
+    Escribe el resultado de sql como CSV (con encabezado) en file usando COPY TO STDOUT
+
+    Args:
+        connection: Conexión de Django (PostgreSQL)
+        file: Archivo binario de destino (por ejemplo gzip.open(..., 'wb'))
+
+    Returns:
+        int: Filas exportadas
+    """
+    with connection.cursor() as cursor:
+        # COPY no acepta parámetros: mogrify los escapa en el SQL
+        query = cursor.mogrify(sql, params).decode()
+        cursor.copy_expert(f'COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)', file)
+        return cursor.rowcount
+
+
+def iter_row_chunks(connection, sql, params, chunk_size=CHUNK_SIZE):
+    """Bloques de filas (listas de tuplas) desde un cursor del servidor"""
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+
+def render_csv(row_chunks, compress=False):
+    """
+    CSV en bytes, un fragmento por bloque de filas
+
+    Args:
+        compress (bool): Comprimir en gzip en streaming (un solo miembro gzip)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    # BOM para que Excel abra el archivo en UTF-8 (igual que exportar_csv.py)
+    buffer.write(codecs.BOM_UTF8.decode('utf-8'))
+    writer.writerow(EXPORT_COLUMNS)
+    yield flush()
+    for rows in row_chunks:
+        writer.writerows(rows)
+        yield flush()
+    if compressor:
+        yield compressor.flush()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino de escritura de ParquetWriter que acumula bytes hasta que se los retira"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def require_pyarrow():
+    """
+    Módulos de pyarrow para el formato Parquet
+
+    Returns:
+        tuple: (pyarrow, pyarrow.parquet)
+
+    Raises:
+        ExportError: Si pyarrow no está instalado
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError('El formato parquet requiere pyarrow (pip install pyarrow)')
+    return pa, pq
+
+
+def parquet_schema():
+    """Esquema Arrow de EXPORT_COLUMNS"""
+    pa, _ = require_pyarrow()
+    types = {'id': pa.int64(), 'price': pa.float64(), 'year': pa.int32(), 'fecha': pa.timestamp('us', tz='UTC')}
+    return pa.schema([(col, types.get(col, pa.string())) for col in EXPORT_COLUMNS])
+
+
+def render_parquet(row_chunks):
+    """
+    Parquet en bytes: un row group por bloque de filas
+
+    Raises:
+        ExportError: Si pyarrow no está instalado
+    """
+    pa, pq = require_pyarrow()
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for rows in row_chunks:
+            columns = list(zip(*rows))
+            arrays = {
+                col: [float(value) if value is not None else None for value in values]
+                if col == 'price' else list(values)
+                for col, values in zip(EXPORT_COLUMNS, columns)
+            }
+            writer.write_table(pa.Table.from_pydict(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def write_parquet(connection, path, sql, params, chunk_size=CHUNK_SIZE):
+    """
+    Escribe el resultado de sql en un archivo Parquet (un row group por bloque)
+
+    Escribe en un archivo temporal y lo renombra al terminar, así nunca queda
+    un Parquet a medio escribir en path.
+
+    Returns:
+        int: Filas exportadas
+    """
+    rows = 0
+
+    def counted(chunks):
+        nonlocal rows
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+    tmp_path = f'{path}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            for data in render_parquet(counted(iter_row_chunks(connection, sql, params, chunk_size))):
+                f.write(data)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return rows
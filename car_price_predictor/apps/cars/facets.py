@@ -0,0 +1,217 @@
+"""
+Conteos por faceta para los filtros del listado de autos
+
+Después de cada scraping, build_cube agrupa los autos activos de
+tbl_auto_raw_taller por todas las columnas de FACET_COLUMNS a la vez (un
+solo GROUP BY) y guarda el resultado como un cubo disperso en un .npz:
+
+- codes: una fila por combinación existente, una columna por faceta con
+  el índice del valor en values[faceta]
+- counts: autos de cada combinación
+
+Con unos miles de combinaciones, FacetCube.facet_counts responde cualquier
+combinación de filtros con máscaras y np.bincount en pocos milisegundos,
+sin consultar la base. Cada faceta se cuenta con los filtros de las demás
+(no con el suyo), para que la interfaz muestre cuántos autos suma cada
+opción. Los NULL se guardan como '' (o año 0) y no aparecen como opción.
+
+La lectura no depende de Django; build_cube recibe una conexión DB-API de
+PostgreSQL.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from .partitions import hot_since
+
+
+FACET_COLUMNS = ['brand', 'fuel', 'transmission', 'subcategory', 'location', 'year']
+
+# Facetas de rango (filtro year_min / year_max); las demás se filtran por igualdad
+RANGE_COLUMNS = ['year']
+
+DEFAULT_FACETS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'facets.npz'
+)
+
+CUBE_SQL = """
+SELECT {columns}, COUNT(*)
+FROM tbl_auto_raw_taller
+WHERE is_active AND fecha >= %(since)s
+GROUP BY {groups}
+"""
+
+_cube = None
+_cube_lock = threading.Lock()
+
+
+def _empty(column):
+    """Valor que reemplaza a NULL en una faceta"""
+    return 0 if column in RANGE_COLUMNS else ''
+
+
+def facets_file():
+    """Archivo del cubo (CARS_FACETS_FILE o data/facets.npz del proyecto)"""
+    return os.path.abspath(os.getenv('CARS_FACETS_FILE') or DEFAULT_FACETS_FILE)
+
+
+class FacetCube:
+    """Cubo disperso de conteos de autos por combinación de facetas"""
+
+    def __init__(self, values, codes, counts, built_at=None):
+        """
+        Args:
+            values (dict): Valores ordenados de cada faceta
+            codes (np.ndarray): (combinaciones, facetas) con índices en values
+            counts (np.ndarray): Autos por combinación
+            built_at (str): Fecha ISO de construcción
+        """
+        self.values = values
+        self.codes = codes
+        self.counts = counts
+        self.built_at = built_at
+
+    @classmethod
+    def from_rows(cls, rows, built_at=None):
+        """
+        Cubo a partir de filas (valor de cada faceta..., conteo)
+
+        Returns:
+            FacetCube
+        """
+        rows = list(rows)
+        values, codes = {}, []
+        for position, column in enumerate(FACET_COLUMNS):
+            empty = _empty(column)
+            column_values = np.array([empty if row[position] is None else row[position] for row in rows])
+            uniques, inverse = np.unique(column_values, return_inverse=True)
+            values[column] = uniques
+            codes.append(inverse.astype(np.int32))
+
+        codes = np.column_stack(codes) if rows else np.zeros((0, len(FACET_COLUMNS)), dtype=np.int32)
+        counts = np.array([row[-1] for row in rows], dtype=np.int64)
+        return cls(values, codes, counts, built_at)
+
+    def save(self, path):
+        """Guarda el cubo en un .npz (temporal + rename: los workers nunca leen uno a medias)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                codes=self.codes,
+                counts=self.counts,
+                built_at=np.array(self.built_at or ''),
+                **{f'values_{column}': values for column, values in self.values.items()},
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Carga un cubo guardado con save"""
+        with np.load(path) as data:
+            values = {column: data[f'values_{column}'] for column in FACET_COLUMNS}
+            return cls(values, data['codes'], data['counts'], str(data['built_at']) or None)
+
+    def _mask(self, position, filters):
+        """Combinaciones que cumplen el filtro de una faceta, o None si no se filtra"""
+        column = FACET_COLUMNS[position]
+        values = self.values[column]
+        codes = self.codes[:, position]
+        if column in RANGE_COLUMNS:
+            low, high = filters.get(f'{column}_min'), filters.get(f'{column}_max')
+            if low is None and high is None:
+                return None
+            # values está ordenado: el rango de valores es un rango de códigos
+            start = np.searchsorted(values, low, side='left') if low is not None else 0
+            end = np.searchsorted(values, high, side='right') if high is not None else len(values)
+            return (codes >= start) & (codes < end) & (values[codes] != _empty(column))
+
+        selected = filters.get(column)
+        if not selected:
+            return None
+        wanted = np.flatnonzero(np.isin(values, list(selected)))
+        return np.isin(codes, wanted)
+
+    def facet_counts(self, filters=None):
+        """
+        Total y conteos por faceta para una combinación de filtros
+
+        Args:
+            filters (dict): Valores por faceta (lista de valores aceptados) y
+                year_min / year_max
+
+        Returns:
+            dict: total (autos que cumplen todos los filtros) y facets
+                ({faceta: [(valor, autos), ...]} de mayor a menor, año de más
+                reciente a más antiguo)
+        """
+        filters = filters or {}
+        masks = [self._mask(position, filters) for position in range(len(FACET_COLUMNS))]
+
+        def combined(skip=None):
+            mask = np.ones(len(self.counts), dtype=bool)
+            for position, column_mask in enumerate(masks):
+                if position != skip and column_mask is not None:
+                    mask &= column_mask
+            return mask
+
+        facets = {}
+        for position, column in enumerate(FACET_COLUMNS):
+            mask = combined(skip=position)
+            values = self.values[column]
+            totals = np.bincount(self.codes[mask, position], weights=self.counts[mask], minlength=len(values))
+            present = [
+                (values[i].item(), int(totals[i]))
+                for i in np.flatnonzero(totals) if values[i] != _empty(column)
+            ]
+            if column in RANGE_COLUMNS:
+                present.sort(key=lambda item: item[0], reverse=True)
+            else:
+                present.sort(key=lambda item: (-item[1], item[0]))
+            facets[column] = present
+
+        return {'total': int(self.counts[combined()].sum()), 'facets': facets}
+
+
+def build_cube(connection, now):
+    """
+    Construye el cubo con los autos activos de los últimos meses (mismos que /cars/api/cars/)
+
+    Args:
+        connection: Conexión DB-API de PostgreSQL
+        now (datetime): Fecha de construcción
+
+    Returns:
+        FacetCube
+    """
+    sql = CUBE_SQL.format(
+        columns=', '.join(FACET_COLUMNS),
+        groups=', '.join(str(i) for i in range(1, len(FACET_COLUMNS) + 1)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'since': hot_since(now)})
+        rows = cursor.fetchall()
+    return FacetCube.from_rows(rows, built_at=now.isoformat())
+
+
+def get_cube(path=None):
+    """
+    Cubo cargado en memoria, recargado cuando cambia el archivo
+
+    Returns:
+        FacetCube: o None si todavía no se construyó
+    """
+    global _cube
+    path = path or facets_file()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _cube_lock:
+        if _cube is None or _cube[:2] != (path, mtime):
+            _cube = (path, mtime, FacetCube.load(path))
+        return _cube[2]
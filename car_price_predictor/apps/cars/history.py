@@ -0,0 +1,251 @@
+"""
+Carga de autos con historial de precios
+
+upsert_cars inserta o actualiza los autos de un scraping en
+tbl_auto_raw_taller y, en la misma sentencia, agrega una fila a
+car_price_history por cada auto nuevo o cuyo precio cambió. El precio
+anterior se lee dentro del upsert (las CTE ven la tabla antes del
+UPDATE/INSERT), sin traer los autos a Python. La misma sentencia
+guarda los ids vistos por el ScrapingJob (cars_scrapingjoblisting) y
+reactiva los autos retirados que vuelven a aparecer.
+
+mark_delisted, después de un scraping completo, marca como inactivos los
+autos que el job no vio con un solo anti-join.
+
+El upsert supone un id por auto: con ids repetidos el UPDATE toca todas
+las copias y el historial se duplica. deduplicate_cars (comando
+dedupe_cars) deja la fila más reciente de cada id y mueve las demás a
+tbl_auto_raw_taller_duplicates, sin borrar nada.
+
+Recibe una conexión DB-API de PostgreSQL (la de Django o
+engine.raw_connection() en tasks/load.py); el commit queda a cargo de quien
+llama. No depende de Django.
+"""
+
+
+# Columnas de tbl_auto_raw_taller que vienen del scraping (fecha la pone la carga)
+UPSERT_COLUMNS = [
+    'id', 'title', 'link', 'tag', 'image', 'fuel', 'location', 'price', 'brand', 'year',
+    'subcategory', 'transmission', 'advertiser', 'category', 'slug',
+]
+COLUMN_TYPES = {'id': 'bigint', 'price': 'numeric', 'year': 'integer'}
+
+# Autos por sentencia
+BATCH_SIZE = 1000
+
+# Clave del pg_advisory_xact_lock que serializa las cargas (scrape_cars y
+# tasks/load.py): sin id único, dos cargas simultáneas insertarían el mismo
+# auto nuevo dos veces
+LOAD_LOCK_ID = 48_201_001
+
+# UPDATE + INSERT de los que no existían, en vez de INSERT ... ON CONFLICT:
+# particionada por fecha (ver partitions.py) la tabla no puede tener id
+# único, y un UPDATE sí puede mover el auto a la partición del mes actual
+UPSERT_SQL = """
+WITH incoming ({columns}) AS (
+    VALUES {values}
+),
+previous AS (
+    SELECT c.id, c.price
+    FROM tbl_auto_raw_taller c
+    JOIN incoming USING (id)
+),
+updated AS (
+    UPDATE tbl_auto_raw_taller c
+    SET {updates}, fecha = %(now)s, is_active = true, delisted_at = NULL
+    FROM incoming i
+    WHERE c.id = i.id
+    RETURNING c.id, c.price, false AS inserted
+),
+inserted AS (
+    INSERT INTO tbl_auto_raw_taller ({columns}, fecha)
+    SELECT {columns}, %(now)s FROM incoming i
+    WHERE NOT EXISTS (SELECT 1 FROM previous p WHERE p.id = i.id)
+    RETURNING id, price, true AS inserted
+),
+upserted AS (
+    SELECT * FROM updated
+    UNION ALL
+    SELECT * FROM inserted
+),
+seen AS (
+    INSERT INTO cars_scrapingjoblisting (job_id, car_id)
+    SELECT %(job_id)s, id FROM upserted WHERE %(job_id)s IS NOT NULL
+    ON CONFLICT (job_id, car_id) DO NOTHING
+),
+history AS (
+    INSERT INTO car_price_history (car_id, price, scraping_job_id, observed_at)
+    SELECT u.id, u.price, %(job_id)s, %(now)s
+    FROM upserted u
+    LEFT JOIN previous p ON p.id = u.id
+    WHERE p.id IS NULL OR p.price IS DISTINCT FROM u.price
+    RETURNING 1
+)
+SELECT (SELECT COUNT(*) FROM inserted),
+       (SELECT COUNT(*) FROM updated),
+       (SELECT COUNT(*) FROM history)
+"""
+
+
+def upsert_sql(values):
+    """SQL del upsert con la lista VALUES ya escapada (placeholders %(now)s y %(job_id)s)"""
+    return UPSERT_SQL.format(
+        columns=', '.join(UPSERT_COLUMNS),
+        values=values,
+        updates=', '.join(f'{col} = i.{col}' for col in UPSERT_COLUMNS if col != 'id'),
+    )
+
+
+def listing_rows(df):
+    """
+    Tuplas de UPSERT_COLUMNS desde el DataFrame del transformer
+
+    Sin id no hay auto; si un id se repite gana la última fila (un UPDATE no
+    puede tocar dos veces la misma fila en una sentencia).
+    """
+    df = df.reindex(columns=UPSERT_COLUMNS)
+    df = df[df['id'].notna()].drop_duplicates('id', keep='last')
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+def upsert_cars(connection, df, now, job_id=None, batch_size=BATCH_SIZE):
+    """
+    Inserta o actualiza autos y registra los cambios de precio
+
+    Espera a que termine cualquier otra carga: el lock se libera con el
+    commit o rollback de quien llama.
+
+    Args:
+        connection: Conexión DB-API de PostgreSQL
+        df (pd.DataFrame): Autos transformados (columnas de tbl_auto_raw_taller)
+        now (datetime): Fecha de la carga (fecha del auto y del cambio de precio)
+        job_id (int): ScrapingJob de la carga
+
+    Returns:
+        dict: inserted, updated, price_changes
+    """
+    rows = listing_rows(df)
+    template = '(' + ', '.join(
+        f'%s::{COLUMN_TYPES[col]}' if col in COLUMN_TYPES else '%s' for col in UPSERT_COLUMNS
+    ) + ')'
+
+    totals = {'inserted': 0, 'updated': 0, 'price_changes': 0}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [LOAD_LOCK_ID])
+        for start in range(0, len(rows), batch_size):
+            values = b', '.join(cursor.mogrify(template, row) for row in rows[start:start + batch_size])
+            # Los valores ya están escapados: % literal para el segundo paso de parámetros
+            sql = upsert_sql(values.decode().replace('%', '%%'))
+            cursor.execute(sql, {'now': now, 'job_id': job_id})
+            inserted, updated, changes = cursor.fetchone()
+            totals['inserted'] += inserted
+            totals['updated'] += updated
+            totals['price_changes'] += changes
+    return totals
+
+
+# Un job que vio menos de esta fracción de los autos activos probablemente
+# se cortó: no se retira nada
+MIN_SEEN_RATIO = 0.5
+
+DELIST_SQL = """
+UPDATE tbl_auto_raw_taller c
+SET is_active = false, delisted_at = %(now)s
+WHERE c.is_active
+  AND NOT EXISTS (
+      SELECT 1 FROM cars_scrapingjoblisting s
+      WHERE s.job_id = %(job_id)s AND s.car_id = c.id
+  )
+"""
+
+
+def mark_delisted(connection, job_id, now, min_seen_ratio=MIN_SEEN_RATIO):
+    """
+    Marca como retirados los autos activos que no vio un scraping completo
+
+    Args:
+        job_id (int): ScrapingJob que recorrió todas las páginas
+        now (datetime): Fecha de retiro (delisted_at)
+        min_seen_ratio (float): Mínimo de autos vistos / autos activos
+
+    Returns:
+        int: Autos retirados, o None si el job vio muy pocos autos
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT (SELECT COUNT(*) FROM cars_scrapingjoblisting WHERE job_id = %(job_id)s), "
+            "(SELECT COUNT(*) FROM tbl_auto_raw_taller WHERE is_active)",
+            {'job_id': job_id},
+        )
+        seen, active = cursor.fetchone()
+        if active and seen < min_seen_ratio * active:
+            return None
+        cursor.execute(DELIST_SQL, {'job_id': job_id, 'now': now})
+        return cursor.rowcount
+
+
+DUPLICATES_TABLE = 'tbl_auto_raw_taller_duplicates'
+
+# Conserva la fila más reciente de cada id (a igual fecha, la última escrita)
+# y copia las demás a DUPLICATES_TABLE en la misma sentencia
+DEDUPE_SQL = f"""
+WITH losers AS (
+    DELETE FROM tbl_auto_raw_taller a
+    USING tbl_auto_raw_taller b
+    WHERE a.id = b.id
+      AND (COALESCE(a.fecha, '-infinity'), a.ctid) < (COALESCE(b.fecha, '-infinity'), b.ctid)
+    RETURNING a.*
+)
+INSERT INTO {DUPLICATES_TABLE} SELECT *, %(now)s FROM losers
+"""
+
+
+def count_duplicate_ids(connection):
+    """Filas de tbl_auto_raw_taller que sobran por id repetido"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(id) - COUNT(DISTINCT id) FROM tbl_auto_raw_taller")
+        return cursor.fetchone()[0]
+
+
+def deduplicate_cars(connection, now):
+    """
+    Deja una fila por id en tbl_auto_raw_taller y guarda las demás aparte
+
+    Las filas que se sacan quedan en tbl_auto_raw_taller_duplicates (mismas
+    columnas más deduplicated_at), que se crea si no existe. Bloquea la
+    tabla contra escrituras hasta el commit.
+
+    Args:
+        now (datetime): deduplicated_at de las filas movidas
+
+    Returns:
+        int: Filas movidas
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("LOCK TABLE tbl_auto_raw_taller IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute("SELECT to_regclass(%s) IS NULL", [DUPLICATES_TABLE])
+        if cursor.fetchone()[0]:
+            cursor.execute(
+                f"CREATE TABLE {DUPLICATES_TABLE} (LIKE tbl_auto_raw_taller INCLUDING DEFAULTS, "
+                "deduplicated_at timestamptz NOT NULL)"
+            )
+        cursor.execute(DEDUPE_SQL, {'now': now})
+        return cursor.rowcount
+
+
+def ensure_unique_id(connection):
+    """
+    Crea el índice único por id de tbl_auto_raw_taller si no existe
+
+    No aplica a la tabla particionada (ver partitions.py).
+
+    Returns:
+        bool: True si lo creó
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('tbl_auto_raw_taller_id_uniq') IS NULL")
+        if not cursor.fetchone()[0]:
+            return False
+        cursor.execute("CREATE UNIQUE INDEX tbl_auto_raw_taller_id_uniq ON tbl_auto_raw_taller (id)")
+        return True
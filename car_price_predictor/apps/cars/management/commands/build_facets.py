@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.cars.facets import build_cube, facets_file
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el cubo de conteos por faceta de /cars/api/facets/ (scrape_cars lo hace al terminar)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default='',
+            help='Archivo .npz del cubo (por defecto CARS_FACETS_FILE o data/facets.npz)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['output'] or facets_file()
+        cube = build_cube(connection, timezone.now())
+        cube.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Cubo de facetas: {len(cube.counts)} combinaciones, {int(cube.counts.sum())} autos en {path}'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.cars import history, partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Deja una fila por id en tbl_auto_raw_taller (la más reciente), mueve las demás a '
+        f'{history.DUPLICATES_TABLE} y crea el índice único por id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo contar las filas con id repetido'
+        )
+
+    def handle(self, *args, **options):
+        duplicates = history.count_duplicate_ids(connection)
+        if options['dry_run']:
+            self.stdout.write(f'{duplicates} filas con id repetido')
+            return
+
+        with transaction.atomic():
+            moved = history.deduplicate_cars(connection, timezone.now()) if duplicates else 0
+            # La tabla particionada no admite un índice único solo por id
+            created = not partitions.is_partitioned(connection) and history.ensure_unique_id(connection)
+
+        if moved:
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] {moved} filas con id repetido movidas a {history.DUPLICATES_TABLE}'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('[OK] No hay ids repetidos'))
+        if created:
+            self.stdout.write(self.style.SUCCESS('[OK] Índice único tbl_auto_raw_taller_id_uniq creado'))
@@ -0,0 +1,97 @@
+import codecs
+import gzip
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.cars.export import (
+    CHUNK_SIZE, FORMATS, ExportError, build_export_query, copy_to, parse_bound, use_job_window,
+    write_parquet,
+)
+from apps.cars.models import ScrapingJob
+
+
+class Command(BaseCommand):
+    help = 'Exporta tbl_auto_raw_taller a CSV, CSV comprimido o Parquet sin cargar la tabla en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=list(FORMATS),
+            default='csv',
+            help='Formato de salida (csv, csv.gz o parquet)'
+        )
+        parser.add_argument(
+            '--output',
+            default='',
+            help='Archivo de salida (por defecto datos_autos_neoauto.<formato>)'
+        )
+        parser.add_argument('--since', help='Autos con fecha desde (AAAA-MM-DD o ISO 8601)')
+        parser.add_argument('--until', help='Autos con fecha hasta (AAAA-MM-DD o ISO 8601)')
+        parser.add_argument(
+            '--job',
+            type=int,
+            help='ID de ScrapingJob: autos que vio esa corrida'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Filas por bloque del cursor (y por row group en Parquet)'
+        )
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        output = options['output'] or f'datos_autos_neoauto.{FORMATS[fmt][1]}'
+
+        job = None
+        if options['job'] is not None:
+            try:
+                job = ScrapingJob.objects.get(pk=options['job'])
+            except ScrapingJob.DoesNotExist:
+                raise CommandError(f'No existe el ScrapingJob #{options["job"]}')
+
+        try:
+            sql, params = build_export_query(
+                since=parse_bound(options['since']),
+                until=parse_bound(options['until'], end=True),
+                job=job,
+                job_window=use_job_window(job),
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        start = time.perf_counter()
+        if fmt == 'parquet':
+            try:
+                rows = write_parquet(connection, output, sql, params, options['chunk_size'])
+            except ExportError as e:
+                raise CommandError(str(e))
+        else:
+            rows = self._write_csv(output, fmt, sql, params)
+
+        if rows == 0:
+            self.stdout.write(self.style.WARNING('[WARN] Ningún auto coincide con los filtros'))
+        size_mb = os.path.getsize(output) / 1024 / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] {rows} autos exportados a {output} ({size_mb:.1f} MB) '
+            f'en {time.perf_counter() - start:.1f} segundos'
+        ))
+
+    def _write_csv(self, path, fmt, sql, params):
+        """COPY a un archivo temporal que se renombra al terminar; devuelve las filas exportadas"""
+        tmp_path = f'{path}.tmp'
+        opener = gzip.open if fmt == 'csv.gz' else open
+        try:
+            with opener(tmp_path, 'wb') as f:
+                # BOM para Excel, igual que exportar_csv.py
+                f.write(codecs.BOM_UTF8)
+                rows = copy_to(connection, f, sql, params)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+        return rows
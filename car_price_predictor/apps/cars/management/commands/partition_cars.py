@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.cars import partitions
+
+
+class Command(BaseCommand):
+    help = 'Crea las particiones mensuales de tbl_auto_raw_taller y archiva los meses viejos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convertir tbl_auto_raw_taller en tabla particionada por mes de fecha (una sola vez)'
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=partitions.MONTHS_AHEAD,
+            help=f'Meses siguientes con partición creada (default: {partitions.MONTHS_AHEAD})'
+        )
+        parser.add_argument(
+            '--archive-older-than',
+            type=int,
+            default=None,
+            help='Archivar las particiones anteriores a los últimos N meses'
+        )
+        parser.add_argument(
+            '--detach-only',
+            action='store_true',
+            help='Solo sacar las particiones viejas de la tabla (quedan como tablas sueltas), sin archivar'
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default='',
+            help='Directorio de los archivos .csv.gz (por defecto CARS_ARCHIVE_DIR o data/archive)'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        keep = options['archive_older_than']
+        if keep is not None and keep < partitions.HOT_MONTHS:
+            raise CommandError(
+                f'--archive-older-than debe ser al menos {partitions.HOT_MONTHS} (meses que lee la API)'
+            )
+
+        with transaction.atomic():
+            if options['convert']:
+                if partitions.is_partitioned(connection):
+                    raise CommandError('tbl_auto_raw_taller ya está particionada')
+                try:
+                    result = partitions.convert_to_partitioned(connection, now, options['months_ahead'])
+                except ValueError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(self.style.SUCCESS(
+                    f"[OK] {result['rows']} autos copiados a {len(result['partitions'])} particiones"
+                ))
+                self.stdout.write(self.style.WARNING(
+                    f'[WARN] La tabla anterior quedó como {partitions.LEGACY_TABLE}; '
+                    'borrarla después de revisar la conversión'
+                ))
+            elif not partitions.is_partitioned(connection):
+                raise CommandError('tbl_auto_raw_taller no está particionada (usar --convert)')
+
+            created = partitions.ensure_partitions(connection, now, options['months_ahead'])
+            for name in created:
+                self.stdout.write(f'  + {name}')
+
+        if keep is not None:
+            self._archive(now, keep, options)
+
+        existing = partitions.list_partitions(connection)
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] {len(existing)} particiones ({existing[0][1]:%Y-%m} a {existing[-1][1]:%Y-%m})'
+            if existing else '[OK] Sin particiones'
+        ))
+
+    def _archive(self, now, keep, options):
+        """Archiva (o solo saca) las particiones anteriores a los últimos keep meses"""
+        root = options['archive_dir'] or partitions.archive_dir()
+        old = partitions.partitions_before(connection, now, keep)
+        if not old:
+            self.stdout.write(self.style.WARNING('[WARN] No hay particiones para archivar'))
+            return
+
+        for name in old:
+            # Una partición por transacción: un error no deshace las anteriores
+            with transaction.atomic():
+                active = partitions.count_active(connection, name)
+                if active:
+                    self.stdout.write(self.style.WARNING(
+                        f'[WARN] {name}: {active} autos activos, no se archiva'
+                    ))
+                    continue
+                if options['detach_only']:
+                    partitions.detach_partition(connection, name)
+                    self.stdout.write(f'  - {name}: separada de tbl_auto_raw_taller')
+                else:
+                    path, rows = partitions.archive_partition(connection, name, root)
+                    self.stdout.write(f'  - {name}: {rows} autos en {path}')
@@ -1,5 +1,10 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
+from django.db import connection
+from apps.cars.dataset import write_job_partition
+from apps.cars.export import ExportError
+from apps.cars.facets import build_cube, facets_file
+from apps.cars.history import MIN_SEEN_RATIO, mark_delisted
 from apps.cars.models import ScrapingJob
 from apps.cars.scraper.extractor import CarExtractor
 from apps.cars.scraper.transformer import CarTransformer
@@ -58,17 +63,33 @@ class Command(BaseCommand):
             loader = CarLoader()
             loaded = loader.load(df, scraping_job=job)
             job.total_records_loaded = loaded
+            log_messages = f'Scraping exitoso: {loaded} registros cargados'
+
+            # Autos retirados: solo un scraping de todas las páginas sabe cuáles ya no están
+            if options['max_pages'] is None:
+                delisted = mark_delisted(connection, job.id, timezone.now())
+                if delisted is None:
+                    self.stdout.write(self.style.WARNING(
+                        f'[WARN] El scraping vio menos del {MIN_SEEN_RATIO:.0%} de los autos activos: '
+                        'no se marcan autos retirados'
+                    ))
+                else:
+                    log_messages += f', {delisted} autos retirados'
+                    self.stdout.write(self.style.SUCCESS(f'[OK] {delisted} autos retirados de neoauto'))
 
             # Completar job
             job.status = 'completed'
             job.completed_at = timezone.now()
-            job.log_messages = f'Scraping exitoso: {loaded} registros cargados'
+            job.log_messages = log_messages
             job.save()
 
             self.stdout.write(self.style.SUCCESS(f'\n[OK] Scraping completado: {loaded} registros cargados'))
             self.stdout.write(f'  Job ID: {job.id}')
             self.stdout.write(f'  Duracion: {job.duration():.2f} segundos')
 
+            self._write_partition(job)
+            self._build_facets()
+
         except Exception as e:
             job.status = 'failed'
             job.error_message = str(e)
@@ -77,3 +98,24 @@ class Command(BaseCommand):
 
             self.stdout.write(self.style.ERROR(f'\n[ERROR] Error en scraping: {e}'))
             raise
+
+    def _write_partition(self, job):
+        """Partición Parquet del job para análisis y entrenamiento (no falla el scraping)"""
+        try:
+            path, rows = write_job_partition(connection, job)
+        except ExportError as e:
+            self.stdout.write(self.style.WARNING(f'[WARN] Sin partición Parquet: {e}'))
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f'[WARN] No se pudo escribir la partición Parquet: {e}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'[OK] Partición Parquet: {rows} autos en {path}'))
+
+    def _build_facets(self):
+        """Cubo de conteos de /cars/api/facets/ con los autos de este scraping (no falla el scraping)"""
+        try:
+            cube = build_cube(connection, timezone.now())
+            cube.save(facets_file())
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f'[WARN] No se pudo reconstruir el cubo de facetas: {e}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'[OK] Cubo de facetas: {len(cube.counts)} combinaciones'))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.cars.dataset import dataset_dir, list_partitions, write_job_partition
+from apps.cars.export import CHUNK_SIZE, ExportError, require_pyarrow
+from apps.cars.models import ScrapingJob
+
+
+class Command(BaseCommand):
+    help = 'Escribe las particiones Parquet (scrape_date=.../job_id=...) de los ScrapingJob completados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--job',
+            type=int,
+            action='append',
+            help='ID de ScrapingJob (se puede repetir); por defecto los completados sin partición'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Reescribir también las particiones que ya existen'
+        )
+        parser.add_argument(
+            '--dataset-dir',
+            default='',
+            help='Directorio del dataset (por defecto CARS_DATASET_DIR o data/scrapes)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        root = options['dataset_dir'] or dataset_dir()
+        try:
+            require_pyarrow()
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        jobs = ScrapingJob.objects.filter(status='completed').order_by('started_at')
+        if options['job']:
+            jobs = jobs.filter(pk__in=options['job'])
+        if not options['rebuild']:
+            existing = {job_id for _, job_id, _ in list_partitions(root)}
+            jobs = [job for job in jobs if job.id not in existing]
+
+        if not jobs:
+            self.stdout.write(self.style.WARNING('[WARN] No hay jobs completados sin partición'))
+            return
+
+        total = written = 0
+        for job in jobs:
+            try:
+                path, rows = write_job_partition(connection, job, root=root, chunk_size=options['chunk_size'])
+            except ExportError as e:
+                # Job viejo sin autos vistos: su partición existente (si hay) queda como está
+                self.stdout.write(self.style.WARNING(f'[WARN] {e}'))
+                continue
+            total += rows
+            written += 1
+            self.stdout.write(f'  Job #{job.id} ({timezone.localtime(job.started_at):%Y-%m-%d}): {rows} autos')
+
+        self.stdout.write(self.style.SUCCESS(f'[OK] {written} particiones, {total} autos en {root}'))
@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-19 18:38
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='car',
+            options={'managed': False, 'ordering': ['-fecha'], 'verbose_name': 'Auto', 'verbose_name_plural': 'Autos'},
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0 on 2026-10-19 19:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# El upsert de apps/cars/history.py necesita id único en tbl_auto_raw_taller
+# (tasks/load la creaba con to_sql, sin clave primaria). Si hay ids repetidos
+# la migración se detiene: `python manage.py dedupe_cars` los resuelve
+# guardando las filas sobrantes en tbl_auto_raw_taller_duplicates. El
+# historial arranca con el precio actual de cada auto. Todo se omite si la
+# tabla no existe (base de pruebas).
+UNIQUE_ID_AND_SEED = """
+DO $$
+DECLARE
+    duplicates bigint;
+BEGIN
+    IF to_regclass('tbl_auto_raw_taller') IS NULL THEN
+        RETURN;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = 'tbl_auto_raw_taller'::regclass
+          AND i.indisunique AND i.indnatts = 1 AND a.attname = 'id'
+    ) THEN
+        SELECT COUNT(id) - COUNT(DISTINCT id) INTO duplicates FROM tbl_auto_raw_taller;
+        IF duplicates > 0 THEN
+            RAISE EXCEPTION 'tbl_auto_raw_taller tiene % filas con id repetido', duplicates
+                USING HINT = 'Correr "python manage.py dedupe_cars" (las mueve a '
+                             'tbl_auto_raw_taller_duplicates) y volver a migrar';
+        END IF;
+
+        CREATE UNIQUE INDEX tbl_auto_raw_taller_id_uniq ON tbl_auto_raw_taller (id);
+    END IF;
+
+    INSERT INTO car_price_history (car_id, price, observed_at)
+    SELECT id, price, COALESCE(fecha, now()) FROM tbl_auto_raw_taller;
+END
+$$;
+"""
+
+DROP_UNIQUE_ID = "DROP INDEX IF EXISTS tbl_auto_raw_taller_id_uniq;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0002_alter_car_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('observed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('car', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='price_history', to='cars.car')),
+                ('scraping_job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_changes', to='cars.scrapingjob')),
+            ],
+            options={
+                'verbose_name': 'Cambio de precio',
+                'verbose_name_plural': 'Historial de precios',
+                'db_table': 'car_price_history',
+                'ordering': ['car', 'observed_at'],
+                'indexes': [models.Index(fields=['car', 'observed_at'], name='car_price_history_car_obs')],
+            },
+        ),
+        migrations.RunSQL(UNIQUE_ID_AND_SEED, reverse_sql=DROP_UNIQUE_ID),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0 on 2026-10-19 19:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# tbl_auto_raw_taller no la maneja Django: columnas de autos retirados e
+# índice parcial de los activos (autos similares y entrenamiento). Se omite
+# si la tabla no existe (base de pruebas).
+ACTIVE_COLUMNS = """
+DO $$
+BEGIN
+    IF to_regclass('tbl_auto_raw_taller') IS NULL THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE tbl_auto_raw_taller
+        ADD COLUMN IF NOT EXISTS is_active boolean NOT NULL DEFAULT true,
+        ADD COLUMN IF NOT EXISTS delisted_at timestamp with time zone;
+
+    CREATE INDEX IF NOT EXISTS tbl_auto_raw_taller_active_brand_year
+        ON tbl_auto_raw_taller (brand, year) WHERE is_active;
+END
+$$;
+"""
+
+DROP_ACTIVE_COLUMNS = """
+DO $$
+BEGIN
+    IF to_regclass('tbl_auto_raw_taller') IS NULL THEN
+        RETURN;
+    END IF;
+
+    DROP INDEX IF EXISTS tbl_auto_raw_taller_active_brand_year;
+    ALTER TABLE tbl_auto_raw_taller DROP COLUMN IF EXISTS is_active, DROP COLUMN IF EXISTS delisted_at;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0003_carpricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapingJobListing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('car_id', models.BigIntegerField()),
+                ('job', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='listings', to='cars.scrapingjob')),
+            ],
+            options={
+                'verbose_name': 'Auto visto',
+                'verbose_name_plural': 'Autos vistos',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='scrapingjoblisting',
+            constraint=models.UniqueConstraint(fields=('job', 'car_id'), name='scrapingjoblisting_job_car'),
+        ),
+        migrations.RunSQL(ACTIVE_COLUMNS, reverse_sql=DROP_ACTIVE_COLUMNS),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+# Índices del listado paginado por (fecha, id) de /cars/api/cars/: cada
+# página es un recorrido del índice desde el cursor, sin OFFSET. Parciales
+# porque el listado solo muestra autos activos. Se omite si la tabla no
+# existe (base de pruebas).
+LISTING_INDEXES = """
+DO $$
+BEGIN
+    IF to_regclass('tbl_auto_raw_taller') IS NULL THEN
+        RETURN;
+    END IF;
+
+    CREATE INDEX IF NOT EXISTS tbl_auto_raw_taller_active_fecha_id
+        ON tbl_auto_raw_taller (fecha DESC, id DESC) WHERE is_active;
+    CREATE INDEX IF NOT EXISTS tbl_auto_raw_taller_active_brand_fecha_id
+        ON tbl_auto_raw_taller (brand, fecha DESC, id DESC) WHERE is_active;
+END
+$$;
+"""
+
+DROP_LISTING_INDEXES = """
+DROP INDEX IF EXISTS tbl_auto_raw_taller_active_fecha_id;
+DROP INDEX IF EXISTS tbl_auto_raw_taller_active_brand_fecha_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0004_delisting'),
+    ]
+
+    operations = [
+        migrations.RunSQL(LISTING_INDEXES, reverse_sql=DROP_LISTING_INDEXES),
+    ]
@@ -65,6 +65,8 @@ class Car(models.Model):
 
     # Control de datos
     fecha = models.DateTimeField(default=timezone.now, db_index=True)
+    is_active = models.BooleanField(default=True)  # False si dejó de aparecer en neoauto
+    delisted_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         db_table = 'tbl_auto_raw_taller'
@@ -84,3 +86,59 @@ class Car(models.Model):
     @property
     def detail_url(self):
         return self.link
+
+
+class ScrapingJobListing(models.Model):
+    """Autos (ids) que vio un ScrapingJob; base de la detección de autos retirados"""
+
+    job = models.ForeignKey(
+        ScrapingJob,
+        on_delete=models.CASCADE,
+        db_index=False,  # lo cubre la restricción única (job, car_id)
+        related_name='listings',
+    )
+    car_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['job', 'car_id'], name='scrapingjoblisting_job_car')]
+        verbose_name = 'Auto visto'
+        verbose_name_plural = 'Autos vistos'
+
+    def __str__(self):
+        return f"Job #{self.job_id} - auto #{self.car_id}"
+
+
+class CarPriceHistory(models.Model):
+    """
+    Historial de precios de cada auto (solo se agrega, nunca se actualiza)
+
+    Una fila por cambio de precio: la escribe el upsert de
+    apps/cars/history.py al comparar con el precio actual del auto.
+    """
+
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,  # tbl_auto_raw_taller no la maneja Django
+        db_index=False,  # lo cubre el índice (car, observed_at)
+        related_name='price_history',
+    )
+    price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    scraping_job = models.ForeignKey(
+        ScrapingJob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='price_changes',
+    )
+    observed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'car_price_history'
+        ordering = ['car', 'observed_at']
+        indexes = [models.Index(fields=['car', 'observed_at'], name='car_price_history_car_obs')]
+        verbose_name = 'Cambio de precio'
+        verbose_name_plural = 'Historial de precios'
+
+    def __str__(self):
+        return f"Auto #{self.car_id} - ${self.price} ({self.observed_at:%Y-%m-%d})"
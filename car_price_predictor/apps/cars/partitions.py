@@ -0,0 +1,279 @@
+"""
+Particionado mensual de tbl_auto_raw_taller por fecha
+
+Con particionado declarativo de PostgreSQL (PARTITION BY RANGE (fecha))
+cada mes vive en su propia tabla:
+
+    tbl_auto_raw_taller_y2026m10  [2026-10-01, 2026-11-01)
+
+Cada carga actualiza fecha (history.upsert_cars), así que un auto que sigue
+publicado se mueve a la partición del mes actual y los meses viejos solo
+guardan autos que dejaron de verse. Las consultas de la API filtran por
+fecha >= hot_since() y PostgreSQL solo abre las particiones recientes; los
+meses viejos se archivan en CSV comprimido y se sacan de la tabla.
+
+convert_to_partitioned hace la conversión una sola vez (la tabla anterior
+queda como tbl_auto_raw_taller_legacy); ensure_partitions crea los meses
+siguientes y no hace nada si la tabla no está particionada. Una tabla
+particionada no puede tener un índice único solo por id: el upsert no usa
+ON CONFLICT y las cargas se serializan con un advisory lock (ver
+history.upsert_cars).
+
+Recibe una conexión DB-API de PostgreSQL (la de Django o
+engine.raw_connection() en tasks/load.py); el commit queda a cargo de quien
+llama. No depende de Django.
+"""
+
+import gzip
+import os
+import re
+from datetime import date, datetime, timezone
+
+
+TABLE = 'tbl_auto_raw_taller'
+LEGACY_TABLE = f'{TABLE}_legacy'
+
+# Meses siguientes al actual con partición creada de antemano
+MONTHS_AHEAD = 2
+
+# Meses que leen las consultas de la API (el actual y los anteriores)
+HOT_MONTHS = 3
+
+DEFAULT_ARCHIVE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'archive'
+)
+
+_PARTITION_NAME = re.compile(rf'^{TABLE}_y(\d{{4}})m(\d{{2}})$')
+
+# Índices de la tabla particionada (se crean en cada partición)
+PARTITION_INDEXES = [
+    f'CREATE INDEX {TABLE}_id ON {TABLE} (id)',
+    f'CREATE INDEX {TABLE}_fecha ON {TABLE} (fecha)',
+    f'CREATE INDEX {TABLE}_active_brand_year ON {TABLE} (brand, year) WHERE is_active',
+    # Listado paginado de /cars/api/cars/ (migración 0005)
+    f'CREATE INDEX {TABLE}_active_fecha_id ON {TABLE} (fecha DESC, id DESC) WHERE is_active',
+    f'CREATE INDEX {TABLE}_active_brand_fecha_id ON {TABLE} (brand, fecha DESC, id DESC) WHERE is_active',
+]
+
+
+def archive_dir():
+    """Directorio de los meses archivados (CARS_ARCHIVE_DIR o data/archive del proyecto)"""
+    return os.path.abspath(os.getenv('CARS_ARCHIVE_DIR') or DEFAULT_ARCHIVE_DIR)
+
+
+def month_start(value):
+    """Primer día del mes de una fecha o datetime"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    """Primer día del mes desplazado months meses (puede ser negativo)"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """Rango [desde, hasta) de la partición del mes, en UTC"""
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end = add_months(month, 1)
+    return start, datetime(end.year, end.month, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month):
+    """Nombre de la partición de un mes (tbl_auto_raw_taller_yAAAAmMM)"""
+    return f'{TABLE}_y{month.year:04d}m{month.month:02d}'
+
+
+def partition_month(name):
+    """Mes de una partición a partir de su nombre, o None si no es mensual"""
+    match = _PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def hot_since(now, months=HOT_MONTHS):
+    """
+    Inicio del rango de fecha que leen las consultas de la API
+
+    Empieza al inicio de un mes (UTC), así el filtro descarta particiones enteras.
+    """
+    current = month_start(now.astimezone(timezone.utc))
+    return month_bounds(add_months(current, 1 - months))[0]
+
+
+def is_partitioned(connection):
+    """True si tbl_auto_raw_taller ya es una tabla particionada"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            [TABLE],
+        )
+        return cursor.fetchone()[0]
+
+
+def list_partitions(connection):
+    """
+    Particiones mensuales de tbl_auto_raw_taller
+
+    Returns:
+        list: (nombre, mes) ordenado por mes
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return sorted(
+        ((name, partition_month(name)) for name in names if partition_month(name)),
+        key=lambda item: item[1],
+    )
+
+
+def create_partition(cursor, month):
+    """Crea la partición de un mes si no existe; devuelve True si la creó"""
+    name = partition_name(month)
+    cursor.execute("SELECT to_regclass(%s) IS NULL", [name])
+    if not cursor.fetchone()[0]:
+        return False
+    start, end = month_bounds(month)
+    cursor.execute(
+        f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)",
+        [start, end],
+    )
+    return True
+
+
+def ensure_partitions(connection, now, months_ahead=MONTHS_AHEAD):
+    """
+    Crea las particiones del mes actual y de los months_ahead siguientes
+
+    Args:
+        now (datetime): Fecha de la carga
+        months_ahead (int): Meses siguientes a crear
+
+    Returns:
+        list: Nombres de las particiones creadas (vacía si la tabla no está particionada)
+    """
+    if not is_partitioned(connection):
+        return []
+    current = month_start(now.astimezone(timezone.utc))
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if create_partition(cursor, month):
+                created.append(partition_name(month))
+    return created
+
+
+def convert_to_partitioned(connection, now, months_ahead=MONTHS_AHEAD):
+    """
+    Convierte tbl_auto_raw_taller en una tabla particionada por mes de fecha
+
+    La tabla actual se renombra a tbl_auto_raw_taller_legacy (con sus
+    índices) y sus filas se copian a la nueva; borrarla queda a cargo del
+    administrador después de revisar la conversión. Las filas sin fecha
+    toman now.
+
+    Returns:
+        dict: rows (filas copiadas), partitions (particiones creadas)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [LEGACY_TABLE])
+        if cursor.fetchone()[0]:
+            raise ValueError(f'Ya existe {LEGACY_TABLE}: borrarla antes de convertir de nuevo')
+
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = to_regclass(%s)",
+            [TABLE],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}")
+        for index in indexes:
+            # Los nombres quedan libres para los índices de la tabla nueva
+            cursor.execute(f'ALTER INDEX "{index}" RENAME TO "{("legacy_" + index)[:63]}"')
+
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (fecha)"
+        )
+        cursor.execute(f"UPDATE {LEGACY_TABLE} SET fecha = %s WHERE fecha IS NULL", [now])
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN fecha SET NOT NULL")
+        if sequence:
+            # El id sigue saliendo de la misma secuencia; borrar la tabla vieja no la borra
+            cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id")
+
+        cursor.execute(f"SELECT MIN(fecha) FROM {LEGACY_TABLE}")
+        oldest = cursor.fetchone()[0] or now
+        month = month_start(oldest.astimezone(timezone.utc))
+        last = add_months(month_start(now.astimezone(timezone.utc)), months_ahead)
+        partitions = []
+        while month <= last:
+            create_partition(cursor, month)
+            partitions.append(partition_name(month))
+            month = add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {LEGACY_TABLE}")
+        rows = cursor.rowcount
+        for sql in PARTITION_INDEXES:
+            cursor.execute(sql)
+        cursor.execute(f"ANALYZE {TABLE}")
+    return {'rows': rows, 'partitions': partitions}
+
+
+def count_active(connection, name):
+    """Autos activos (is_active) en una partición"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {name} WHERE is_active")
+        return cursor.fetchone()[0]
+
+
+def detach_partition(connection, name):
+    """Saca la partición de tbl_auto_raw_taller; queda como tabla independiente"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+
+
+def archive_partition(connection, name, root):
+    """
+    Guarda la partición en <root>/<nombre>.csv.gz y la borra de la base
+
+    El archivo se escribe completo (temporal + rename) antes de sacar la
+    partición, así un error deja la tabla como estaba.
+
+    Returns:
+        tuple: (ruta del archivo, filas archivadas)
+    """
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f'{name}.csv.gz')
+    tmp_path = f'{path}.tmp'
+    try:
+        with gzip.open(tmp_path, 'wb') as f, connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)', f)
+            rows = cursor.rowcount
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+    detach_partition(connection, name)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {name}")
+    return path, rows
+
+
+def partitions_before(connection, now, keep_months):
+    """
+    Particiones anteriores a los últimos keep_months meses (candidatas a archivar)
+
+    Returns:
+        list: Nombres de las particiones, de la más vieja a la más nueva
+    """
+    cutoff = add_months(month_start(now.astimezone(timezone.utc)), 1 - keep_months)
+    return [name for name, month in list_partitions(connection) if month < cutoff]
@@ -1,6 +1,9 @@
-from apps.cars.models import Car, ScrapingJob
+from django.db import connection, transaction
 from django.utils import timezone
 
+from apps.cars.history import upsert_cars
+from apps.cars.partitions import ensure_partitions
+
 
 class CarLoader:
     """Carga datos a base de datos Django"""
@@ -9,6 +12,9 @@ class CarLoader:
         """
         Carga DataFrame a base de datos
 
+        Upsert en bloque por id: los autos nuevos se insertan, los existentes
+        se actualizan y los cambios de precio quedan en car_price_history.
+
         Args:
             df (pd.DataFrame): DataFrame con datos transformados
             scraping_job (ScrapingJob): Job asociado
@@ -16,38 +22,18 @@ class CarLoader:
         Returns:
             int: Número de registros cargados
         """
-        records_loaded = 0
-
-        for _, row in df.iterrows():
-            try:
-                car, created = Car.objects.update_or_create(
-                    codigo=row['id'],
-                    defaults={
-                        'titulo': row['title'],
-                        'link': row['link'],
-                        'etiqueta': row.get('tag'),
-                        'imagen': row.get('image'),
-                        'combustible': row.get('fuel', ''),
-                        'ubicacion': row.get('location', ''),
-                        'precio': row.get('price'),
-                        'marca': row.get('brand', ''),
-                        'anio': row.get('year', 0),
-                        'anunciante': row.get('advertiser'),
-                        'categoria': row.get('category'),
-                        'subcategoria': row.get('subcategory'),
-                        'transmision': row.get('transmission', ''),
-                        'slug': row.get('slug'),
-                        'fecha': timezone.now(),
-                        'scraping_job': scraping_job
-                    }
-                )
-                records_loaded += 1
-                if created:
-                    print(f'  + Creado: {car.codigo} - {car.titulo}')
-                else:
-                    print(f'  ↻ Actualizado: {car.codigo} - {car.titulo}')
-            except Exception as e:
-                print(f"Error cargando registro {row.get('id')}: {e}")
-                continue
-
-        return records_loaded
+        now = timezone.now()
+        with transaction.atomic():
+            # Partición del mes de la carga (si la tabla está particionada)
+            ensure_partitions(connection, now)
+            totals = upsert_cars(
+                connection,
+                df,
+                now=now,
+                job_id=scraping_job.id if scraping_job else None,
+            )
+
+        print(f"  + Creados: {totals['inserted']}")
+        print(f"  ↻ Actualizados: {totals['updated']}")
+        print(f"  $ Cambios de precio: {totals['price_changes']}")
+        return totals['inserted'] + totals['updated']
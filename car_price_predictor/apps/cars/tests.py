@@ -1,3 +1,439 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from . import analysis, dataset, export, facets, history, partitions, views
+from .models import ScrapingJob
+
+
+# Tablas temporales con las columnas de producción: en PostgreSQL pg_temp va
+# primero en el search_path, así que tapan a las reales durante la conexión
+CAR_TABLES_SQL = """
+CREATE TEMP TABLE tbl_auto_raw_taller (
+    id bigint, title varchar(255), link varchar(500), tag varchar(100), image varchar(500),
+    fuel varchar(50), location varchar(100), price numeric(12, 2), brand varchar(100),
+    year integer, subcategory varchar(100), transmission varchar(50), advertiser varchar(100),
+    category varchar(100), slug varchar(255), fecha timestamptz NOT NULL DEFAULT now(),
+    is_active boolean NOT NULL DEFAULT true, delisted_at timestamptz
+);
+CREATE TEMP TABLE car_price_history (
+    id bigserial PRIMARY KEY, car_id bigint NOT NULL, price numeric(12, 2),
+    scraping_job_id bigint, observed_at timestamptz NOT NULL
+);
+CREATE TEMP TABLE cars_scrapingjoblisting (
+    id bigserial PRIMARY KEY, job_id bigint NOT NULL, car_id bigint NOT NULL, UNIQUE (job_id, car_id)
+);
+"""
+
+
+def car_tables(test):
+    """
+    Conexión a la base de settings con tablas temporales vacías de autos
+
+    Salta el test si PostgreSQL no está disponible. Nada queda en la base:
+    las tablas temporales desaparecen al cerrar la conexión.
+    """
+    db = settings.DATABASES['default']
+    try:
+        connection = psycopg2.connect(
+            dbname=db['NAME'], user=db['USER'], password=db['PASSWORD'],
+            host=db['HOST'] or None, port=db['PORT'] or None, connect_timeout=3,
+        )
+    except psycopg2.OperationalError:
+        test.skipTest('PostgreSQL no disponible')
+    test.addCleanup(connection.close)
+    with connection.cursor() as cursor:
+        cursor.execute(CAR_TABLES_SQL)
+    return connection
+
+
+class CarExportTests(SimpleTestCase):
+    def test_query_filters_by_dates_and_job_window(self):
+        job = SimpleNamespace(id=7, started_at=datetime(2026, 10, 1, tzinfo=timezone.utc), completed_at=None)
+        sql, params = export.build_export_query(
+            since=export.parse_bound('2026-10-02'),
+            until=export.parse_bound('2026-10-03', end=True),
+            job=job,
+            job_window=True,
+        )
+
+        self.assertIn('FROM tbl_auto_raw_taller WHERE', sql)
+        self.assertEqual(set(params), {'job_start', 'job_end', 'since', 'until'})
+        # Un job en curso llega hasta ahora
+        self.assertGreater(params['job_end'], job.started_at)
+        self.assertEqual((params['until'].hour, params['until'].minute), (23, 59))
+        self.assertNotIn('WHERE', export.build_export_query()[0])
+
+        sql, params = export.build_export_query(job=job)
+        self.assertIn('cars_scrapingjoblisting WHERE job_id = %(job_id)s', sql)
+        self.assertEqual(params, {'job_id': 7})
+
+    def test_job_window_only_for_latest_job_without_listings(self):
+        job = ScrapingJob(pk=3, started_at=datetime(2026, 10, 1, tzinfo=timezone.utc))
+
+        def check(has_listings, has_newer):
+            listings = SimpleNamespace(exists=lambda: has_listings)
+            newer = SimpleNamespace(exists=lambda: has_newer)
+            with mock.patch.object(ScrapingJob, 'listings', listings), \
+                    mock.patch.object(ScrapingJob.objects, 'filter', return_value=newer):
+                return export.use_job_window(job)
+
+        self.assertFalse(export.use_job_window(None))
+        self.assertFalse(check(has_listings=True, has_newer=True))
+        self.assertTrue(check(has_listings=False, has_newer=False))
+        # Un job posterior movió fecha: la ventana ya no tiene los autos del job
+        with self.assertRaises(export.ExportError):
+            check(has_listings=False, has_newer=True)
+
+    def test_invalid_date_is_rejected(self):
+        with self.assertRaises(export.ExportError):
+            export.parse_bound('ayer')
+
+    def test_gzip_csv_streams_every_chunk(self):
+        chunks = [[(1, 'auto 1')], [(2, 'auto, 2'), (3, None)]]
+        parts = list(export.render_csv(iter(chunks), compress=True))
+
+        # Encabezado, un fragmento por bloque y el cierre del gzip
+        self.assertEqual(len(parts), 4)
+        rows = list(csv.reader(io.StringIO(gzip.decompress(b''.join(parts)).decode('utf-8-sig'))))
+        self.assertEqual(rows[0], export.EXPORT_COLUMNS)
+        self.assertEqual(rows[1:], [['1', 'auto 1'], ['2', 'auto, 2'], ['3', '']])
+
+    def test_parquet_writes_one_row_group_per_chunk(self):
+        _, pq = export.require_pyarrow()
+        fecha = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+        def row(car_id, price):
+            values = dict.fromkeys(export.EXPORT_COLUMNS)
+            values.update(id=car_id, title=f'auto {car_id}', price=price, year=2020, fecha=fecha)
+            return tuple(values[col] for col in export.EXPORT_COLUMNS)
+
+        cursor = mock.MagicMock()
+        cursor.fetchmany.side_effect = [[row(1, Decimal('15000.50')), row(2, None)], [row(3, Decimal('9000'))], []]
+        connection = mock.MagicMock()
+        connection.chunked_cursor.return_value.__enter__.return_value = cursor
+        path = os.path.join(tempfile.mkdtemp(), 'autos.parquet')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+
+        self.assertEqual(export.write_parquet(connection, path, 'SELECT', {}, chunk_size=2), 3)
+        parquet = pq.ParquetFile(path)
+        self.assertEqual(parquet.metadata.num_row_groups, 2)
+        self.assertEqual(parquet.schema_arrow, export.parquet_schema())
+        df = parquet.read().to_pandas()
+        self.assertEqual(df['id'].tolist(), [1, 2, 3])
+        self.assertEqual(df['price'].tolist()[::2], [15000.5, 9000.0])
+        self.assertTrue(np.isnan(df['price'][1]))
+        self.assertFalse(os.path.exists(f'{path}.tmp'))
+
+    def test_api_rejects_unknown_format(self):
+        response = self.client.get(reverse('cars:api_export_cars'), {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ScrapeDatasetTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        for scrape_date, job_id in [(date(2026, 10, 1), 1), (date(2026, 10, 1), 2), (date(2026, 10, 8), 3)]:
+            path = dataset.partition_path(self.root, scrape_date, job_id)
+            os.makedirs(os.path.dirname(path))
+            open(path, 'wb').close()
+        # Escritura interrumpida: sin part-0.parquet no es una partición
+        os.makedirs(os.path.join(self.root, 'scrape_date=2026-10-09', 'job_id=4'))
+
+    def test_partitions_are_pruned_by_date_and_job(self):
+        self.assertEqual([job for _, job, _ in dataset.list_partitions(self.root)], [1, 2, 3])
+        self.assertEqual(
+            [job for _, job, _ in dataset.list_partitions(self.root, since=date(2026, 10, 2))], [3]
+        )
+        self.assertEqual(
+            [job for _, job, _ in dataset.list_partitions(self.root, until=date(2026, 10, 1), job_ids=[2, 3])],
+            [2]
+        )
+        self.assertEqual(dataset.list_partitions(os.path.join(self.root, 'no-existe')), [])
+
+
+    def test_read_dataset_keeps_latest_version_of_requested_ids(self):
+        pa, pq = export.require_pyarrow()
+        schema = export.parquet_schema()
+        fecha = datetime(2026, 10, 1, tzinfo=timezone.utc)
+        for (_, job_id, path), prices in zip(dataset.list_partitions(self.root), [[100, 200], [110, 200], [120]]):
+            ids = [1, 2][:len(prices)]
+            columns = {col: [None] * len(ids) for col in export.EXPORT_COLUMNS}
+            columns.update(id=ids, price=[float(price) for price in prices], fecha=[fecha] * len(ids))
+            pq.write_table(pa.Table.from_pydict(columns, schema=schema), path)
+
+        df = dataset.read_dataset(self.root, columns=['price', 'job_id'])
+        self.assertEqual(df.values.tolist(), [[200.0, 2], [120.0, 3]])
+        # El auto 2 ya no está activo: se descarta aunque esté en las particiones
+        df = dataset.read_dataset(self.root, columns=['price', 'job_id'], ids=pd.Series([1]))
+        self.assertEqual(df.values.tolist(), [[120.0, 3]])
+
+    def test_missing_pyarrow_is_an_export_error(self):
+        with mock.patch.dict('sys.modules', {'pyarrow': None, 'pyarrow.parquet': None, 'pyarrow.compute': None}):
+            with self.assertRaises(export.ExportError):
+                dataset.read_dataset(self.root)
+
+class PushdownAnalysisTests(SimpleTestCase):
+    def _connection(self, description, rows):
+        cursor = mock.MagicMock(description=[(name,) for name in description])
+        cursor.fetchall.return_value = rows
+        connection = mock.MagicMock()
+        connection.cursor.return_value.__enter__.return_value = cursor
+        return connection, cursor
+
+    def test_price_summary_has_describe_layout(self):
+        connection, cursor = self._connection(
+            ['count', 'avg', 'stddev_samp', 'min', 'percentile_cont', 'max'],
+            [(4, 20.0, 5.0, 10.0, [15.0, 20.0, 25.0], 30.0)],
+        )
+        summary = analysis.price_summary(connection)
+
+        self.assertEqual(list(summary.index), analysis.DESCRIBE_INDEX)
+        self.assertEqual(summary['50%'], 20.0)
+        self.assertIn('percentile_cont', cursor.execute.call_args[0][0])
+
+    def test_group_by_only_accepts_table_columns(self):
+        connection, cursor = self._connection(['brand', 'count'], [('KIA', 3), ('TOYOTA', 2)])
+        counts = analysis.value_counts(connection, 'brand', limit=15)
+
+        self.assertEqual(counts.to_dict(), {'KIA': 3, 'TOYOTA': 2})
+        self.assertIn('GROUP BY brand', cursor.execute.call_args[0][0])
+        with self.assertRaises(ValueError):
+            analysis.value_counts(connection, 'brand; DROP TABLE tbl_auto_raw_taller')
+
+
+class PriceHistoryTests(SimpleTestCase):
+    def test_listing_rows_dedupe_ids_and_null_missing_values(self):
+        df = pd.DataFrame([
+            {'id': '7', 'title': 'viejo', 'price': 10000.0, 'year': 2015},
+            {'id': None, 'title': 'sin id', 'price': 1.0, 'year': 2015},
+            {'id': '7', 'title': 'nuevo', 'price': np.nan, 'year': 2015},
+        ])
+        rows = history.listing_rows(df)
+
+        self.assertEqual(len(rows), 1)
+        record = dict(zip(history.UPSERT_COLUMNS, rows[0]))
+        self.assertEqual(record['title'], 'nuevo')
+        self.assertIsNone(record['price'])
+        self.assertIsNone(record['slug'])
+
+    def test_history_written_only_for_new_or_changed_prices(self):
+        connection = car_tables(self)
+        first = datetime(2026, 10, 1, tzinfo=timezone.utc)
+        second = datetime(2026, 10, 8, tzinfo=timezone.utc)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO tbl_auto_raw_taller (id, title, price, fecha, is_active, delisted_at) "
+                "VALUES (3, 'retirado', 50000, %s, false, %s)",
+                [first, first],
+            )
+
+        df = pd.DataFrame([
+            {'id': 1, 'title': 'a', 'price': 10000.0},
+            {'id': 2, 'title': '100% nuevo', 'price': 20000.0},
+        ])
+        self.assertEqual(
+            history.upsert_cars(connection, df, first, job_id=5, batch_size=1),
+            {'inserted': 2, 'updated': 0, 'price_changes': 2},
+        )
+        df = pd.DataFrame([
+            {'id': 1, 'title': 'a', 'price': 10000.0},
+            {'id': 2, 'title': '100% nuevo', 'price': 18000.0},
+            {'id': 3, 'title': 'retirado', 'price': 50000.0},
+        ])
+        self.assertEqual(
+            history.upsert_cars(connection, df, second, job_id=6),
+            {'inserted': 0, 'updated': 3, 'price_changes': 1},
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT car_id, price, scraping_job_id, observed_at FROM car_price_history ORDER BY id')
+            self.assertEqual(cursor.fetchall(), [
+                (1, 10000, 5, first), (2, 20000, 5, first), (2, 18000, 6, second),
+            ])
+            cursor.execute('SELECT id, title, fecha, is_active, delisted_at FROM tbl_auto_raw_taller ORDER BY id')
+            self.assertEqual(cursor.fetchall(), [
+                (1, 'a', second, True, None), (2, '100% nuevo', second, True, None),
+                (3, 'retirado', second, True, None),
+            ])
+            cursor.execute('SELECT job_id, COUNT(*) FROM cars_scrapingjoblisting GROUP BY 1 ORDER BY 1')
+            self.assertEqual(cursor.fetchall(), [(5, 2), (6, 3)])
+
+    def test_upsert_runs_one_statement_per_batch(self):
+        cursor = mock.MagicMock()
+        cursor.mogrify.side_effect = lambda template, row: repr(row).encode()
+        cursor.fetchone.return_value = (1, 1, 1)
+        connection = mock.MagicMock()
+        connection.cursor.return_value.__enter__.return_value = cursor
+        now = datetime(2026, 10, 1, tzinfo=timezone.utc)
+        df = pd.DataFrame({'id': [1, 2, 3], 'title': ['a', '50% off', 'c']})
+
+        totals = history.upsert_cars(connection, df, now, job_id=5, batch_size=2)
+
+        self.assertEqual(totals, {'inserted': 2, 'updated': 2, 'price_changes': 2})
+        batches = [call for call in cursor.execute.call_args_list if 'WITH incoming' in call[0][0]]
+        self.assertEqual(len(batches), 2)
+        for call in batches:
+            self.assertEqual(call[0][1], {'now': now, 'job_id': 5})
+        # El % de los valores queda escapado para el segundo paso de parámetros
+        self.assertIn("'50%% off'", batches[0][0][0])
+        self.assertNotIn("'c'", batches[0][0][0])
+
+    def test_upsert_locks_out_concurrent_loads_first(self):
+        cursor = mock.MagicMock()
+        cursor.mogrify.side_effect = lambda template, row: repr(row).encode()
+        cursor.fetchone.return_value = (1, 0, 1)
+        connection = mock.MagicMock()
+        connection.cursor.return_value.__enter__.return_value = cursor
+
+        history.upsert_cars(connection, pd.DataFrame({'id': [1]}), datetime(2026, 10, 1, tzinfo=timezone.utc))
+
+        self.assertEqual(
+            cursor.execute.call_args_list[0],
+            mock.call('SELECT pg_advisory_xact_lock(%s)', [history.LOAD_LOCK_ID]),
+        )
+        self.assertEqual(cursor.execute.call_count, 2)
+
+    def test_delisting_skipped_when_crawl_saw_too_few_cars(self):
+        cursor = mock.MagicMock(rowcount=40)
+        connection = mock.MagicMock()
+        connection.cursor.return_value.__enter__.return_value = cursor
+        now = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+        cursor.fetchone.return_value = (100, 1000)
+        self.assertIsNone(history.mark_delisted(connection, 5, now))
+        self.assertEqual(cursor.execute.call_count, 1)
+
+        cursor.fetchone.return_value = (960, 1000)
+        self.assertEqual(history.mark_delisted(connection, 5, now), 40)
+        sql, params = cursor.execute.call_args[0]
+        self.assertIn('NOT EXISTS', sql)
+        self.assertEqual(params, {'job_id': 5, 'now': now})
+
+    def test_duplicate_ids_block_migration_until_deduplicated(self):
+        connection = car_tables(self)
+        migration = import_module('apps.cars.migrations.0003_carpricehistory')
+        now = datetime(2026, 10, 19, tzinfo=timezone.utc)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO tbl_auto_raw_taller (id, title, price, fecha) VALUES "
+                "(1, 'viejo', 100, '2026-10-01'), (1, 'nuevo', 120, '2026-10-02'), (2, 'único', 90, '2026-10-01')"
+            )
+            cursor.execute('SAVEPOINT antes')
+            with self.assertRaisesRegex(psycopg2.errors.RaiseException, '1 filas con id repetido'):
+                cursor.execute(migration.UNIQUE_ID_AND_SEED)
+            cursor.execute('ROLLBACK TO SAVEPOINT antes')
+
+            self.assertEqual(history.deduplicate_cars(connection, now), 1)
+            cursor.execute(f'SELECT id, title, deduplicated_at FROM {history.DUPLICATES_TABLE}')
+            self.assertEqual(cursor.fetchall(), [(1, 'viejo', now)])
+
+            cursor.execute(migration.UNIQUE_ID_AND_SEED)
+            cursor.execute('SELECT id, title FROM tbl_auto_raw_taller ORDER BY id')
+            self.assertEqual(cursor.fetchall(), [(1, 'nuevo'), (2, 'único')])
+            self.assertFalse(history.ensure_unique_id(connection))
+
+    def test_api_validates_max_points(self):
+        url = reverse('cars:api_car_price_history', args=[7])
+        self.assertEqual(self.client.get(url, {'max_points': '1'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'max_points': 'x'}).status_code, 400)
+
+
+class PartitionTests(SimpleTestCase):
+    def test_monthly_partition_names_and_bounds(self):
+        month = date(2026, 12, 1)
+        name = partitions.partition_name(month)
+
+        self.assertEqual(name, 'tbl_auto_raw_taller_y2026m12')
+        self.assertEqual(partitions.partition_month(name), month)
+        self.assertIsNone(partitions.partition_month('tbl_auto_raw_taller_legacy'))
+        self.assertEqual(
+            partitions.month_bounds(month),
+            (datetime(2026, 12, 1, tzinfo=timezone.utc), datetime(2027, 1, 1, tzinfo=timezone.utc)),
+        )
+        self.assertEqual(partitions.add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+
+    def test_hot_queries_start_at_a_partition_boundary(self):
+        now = datetime(2026, 10, 19, 15, 30, tzinfo=timezone.utc)
+        self.assertEqual(partitions.hot_since(now, months=3), datetime(2026, 8, 1, tzinfo=timezone.utc))
+
+    def test_ensure_partitions_is_noop_on_plain_table(self):
+        cursor = mock.MagicMock()
+        cursor.fetchone.return_value = (False,)
+        connection = mock.MagicMock()
+        connection.cursor.return_value.__enter__.return_value = cursor
+
+        self.assertEqual(partitions.ensure_partitions(connection, datetime(2026, 10, 1, tzinfo=timezone.utc)), [])
+        self.assertEqual(cursor.execute.call_count, 1)
+
+
+class CarListTests(SimpleTestCase):
+    def test_cursor_round_trip(self):
+        fecha = datetime(2026, 10, 19, 15, 30, 12, 345678, tzinfo=timezone.utc)
+        self.assertEqual(views.decode_cursor(views.encode_cursor(fecha, 42)), (fecha, 42))
+        for cursor in ['no-es-base64!', views.encode_cursor(fecha, 42)[:-4]]:
+            with self.assertRaises(ValueError):
+                views.decode_cursor(cursor)
+
+    def test_api_rejects_invalid_filters(self):
+        url = reverse('cars:api_car_list')
+        self.assertEqual(self.client.get(url, {'limit': '0'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'year_min': 'dos mil'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'price_max': 'caro'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'xyz'}).status_code, 400)
+
+
+class FacetCubeTests(SimpleTestCase):
+    def setUp(self):
+        # brand, fuel, transmission, subcategory, location, year, autos
+        self.cube = facets.FacetCube.from_rows([
+            ('TOYOTA', 'Gasolina', 'Mecánica', 'SUV', 'Lima', 2018, 5),
+            ('TOYOTA', 'Diesel', 'Automática', 'SUV', 'Lima', 2020, 3),
+            ('KIA', 'Gasolina', 'Mecánica', 'Sedán', 'Arequipa', 2019, 4),
+            ('KIA', None, 'Mecánica', 'Sedán', 'Lima', 2022, 2),
+        ])
+
+    def test_each_facet_counts_with_the_other_filters(self):
+        result = self.cube.facet_counts({'brand': ['TOYOTA'], 'year_min': 2018, 'year_max': 2020})
+
+        self.assertEqual(result['total'], 8)
+        # La faceta marca ignora su propio filtro: muestra cuántos suma KIA
+        self.assertEqual(result['facets']['brand'], [('TOYOTA', 8), ('KIA', 4)])
+        self.assertEqual(result['facets']['fuel'], [('Gasolina', 5), ('Diesel', 3)])
+        self.assertEqual(result['facets']['year'], [(2020, 3), (2018, 5)])
+
+    def test_nulls_count_in_total_but_are_not_options(self):
+        result = self.cube.facet_counts()
+
+        self.assertEqual(result['total'], 14)
+        self.assertEqual(result['facets']['fuel'], [('Gasolina', 9), ('Diesel', 3)])
+
+    def test_saved_cube_answers_the_same(self):
+        path = os.path.join(tempfile.mkdtemp(), 'facets.npz')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        self.cube.save(path)
+
+        filters = {'fuel': ['Gasolina'], 'location': ['Lima']}
+        self.assertEqual(facets.get_cube(path).facet_counts(filters), self.cube.facet_counts(filters))
+
+    def test_api_without_cube(self):
+        with mock.patch.object(facets, 'get_cube', return_value=None):
+            response = self.client.get(reverse('cars:api_car_facets'))
+        self.assertEqual(response.status_code, 503)
@@ -9,4 +9,8 @@ app_name = 'cars'
 urlpatterns = [
     # API endpoints
     path('api/stats/', views.scraping_stats, name='api_scraping_stats'),
+    path('api/cars/', views.car_list, name='api_car_list'),
+    path('api/facets/', views.car_facets, name='api_car_facets'),
+    path('api/export/', views.export_cars, name='api_export_cars'),
+    path('api/cars/<int:car_id>/price-history/', views.car_price_history, name='api_car_price_history'),
 ]
@@ -9,8 +9,50 @@ Las funcionalidades de scraping deben ejecutarse mediante:
 Si necesitas endpoints API para scraping, agrégalos aquí usando DRF.
 """
 
-from django.http import JsonResponse
-from .models import Car, ScrapingJob
+import base64
+import math
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.db.models import BooleanField, F, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Mod, RowNumber
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from . import export
+from .models import Car, CarPriceHistory, ScrapingJob
+from .partitions import hot_since
+
+
+# Puntos máximos de una serie de precios (?max_points=)
+PRICE_HISTORY_POINTS = 200
+PRICE_HISTORY_MAX_POINTS = 2000
+
+# Autos por página del listado (?limit=)
+CAR_LIST_LIMIT = 50
+CAR_LIST_MAX_LIMIT = 200
+
+# Columnas que devuelve el listado (solo estas se leen de la tabla)
+CAR_LIST_COLUMNS = [
+    'id', 'title', 'link', 'image', 'brand', 'year', 'fuel', 'transmission',
+    'location', 'subcategory', 'price', 'fecha',
+]
+
+# Filtros del listado: parámetro -> (lookup, conversión)
+CAR_LIST_FILTERS = {
+    'brand': ('brand', str),
+    'fuel': ('fuel', str),
+    'transmission': ('transmission', str),
+    'subcategory': ('subcategory', str),
+    'location': ('location', str),
+    'year_min': ('year__gte', int),
+    'year_max': ('year__lte', int),
+    'price_min': ('price__gte', Decimal),
+    'price_max': ('price__lte', Decimal),
+}
 
 
 # Ejemplo de endpoint API para obtener estadísticas de scraping
@@ -35,3 +77,220 @@ def scraping_stats(request):
         'total_cars': total_cars,
         'recent_jobs': jobs_data,
     })
+
+
+def encode_cursor(fecha, car_id):
+    """Cursor opaco con la posición (fecha, id) del último auto de una página"""
+    return base64.urlsafe_b64encode(f'{fecha.isoformat()}|{car_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Posición (fecha, id) de un cursor de encode_cursor
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        fecha, car_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        fecha = parse_datetime(fecha)
+        car_id = int(car_id)
+    except (ValueError, UnicodeError):
+        raise ValueError('cursor inválido')
+    if fecha is None:
+        raise ValueError('cursor inválido')
+    return fecha, car_id
+
+
+@require_GET
+def car_list(request):
+    """
+    API endpoint con el listado de autos activos, del más reciente al más antiguo
+
+    Filtros: brand, fuel, transmission, subcategory, location, year_min,
+    year_max, price_min y price_max (conteos en /cars/api/facets/).
+    Paginación por cursor (keyset) sobre (fecha, id): next_cursor se pasa
+    como ?cursor= para la página siguiente. Cada página recorre el índice
+    (fecha, id) o (brand, fecha, id) desde el cursor, así que cuesta lo
+    mismo a cualquier profundidad.
+    """
+    try:
+        limit = int(request.GET.get('limit', CAR_LIST_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= CAR_LIST_MAX_LIMIT:
+        return JsonResponse({'error': f'limit debe ser un entero entre 1 y {CAR_LIST_MAX_LIMIT}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    filters = {}
+    for param, (lookup, convert) in CAR_LIST_FILTERS.items():
+        value = request.GET.get(param)
+        if not value:
+            continue
+        try:
+            filters[lookup] = convert(value)
+        except (ValueError, InvalidOperation):
+            return JsonResponse({'error': f'Valor inválido para {param}: {value}'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+    cars = Car.objects.filter(is_active=True, fecha__gte=hot_since(timezone.now()), **filters)
+    if request.GET.get('cursor'):
+        try:
+            fecha, car_id = decode_cursor(request.GET['cursor'])
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Comparación de filas: PostgreSQL la usa como límite del índice, aunque
+        # toda una carga comparta la misma fecha
+        cars = cars.filter(RawSQL('(fecha, id) < (%s, %s)', [fecha, car_id], output_field=BooleanField()))
+
+    # Un auto de más para saber si hay otra página
+    rows = list(cars.order_by('-fecha', '-id').values(*CAR_LIST_COLUMNS)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    for row in rows:
+        row['price'] = float(row['price']) if row['price'] is not None else None
+
+    return JsonResponse({
+        'results': rows,
+        'count': len(rows),
+        'next_cursor': encode_cursor(rows[-1]['fecha'], rows[-1]['id']) if has_more else None,
+    })
+
+
+@require_GET
+def car_facets(request):
+    """
+    API endpoint con los conteos por faceta para los filtros del listado
+
+    Mismos filtros que /cars/api/cars/ (sin precio); cada faceta de valores
+    se puede repetir (?brand=KIA&brand=TOYOTA). Responde desde el cubo en
+    memoria de apps/cars/facets.py, sin consultar la base; el cubo se
+    reconstruye al terminar cada scraping (o con build_facets).
+    """
+    # numpy se carga con el primer pedido, no al importar el URLconf
+    from . import facets
+
+    filters = {}
+    for column in facets.FACET_COLUMNS:
+        if column in facets.RANGE_COLUMNS:
+            for param in (f'{column}_min', f'{column}_max'):
+                value = request.GET.get(param)
+                if not value:
+                    continue
+                try:
+                    filters[param] = int(value)
+                except ValueError:
+                    return JsonResponse({'error': f'Valor inválido para {param}: {value}'},
+                                        status=status.HTTP_400_BAD_REQUEST)
+        elif request.GET.getlist(column):
+            filters[column] = request.GET.getlist(column)
+
+    cube = facets.get_cube()
+    if cube is None:
+        return JsonResponse({'error': 'Conteos no disponibles: ejecutar python manage.py build_facets'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    result = cube.facet_counts(filters)
+    return JsonResponse({
+        'total': result['total'],
+        'facets': {
+            column: [{'value': value, 'count': count} for value, count in counts]
+            for column, counts in result['facets'].items()
+        },
+        'built_at': cube.built_at,
+    })
+
+
+@require_GET
+def export_cars(request):
+    """
+    API endpoint para descargar autos en streaming (mismo formato que export_cars)
+
+    Parámetros: format (csv, csv.gz o parquet), since, until (AAAA-MM-DD o
+    ISO 8601) y job (ID de ScrapingJob). Las filas se leen con un cursor del
+    servidor y se envían por bloques, sin cargar la tabla en memoria.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return JsonResponse(
+            {'error': f'Formato no soportado: {fmt}. Usa uno de: {", ".join(export.FORMATS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    job = None
+    if request.GET.get('job'):
+        try:
+            job = ScrapingJob.objects.get(pk=int(request.GET['job']))
+        except (ValueError, ScrapingJob.DoesNotExist):
+            return JsonResponse({'error': f'No existe el ScrapingJob {request.GET["job"]}'},
+                                status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        sql, params = export.build_export_query(
+            since=export.parse_bound(request.GET.get('since')),
+            until=export.parse_bound(request.GET.get('until'), end=True),
+            job=job,
+            job_window=export.use_job_window(job),
+        )
+        if fmt == 'parquet':
+            export.require_pyarrow()
+    except export.ExportError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    chunks = export.iter_row_chunks(connection, sql, params)
+    if fmt == 'parquet':
+        body = export.render_parquet(chunks)
+    else:
+        body = export.render_csv(chunks, compress=fmt == 'csv.gz')
+
+    content_type, extension = export.FORMATS[fmt]
+    response = StreamingHttpResponse(body, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="datos_autos_neoauto.{extension}"'
+    return response
+
+
+@require_GET
+def car_price_history(request, car_id):
+    """
+    API endpoint con la serie de precios de un auto (car_price_history)
+
+    Si la serie tiene más de max_points cambios se toma uno de cada
+    ceil(total / max_points) en la base de datos, más el último. Usa el
+    índice (car, observed_at).
+    """
+    try:
+        max_points = min(int(request.GET.get('max_points', PRICE_HISTORY_POINTS)), PRICE_HISTORY_MAX_POINTS)
+    except ValueError:
+        max_points = 0
+    if max_points < 2:
+        return JsonResponse({'error': f'max_points debe ser un entero entre 2 y {PRICE_HISTORY_MAX_POINTS}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    history = CarPriceHistory.objects.filter(car_id=car_id)
+    total = history.count()
+    if not total:
+        return JsonResponse({'error': f'Sin historial de precios para el auto {car_id}'},
+                            status=status.HTTP_404_NOT_FOUND)
+
+    points = history.order_by('observed_at')
+    step = math.ceil(total / max_points)
+    if step > 1:
+        points = points.annotate(
+            position=Window(RowNumber(), order_by=F('observed_at').asc()),
+        ).annotate(
+            offset=Mod(F('position') - 1, step),
+        ).filter(Q(offset=0) | Q(position=total))
+
+    return JsonResponse({
+        'car_id': car_id,
+        'total_points': total,
+        'downsampled': step > 1,
+        'points': [
+            {
+                'price': float(price) if price is not None else None,
+                'observed_at': observed_at.isoformat(),
+                'scraping_job_id': job_id,
+            }
+            for price, observed_at, job_id in points.values_list('price', 'observed_at', 'scraping_job_id')
+        ],
+    })
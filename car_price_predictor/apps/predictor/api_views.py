@@ -1,16 +1,56 @@
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import PredictionInputSerializer, PredictionOutputSerializer
-from .ml.predictor import predictor
+from .serializers import PredictionInputSerializer, PredictionOutputSerializer, PriceCurveInputSerializer
+from .ml import INPUT_FIELDS, get_predictor, get_batcher, get_inference_client, get_prediction_cache
+from . import batch
 from .models import Prediction
 from apps.cars.models import Car
+from apps.cars.partitions import hot_since
+
+
+def _get_backend():
+    """Predictor de las vistas: el servicio de inferencia si está configurado, si no el local"""
+    if settings.PREDICTOR_SERVICE_SOCKET_DIR:
+        return get_inference_client(settings.PREDICTOR_SERVICE_SOCKET_DIR, settings.SECRET_KEY.encode())
+    return get_predictor()
+
+
+def _get_batcher():
+    """MicroBatcher configurado en settings, o None si el micro-batching está desactivado"""
+    # Con servicio de inferencia, las predicciones ya no corren en este proceso
+    if not settings.PREDICTOR_MICROBATCH or settings.PREDICTOR_SERVICE_SOCKET_DIR:
+        return None
+    return get_batcher(
+        get_predictor(),
+        max_wait=settings.PREDICTOR_MICROBATCH_WAIT_MS / 1000,
+        max_batch=settings.PREDICTOR_MICROBATCH_MAX_SIZE,
+    )
+
+
+def _get_cache(predictor):
+    """PredictionCache delante de predictor, o None si la caché está desactivada"""
+    if settings.PREDICTOR_CACHE not in ('local', 'django'):
+        return None
+    return get_prediction_cache(
+        predictor,
+        backend=settings.PREDICTOR_CACHE,
+        maxsize=settings.PREDICTOR_CACHE_SIZE,
+        ttl=settings.PREDICTOR_CACHE_TTL,
+        alias=settings.PREDICTOR_CACHE_ALIAS,
+    )
 
 
 @api_view(['GET'])
 def get_form_options(request):
     """Obtener todas las opciones disponibles para el formulario"""
     try:
+        predictor = _get_backend()
         options = {
             'brands': predictor.get_available_brands(),
             'fuels': predictor.get_available_fuels(),
@@ -18,6 +58,7 @@ def get_form_options(request):
             'locations': predictor.get_available_locations(),
             'subcategories': predictor.get_available_subcategories(),
             'years': list(range(2026, 1989, -1)),
+            'model_version': predictor.version,
         }
         return Response(options)
     except Exception as e:
@@ -41,8 +82,12 @@ def predict_price(request):
     try:
         data = serializer.validated_data
 
-        # Realizar predicción
-        predicted_price = predictor.predict(
+        # Realizar predicción (agrupada con otras peticiones si hay micro-batching;
+        # las combinaciones ya vistas salen de la caché sin pasar por el modelo)
+        backend = _get_backend()
+        predictor = _get_batcher() or backend
+        predictor = _get_cache(predictor) or predictor
+        result = predictor.predict_detailed(
             brand=data['brand'],
             year=data['year'],
             fuel=data['fuel'],
@@ -50,6 +95,7 @@ def predict_price(request):
             location=data['location'],
             subcategory=data['subcategory']
         )
+        predicted_price = result['price']
 
         # Guardar predicción en BD
         Prediction.objects.create(
@@ -64,7 +110,10 @@ def predict_price(request):
         )
 
         # Obtener métricas
-        metrics = predictor.get_metrics()
+        metrics = backend.get_metrics()
+
+        # Solo las particiones de los últimos meses (apps/cars/partitions.py)
+        recent = hot_since(timezone.now())
 
         # Buscar autos similares - MUY similares (misma marca, combustible, transmisión, tipo)
         similar_cars_raw = Car.objects.filter(
@@ -74,7 +123,9 @@ def predict_price(request):
             subcategory=data['subcategory'],
             year__gte=data['year']-3,
             year__lte=data['year']+3,
-            price__isnull=False
+            price__isnull=False,
+            is_active=True,
+            fecha__gte=recent
         ).exclude(price=0).order_by('?')[:5]
 
         # Si no hay suficientes, buscar solo por marca y año
@@ -83,7 +134,9 @@ def predict_price(request):
                 brand=data['brand'],
                 year__gte=data['year']-3,
                 year__lte=data['year']+3,
-                price__isnull=False
+                price__isnull=False,
+                is_active=True,
+                fecha__gte=recent
             ).exclude(price=0).order_by('?')[:5]
 
         similar_cars = [
@@ -105,6 +158,8 @@ def predict_price(request):
             'input_data': data,
             'metrics': metrics,
             'similar_cars': similar_cars,
+            'unseen_categories': result['unseen'],
+            'model_version': result['version'],
         }
 
         return Response(response_data)
@@ -116,10 +171,95 @@ def predict_price(request):
         )
 
 
+@api_view(['POST'])
+def predict_price_curve(request):
+    """
+    Endpoint para la curva de precios de una configuración
+
+    Varía un solo campo (año, ubicación o combustible) y predice todos los
+    puntos en una llamada vectorizada sobre la misma fila codificada.
+    """
+    serializer = PriceCurveInputSerializer(data=request.data)
+
+    if not serializer.is_valid():
+        return Response(
+            serializer.errors,
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        data = serializer.validated_data
+        vary, values = data['vary'], data['values']
+        base = {field: data[field] for field in INPUT_FIELDS if field in data}
+
+        result = _get_backend().predict_curve(base, vary, values)
+
+        points = [
+            {
+                vary: value,
+                'predicted_price': price,
+                'unseen_categories': unseen,
+            }
+            for value, price, unseen in zip(values, result['prices'], result['unseen'])
+        ]
+
+        return Response({
+            'vary': vary,
+            'base': {field: value for field, value in base.items() if field != vary},
+            'points': points,
+            'model_version': result['version'],
+        })
+
+    except Exception as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@csrf_exempt
+@require_POST
+def predict_price_batch(request):
+    """
+    Endpoint para predecir muchos autos en streaming
+
+    Vista de Django (no DRF) para leer el cuerpo y escribir la respuesta
+    a medida que avanza, sin parsear ni renderizar todo en memoria.
+
+    Entrada según Content-Type: application/json (array de objetos),
+    application/x-ndjson (un objeto por línea) o text/csv (con encabezado).
+    Salida: NDJSON, o CSV si Accept es text/csv o ?output=csv.
+    """
+    input_format = batch.detect_input_format(request.content_type)
+    if input_format is None:
+        return JsonResponse(
+            {'error': f'Content-Type no soportado: {request.content_type}. '
+                      f'Usa uno de: {", ".join(batch.INPUT_FORMATS)}'},
+            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+
+    try:
+        model = _get_backend().snapshot()
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    records = batch.iter_records(request, input_format)
+    results = batch.closing(batch.predict_stream(model, records), model)
+
+    if request.GET.get('output') == 'csv' or 'text/csv' in request.headers.get('Accept', ''):
+        response = StreamingHttpResponse(batch.render_csv(results), content_type='text/csv; charset=utf-8')
+    else:
+        response = StreamingHttpResponse(batch.render_ndjson(results), content_type='application/x-ndjson')
+
+    response['X-Model-Version'] = model.version
+    return response
+
+
 @api_view(['GET'])
 def get_dashboard_stats(request):
     """Obtener estadísticas para el dashboard"""
     try:
+        predictor = _get_backend()
         total_cars = Car.objects.count()
         total_predictions = Prediction.objects.count()
         metrics = predictor.get_metrics()
@@ -127,7 +267,9 @@ def get_dashboard_stats(request):
         # Obtener últimos autos scrapeados con imágenes
         recent_cars_raw = Car.objects.filter(
             image__isnull=False,
-            price__isnull=False
+            price__isnull=False,
+            is_active=True,
+            fecha__gte=hot_since(timezone.now())
         ).exclude(image='').order_by('-id')[:12]
 
         # Mapear para el frontend
@@ -152,8 +294,17 @@ def get_dashboard_stats(request):
             'model_mae': metrics.get('test_mae', 0),
             'model_rmse': metrics.get('test_rmse', 0),
             'recent_cars': recent_cars,
+            'model_version': predictor.version,
         }
 
+        batcher = _get_batcher()
+        if batcher is not None:
+            stats['microbatch'] = batcher.stats()
+
+        cache = _get_cache(batcher or predictor)
+        if cache is not None:
+            stats['prediction_cache'] = cache.stats()
+
         return Response(stats)
 
     except Exception as e:
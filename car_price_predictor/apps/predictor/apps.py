@@ -1,6 +1,23 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def _is_management_command():
+    """True si el proceso es manage.py/django-admin con un comando distinto de runserver"""
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    return program in ('manage.py', 'django-admin') and sys.argv[1:2] != ['runserver']
 
 
 class PredictorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.predictor'
+
+    def ready(self):
+        # Precarga opcional del modelo en segundo plano al arrancar el servidor
+        # (los comandos de manage.py nunca cargan el modelo)
+        if settings.PREDICTOR_WARMUP and not _is_management_command():
+            from .ml import warm_up
+            warm_up()
@@ -0,0 +1,246 @@
+"""
+Predicción en lote con entrada y salida en streaming
+
+Lee los autos del cuerpo de la petición a medida que llegan (array JSON,
+NDJSON o CSV), los predice en bloques vectorizados y escribe cada bloque
+en la respuesta apenas está listo. Ni la entrada ni la salida se guardan
+completas en memoria.
+"""
+
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+
+from .ml import INPUT_FIELDS
+
+
+# Autos por bloque de predicción
+CHUNK_SIZE = 1000
+
+# Bytes leídos del cuerpo por iteración al decodificar un array JSON
+READ_SIZE = 64 * 1024
+
+CSV_COLUMNS = ['row'] + INPUT_FIELDS + ['predicted_price', 'unseen_categories', 'error']
+
+INPUT_FORMATS = {
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/jsonlines': 'ndjson',
+    'text/csv': 'csv',
+}
+
+
+class BatchInputError(ValueError):
+    """El cuerpo de la petición no se puede seguir leyendo"""
+
+
+def detect_input_format(content_type):
+    """Formato de entrada según Content-Type (None si no está soportado)"""
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    return INPUT_FORMATS.get(media_type)
+
+
+def iter_json_array(stream, read_size=READ_SIZE):
+    """
+    Decodifica un array JSON de objetos elemento por elemento
+
+    Raises:
+        BatchInputError: Si el JSON está mal formado o un elemento no es un objeto
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer, pos, eof = '', 0, False
+    started, expect_value, first = False, True, True
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+
+        if pos == len(buffer):
+            if eof:
+                raise BatchInputError('JSON incompleto: falta cerrar el array')
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer = buffer[pos:] + text_decoder.decode(chunk or b'', final=eof)
+            pos = 0
+            continue
+
+        char = buffer[pos]
+        if not started:
+            if char != '[':
+                raise BatchInputError('Se esperaba un array JSON de autos')
+            started = True
+            pos += 1
+        elif not expect_value:
+            if char == ',':
+                expect_value = True
+                pos += 1
+            elif char == ']':
+                return
+            else:
+                raise BatchInputError(f"JSON inválido: se esperaba ',' o ']' y se encontró {char!r}")
+        elif char == ']' and first:
+            return
+        elif char != '{':
+            raise BatchInputError('Cada elemento del array debe ser un objeto')
+        else:
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise BatchInputError(f'JSON inválido: {e}')
+                # Objeto incompleto: leer más y reintentar desde su inicio
+                chunk = stream.read(read_size)
+                eof = not chunk
+                buffer = buffer[pos:] + text_decoder.decode(chunk or b'', final=eof)
+                pos = 0
+                continue
+            yield record
+            pos = end
+            expect_value, first = False, False
+
+
+def iter_ndjson(stream):
+    """Un objeto JSON por línea; las líneas inválidas se entregan como errores de fila"""
+    for line in codecs.iterdecode(stream, 'utf-8-sig'):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            record = {'__error__': f'JSON inválido: {e.msg}'}
+        yield record if isinstance(record, dict) else {'__error__': 'Se esperaba un objeto JSON'}
+
+
+def iter_csv(stream):
+    """Filas de un CSV con encabezado (brand, year, fuel, transmission, location, subcategory)"""
+    return csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+
+
+def iter_records(stream, input_format):
+    if input_format == 'json':
+        return iter_json_array(stream)
+    if input_format == 'ndjson':
+        return iter_ndjson(stream)
+    return iter_csv(stream)
+
+
+def parse_record(record):
+    """
+    Valida un auto de la entrada
+
+    Returns:
+        tuple: (tupla en el orden de INPUT_FIELDS, None) o (None, mensaje de error)
+    """
+    if '__error__' in record:
+        return None, record['__error__']
+
+    missing = [field for field in INPUT_FIELDS if record.get(field) in (None, '')]
+    if missing:
+        return None, f"Faltan campos: {', '.join(missing)}"
+
+    try:
+        year = int(record['year'])
+    except (TypeError, ValueError):
+        return None, f"Año inválido: {record['year']!r}"
+
+    return (
+        str(record['brand']), year, str(record['fuel']), str(record['transmission']),
+        str(record['location']), str(record['subcategory']),
+    ), None
+
+
+def predict_stream(model, records, chunk_size=CHUNK_SIZE):
+    """
+    Predice los autos en bloques
+
+    Args:
+        model (LoadedModel): Versión del modelo (la misma para todo el lote)
+        records (iterable): Diccionarios con los datos de entrada
+
+    Yields:
+        list: Resultados de cada bloque, un dict por auto en el orden de entrada
+    """
+    records = enumerate(records)
+    while True:
+        # Si la entrada se corta a mitad de bloque, se predicen las filas ya
+        # leídas antes de propagar el error
+        chunk, read_error = [], None
+        try:
+            chunk.extend(islice(records, chunk_size))
+        except BatchInputError as e:
+            read_error = e
+        if not chunk and read_error is None:
+            return
+
+        results, valid_rows, valid_positions = [], [], []
+        for index, record in chunk:
+            row, error = parse_record(record)
+            result = {'row': index}
+            if error:
+                result['error'] = error
+            else:
+                result.update(zip(INPUT_FIELDS, row))
+                valid_positions.append(len(results))
+                valid_rows.append(row)
+            results.append(result)
+
+        prices, unseen = model.predict_many(valid_rows)
+        for position, price, row_unseen in zip(valid_positions, prices, unseen):
+            results[position]['predicted_price'] = round(float(price), 2)
+            results[position]['unseen_categories'] = row_unseen
+
+        if results:
+            yield results
+        if read_error is not None:
+            raise read_error
+
+
+def closing(result_chunks, model):
+    """Entrega los bloques y al final llama a model.close() si existe (sesión del servicio de inferencia)"""
+    try:
+        yield from result_chunks
+    finally:
+        close = getattr(model, 'close', None)
+        if close is not None:
+            close()
+
+
+def render_ndjson(result_chunks):
+    """Una línea JSON por auto; un error de lectura termina con una línea {"error": ...}"""
+    try:
+        for results in result_chunks:
+            yield ''.join(json.dumps(result, ensure_ascii=False) + '\n' for result in results)
+    except BatchInputError as e:
+        yield json.dumps({'error': str(e)}, ensure_ascii=False) + '\n'
+
+
+def render_csv(result_chunks):
+    """CSV con encabezado; un error de lectura termina con una fila que solo tiene 'error'"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writeheader()
+    yield flush()
+    try:
+        for results in result_chunks:
+            for result in results:
+                unseen = result.get('unseen_categories')
+                writer.writerow({
+                    **result,
+                    'unseen_categories': json.dumps(unseen, ensure_ascii=False) if unseen else '',
+                })
+            yield flush()
+    except BatchInputError as e:
+        writer.writerow({'error': str(e)})
+        yield flush()
@@ -0,0 +1,44 @@
+import os
+import pickle
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.predictor.ml.artifacts import MODEL_FILE, resolve_artifact_dir, save_forest_bundle
+
+
+class Command(BaseCommand):
+    help = 'Compila model.pkl de la versión activa al bundle mmap (forest/) que comparten los workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model-dir',
+            default=os.path.join(os.path.dirname(__file__), '..', '..', 'ml'),
+            help='Directorio con model.pkl (por defecto apps/predictor/ml)'
+        )
+
+    def handle(self, *args, **options):
+        version, model_dir = resolve_artifact_dir(os.path.abspath(options['model_dir']))
+        self.stdout.write(f'  Versión activa: {version}')
+        model_path = os.path.join(model_dir, MODEL_FILE)
+
+        if not os.path.exists(model_path):
+            raise CommandError(f'No existe {model_path}. Ejecuta primero el entrenamiento.')
+
+        start = time.perf_counter()
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+        self.stdout.write(f'  model.pkl cargado en {time.perf_counter() - start:.2f} segundos')
+
+        bundle_path = save_forest_bundle(model_dir, model)
+        if bundle_path is None:
+            self.stdout.write(self.style.WARNING(
+                f'[WARN] {type(model).__name__} no es un bosque compilable; se seguirá usando model.pkl'
+            ))
+            return
+
+        size = sum(
+            os.path.getsize(os.path.join(bundle_path, name)) for name in os.listdir(bundle_path)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Bundle escrito en {bundle_path} ({size / 1024 / 1024:.1f} MB)'
+        ))
@@ -0,0 +1,59 @@
+import os
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.predictor.ml.service import DEFAULT_SOCKET_DIR, InferenceService
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = 'Inicia el pool de procesos de inferencia que atiende al API por sockets Unix'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.PREDICTOR_SERVICE_WORKERS,
+            help='Procesos de inferencia (por defecto uno por núcleo)'
+        )
+        parser.add_argument(
+            '--socket-dir',
+            default=settings.PREDICTOR_SERVICE_SOCKET_DIR,
+            help=f'Directorio de los sockets (por defecto PREDICTOR_SERVICE_SOCKET_DIR o {DEFAULT_SOCKET_DIR})'
+        )
+        parser.add_argument(
+            '--model-dir',
+            default=os.path.join(os.path.dirname(__file__), '..', '..', 'ml'),
+            help='Directorio de artefactos del modelo (por defecto apps/predictor/ml)'
+        )
+
+    def handle(self, *args, **options):
+        socket_dir = options['socket_dir'] or DEFAULT_SOCKET_DIR
+        service = InferenceService(
+            socket_dir=socket_dir,
+            model_dir=os.path.abspath(options['model_dir']),
+            authkey=settings.SECRET_KEY.encode(),
+            workers=options['workers'],
+            reload_interval=settings.PREDICTOR_RELOAD_INTERVAL,
+        )
+
+        # SIGTERM (systemd, docker stop) detiene el pool igual que Ctrl+C
+        signal.signal(signal.SIGTERM, _raise_interrupt)
+
+        service.start()
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] {service.workers} procesos de inferencia en {socket_dir}'
+        ))
+        if not settings.PREDICTOR_SERVICE_SOCKET_DIR:
+            self.stdout.write(self.style.WARNING(
+                f'[WARN] Define PREDICTOR_SERVICE_SOCKET_DIR={socket_dir} en el API para usar el servicio'
+            ))
+
+        try:
+            service.supervise()
+        except KeyboardInterrupt:
+            self.stdout.write('  Servicio detenido')
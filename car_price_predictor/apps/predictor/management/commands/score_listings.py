@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import DecimalField, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.cars.models import Car
+from apps.predictor.ml.artifacts import ENCODERS_FILE, resolve_artifact_dir
+from apps.predictor.models import ListingScore
+from apps.predictor.scoring import CAR_FIELDS, init_worker, score_rows
+
+
+UPDATE_FIELDS = ['precio_predicho', 'precio_publicado', 'residuo', 'residuo_pct',
+                 'model_version', 'car_fecha', 'scored_at']
+
+
+def bounded_map(executor, fn, iterable, max_pending):
+    """Como executor.map, pero con a lo sumo max_pending tareas en cola (memoria acotada)"""
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def pending_scores(queryset, version):
+    """
+    Autos sin puntaje de la versión activa o cuyo precio cambió desde que se puntuaron
+
+    No se compara fecha: cada carga la actualiza en todos los autos que ve,
+    aunque no hayan cambiado. Un precio vacío o 0 se guarda como NULL en
+    precio_publicado (ver scoring.score_rows), así que ambos lados se comparan
+    con COALESCE(..., 0).
+    """
+    zero = Value(Decimal('0'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    return queryset.annotate(
+        scored_price=Coalesce('score__precio_publicado', zero),
+        current_price=Coalesce('price', zero),
+    ).filter(
+        Q(score__isnull=True)
+        | ~Q(score__model_version=version)
+        | ~Q(scored_price=F('current_price'))
+    )
+
+
+class Command(BaseCommand):
+    help = 'Calcula precio predicho y residuo de todos los autos publicados (tabla ListingScore)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Autos por bloque de lectura, predicción y escritura'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Procesos de predicción (1 = en este proceso)'
+        )
+        parser.add_argument(
+            '--since-last-run',
+            action='store_true',
+            help='Solo autos sin puntaje de la versión activa o con otro precio que al puntuarse'
+        )
+        parser.add_argument(
+            '--model-dir',
+            default=os.path.join(os.path.dirname(__file__), '..', '..', 'ml'),
+            help='Directorio de artefactos del modelo (por defecto apps/predictor/ml)'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = max(options['workers'], 1)
+
+        # Todos los procesos usan la misma versión aunque se publique otra durante la corrida
+        version, artifact_dir = resolve_artifact_dir(os.path.abspath(options['model_dir']))
+        if not os.path.exists(os.path.join(artifact_dir, ENCODERS_FILE)):
+            raise CommandError(f'No hay modelo en {artifact_dir}. Ejecuta primero el entrenamiento.')
+        self.stdout.write(f'  Versión del modelo: {version}')
+
+        # Sin ORDER BY: el cursor del servidor recorre la tabla sin ordenarla
+        queryset = Car.objects.filter(is_active=True).order_by()
+        if options['since_last_run']:
+            queryset = pending_scores(queryset, version)
+
+        total = queryset.count()
+        self.stdout.write(f'  Autos a puntuar: {total}')
+        if not total:
+            self.stdout.write(self.style.SUCCESS('[OK] No hay autos nuevos ni con cambio de precio'))
+            return
+
+        rows = queryset.values_list(*CAR_FIELDS).iterator(chunk_size=chunk_size)
+        chunks = iter(lambda: list(islice(rows, chunk_size)), [])
+
+        start = time.perf_counter()
+        executor = None
+        if workers == 1:
+            init_worker(artifact_dir, version)
+            results = map(score_rows, chunks)
+        else:
+            # spawn: los procesos no heredan la conexión a la BD ni el cursor abierto
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(artifact_dir, version),
+            )
+            results = bounded_map(executor, score_rows, chunks, max_pending=workers * 2)
+
+        scored = 0
+        try:
+            for scores in results:
+                self.write_scores(scores, version)
+                scored += len(scores)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'  {scored}/{total} autos ({scored / elapsed:.0f} autos/s)')
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n[OK] {scored} autos puntuados en {time.perf_counter() - start:.1f} segundos'
+        ))
+
+    def write_scores(self, scores, version):
+        """Inserta o actualiza los puntajes de un bloque con un solo INSERT ... ON CONFLICT"""
+        scored_at = timezone.now()
+        ListingScore.objects.bulk_create(
+            [
+                ListingScore(
+                    car_id=car_id,
+                    precio_predicho=predicted,
+                    precio_publicado=price,
+                    residuo=residual,
+                    residuo_pct=residual_pct,
+                    model_version=version,
+                    car_fecha=fecha,
+                    scored_at=scored_at,
+                )
+                for car_id, predicted, price, residual, residual_pct, fecha in scores
+            ],
+            update_conflicts=True,
+            unique_fields=['car'],
+            update_fields=UPDATE_FIELDS,
+        )
@@ -0,0 +1,134 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.predictor.ml.artifacts import publish_artifacts
+from apps.predictor.ml.backends import BACKENDS, DEFAULT_BACKEND
+from apps.predictor.ml.incremental import full_rebuild_metadata
+from apps.predictor.ml.search import previous_search
+from apps.predictor.training import (
+    DEFAULT_FILTERS, load_features, peak_memory_mb, train, training_price_bounds,
+)
+
+
+class Command(BaseCommand):
+    help = 'Entrena el modelo con los autos de tbl_auto_raw_taller y publica una nueva versión'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backend',
+            choices=BACKENDS,
+            default=os.getenv('MODEL_BACKEND', DEFAULT_BACKEND),
+            help='Backend del modelo (por defecto MODEL_BACKEND o forest)'
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=float(os.getenv('TRAIN_BUDGET_SECONDS', '600')),
+            help='Segundos máximos de búsqueda de hiperparámetros + entrenamiento final'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=20000,
+            help='Filas por bloque de lectura desde PostgreSQL'
+        )
+        parser.add_argument('--price-min', type=float, default=DEFAULT_FILTERS['price_min'])
+        parser.add_argument('--price-max', type=float, default=DEFAULT_FILTERS['price_max'])
+        parser.add_argument('--year-min', type=int, default=DEFAULT_FILTERS['year_min'])
+        parser.add_argument('--year-max', type=int, default=DEFAULT_FILTERS['year_max'])
+        parser.add_argument(
+            '--iqr-factor',
+            type=float,
+            default=DEFAULT_FILTERS['iqr_factor'],
+            help='Outliers fuera de [Q1 - f*IQR, Q3 + f*IQR] (0 = sin filtro)'
+        )
+        parser.add_argument(
+            '--min-category-count',
+            type=int,
+            default=DEFAULT_FILTERS['min_category_count'],
+            help='Autos mínimos por marca, combustible, etc. (0 = sin filtro)'
+        )
+        parser.add_argument(
+            '--snapshot-dir',
+            default=os.getenv('TRAIN_SNAPSHOT_DIR', ''),
+            help='Snapshots de la matriz de features (por defecto <model-dir>/snapshots)'
+        )
+        parser.add_argument(
+            '--no-snapshot',
+            action='store_true',
+            help='Leer y codificar los autos sin usar ni guardar snapshots'
+        )
+        parser.add_argument(
+            '--rebuild-snapshot',
+            action='store_true',
+            help='Reconstruir el snapshot aunque exista uno para los mismos datos'
+        )
+        parser.add_argument(
+            '--model-dir',
+            default=os.path.join(os.path.dirname(__file__), '..', '..', 'ml'),
+            help='Directorio de artefactos del modelo (por defecto apps/predictor/ml)'
+        )
+
+    def handle(self, *args, **options):
+        model_dir = os.path.abspath(options['model_dir'])
+        backend = options['backend']
+        start = time.perf_counter()
+
+        snapshot_dir = None
+        if not options['no_snapshot']:
+            snapshot_dir = options['snapshot_dir'] or os.path.join(model_dir, 'snapshots')
+
+        filters = {
+            'price_min': options['price_min'],
+            'price_max': options['price_max'],
+            'year_min': options['year_min'],
+            'year_max': options['year_max'],
+            'iqr_factor': options['iqr_factor'],
+            'min_category_count': options['min_category_count'],
+        }
+
+        self.stdout.write('  Cargando autos (filtros en PostgreSQL)...')
+        try:
+            X, y, features, watermark, from_snapshot = load_features(
+                connection,
+                backend,
+                snapshot_dir=snapshot_dir,
+                rebuild=options['rebuild_snapshot'],
+                chunk_size=options['chunk_size'],
+                log=self.stdout.write,
+                **filters,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        if len(X) < 100:
+            raise CommandError(f'Solo hay {len(X)} autos válidos. Se necesitan al menos 100.')
+
+        matrix_mb = X.memory_usage(deep=True).sum() / 1024 / 1024
+        self.stdout.write(
+            f'  {len(X)} autos x {X.shape[1]} features en {matrix_mb:.1f} MB '
+            f'({"snapshot" if from_snapshot else "leídos de la BD"}, pico del proceso {peak_memory_mb():.0f} MB)'
+        )
+
+        warm_start = previous_search(model_dir, backend)
+        self.stdout.write(f'  Entrenando {backend} (presupuesto {options["budget"]:.0f} s, '
+                          f'{len(warm_start)} configuraciones previas)...')
+        model, metrics = train(X, y, features, backend, options['budget'], warm_start=warm_start,
+                               log=self.stdout.write)
+        metrics.update(full_rebuild_metadata(watermark, model))
+        # Mismos recortes para los autos del reentrenamiento incremental
+        metrics['filters'] = filters
+        metrics['price_bounds'] = training_price_bounds(connection, watermark, **filters)
+
+        version = publish_artifacts(model_dir, model, features.encoders, metrics, features=features)
+
+        self.stdout.write(
+            f'  Test: MAE ${metrics["test_mae"]:,.2f} | R² {metrics["test_r2"]:.4f} | '
+            f'CV R² {metrics["cv_r2_mean"]:.4f} ± {metrics["cv_r2_std"]:.4f}'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'\n[OK] Versión {version} publicada en {time.perf_counter() - start:.1f} segundos '
+            f'(pico de memoria {peak_memory_mb():.0f} MB)'
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-19 18:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0002_alter_car_options'),
+        ('predictor', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingScore',
+            fields=[
+                ('car', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='score', serialize=False, to='cars.car')),
+                ('precio_predicho', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('precio_publicado', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('residuo', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('residuo_pct', models.FloatField(blank=True, db_index=True, null=True)),
+                ('model_version', models.CharField(db_index=True, max_length=50)),
+                ('car_fecha', models.DateTimeField()),
+                ('scored_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Puntaje de mercado',
+                'verbose_name_plural': 'Puntajes de mercado',
+                'ordering': ['residuo_pct'],
+            },
+        ),
+    ]
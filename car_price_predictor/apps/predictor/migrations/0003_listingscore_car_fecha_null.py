@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictor', '0002_listingscore'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listingscore',
+            name='car_fecha',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,91 @@
+"""
+Motor de ML del predictor
+
+Importar este paquete no importa NumPy/pandas ni lee los artefactos del
+modelo: las vistas obtienen el predictor con get_predictor() y el modelo
+se carga en el primer uso o con warm_up().
+"""
+
+import threading
+
+
+# Datos de entrada de una predicción, en el orden de CarPricePredictor.predict()
+INPUT_FIELDS = ['brand', 'year', 'fuel', 'transmission', 'location', 'subcategory']
+
+_batcher = None
+_batcher_lock = threading.Lock()
+_inference_client = None
+_inference_client_lock = threading.Lock()
+_prediction_cache = None
+_prediction_cache_lock = threading.Lock()
+
+
+def get_predictor():
+    """Retorna la instancia global de CarPricePredictor (sin cargar el modelo)"""
+    from .predictor import predictor
+    return predictor
+
+
+def get_batcher(predictor, max_wait=0.002, max_batch=64):
+    """
+    Retorna el MicroBatcher global delante de predictor (se crea en el primer uso)
+
+    Args:
+        predictor (CarPricePredictor): Predictor que evalúa los lotes
+        max_wait (float): Segundos máximos de espera para completar un lote
+        max_batch (int): Autos máximos por lote
+    """
+    global _batcher
+    if _batcher is None or _batcher.predictor is not predictor:
+        with _batcher_lock:
+            if _batcher is None or _batcher.predictor is not predictor:
+                from .batching import MicroBatcher
+                _batcher = MicroBatcher(predictor, max_wait=max_wait, max_batch=max_batch)
+    return _batcher
+
+
+def get_inference_client(socket_dir, authkey):
+    """Retorna el InferenceClient global del servicio de inferencia en socket_dir"""
+    global _inference_client
+    if _inference_client is None or _inference_client.socket_dir != socket_dir:
+        with _inference_client_lock:
+            if _inference_client is None or _inference_client.socket_dir != socket_dir:
+                from .service import InferenceClient
+                _inference_client = InferenceClient(socket_dir, authkey)
+    return _inference_client
+
+
+def get_prediction_cache(predictor, backend='local', maxsize=10000, ttl=3600, alias='default'):
+    """
+    Retorna la PredictionCache global delante de predictor (se crea en el primer uso)
+
+    Args:
+        backend (str): 'local' (LRU del proceso) o 'django' (caché de Django compartida)
+    """
+    global _prediction_cache
+    if _prediction_cache is None or _prediction_cache.predictor is not predictor:
+        with _prediction_cache_lock:
+            if _prediction_cache is None or _prediction_cache.predictor is not predictor:
+                from .cache import DjangoCacheBackend, LocalLRUCache, PredictionCache
+                if backend == 'django':
+                    storage = DjangoCacheBackend(alias=alias, ttl=ttl)
+                else:
+                    storage = LocalLRUCache(maxsize=maxsize, ttl=ttl)
+                _prediction_cache = PredictionCache(predictor, storage)
+    return _prediction_cache
+
+
+def warm_up():
+    """
+    Carga el modelo en un hilo en segundo plano
+
+    Returns:
+        threading.Thread: El hilo lanzado
+    """
+    thread = threading.Thread(
+        target=lambda: get_predictor().ensure_loaded(),
+        name='predictor-warmup',
+        daemon=True,
+    )
+    thread.start()
+    return thread
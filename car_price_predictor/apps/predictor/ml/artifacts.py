@@ -0,0 +1,203 @@
+"""
+Guardado y carga de los artefactos del modelo
+
+Un directorio de modelo contiene:
+- model.pkl: estimador de sklearn (pickle)
+- encoders.pkl: LabelEncoders por columna categórica
+- metrics.pkl: métricas y metadatos del entrenamiento
+- features.pkl: pipeline de features (FeatureTransformer) usado al entrenar
+- forest/: bosque compilado en archivos .npy, abiertos con mmap al servir
+
+Los entrenamientos publican cada modelo como una versión completa en
+versions/<versión>/ y después apuntan manifest.json a ella con un rename
+atómico. Los workers leen el manifest, así que nunca combinan un modelo
+nuevo con encoders o métricas de la versión anterior.
+"""
+
+import json
+import os
+import pickle
+import shutil
+from datetime import datetime
+
+from .forest import FlatForest, compile_forest
+
+
+MODEL_FILE = 'model.pkl'
+ENCODERS_FILE = 'encoders.pkl'
+METRICS_FILE = 'metrics.pkl'
+FEATURES_FILE = 'features.pkl'
+FOREST_DIR = 'forest'
+
+VERSIONS_DIR = 'versions'
+MANIFEST_FILE = 'manifest.json'
+
+# Versión reportada cuando los artefactos están sueltos en model_dir (sin manifest)
+LEGACY_VERSION = 'legacy'
+
+# Versiones anteriores que se conservan al publicar una nueva
+KEEP_VERSIONS = 3
+
+
+def save_forest_bundle(model_dir, model):
+    """
+    Compila el modelo y guarda el bundle mmap en model_dir/forest
+
+    Returns:
+        str: Ruta del bundle, o None si el modelo no es un bosque compilable
+    """
+    bundle_path = os.path.join(model_dir, FOREST_DIR)
+    forest = compile_forest(model)
+    if forest is None:
+        # Un bundle de un modelo anterior no debe sobrevivir al nuevo modelo
+        shutil.rmtree(bundle_path, ignore_errors=True)
+        return None
+
+    forest.save(bundle_path)
+    return bundle_path
+
+
+def save_artifacts(model_dir, model, encoders, metrics, features=None):
+    """
+    Guarda modelo, encoders, métricas, pipeline de features y el bundle mmap del bosque
+
+    Args:
+        features (FeatureTransformer): Pipeline ajustado al entrenar (opcional
+            para modelos antiguos; el predictor lo reconstruye con los encoders)
+
+    Returns:
+        dict: {nombre: ruta} de los artefactos escritos
+    """
+    os.makedirs(model_dir, exist_ok=True)
+
+    artifacts = [(MODEL_FILE, model), (ENCODERS_FILE, encoders), (METRICS_FILE, metrics)]
+    if features is not None:
+        artifacts.append((FEATURES_FILE, features))
+
+    paths = {}
+    for filename, obj in artifacts:
+        path = os.path.join(model_dir, filename)
+        with open(path, 'wb') as f:
+            pickle.dump(obj, f)
+        paths[filename] = path
+
+    # El bundle se escribe después de model.pkl para que no quede como obsoleto
+    bundle_path = save_forest_bundle(model_dir, model)
+    if bundle_path:
+        paths[FOREST_DIR] = bundle_path
+
+    return paths
+
+
+def load_forest_bundle(model_dir, mmap_mode='r'):
+    """
+    Abre el bosque compilado de model_dir con mmap
+
+    Returns:
+        FlatForest: El bosque, o None si no hay bundle o es más antiguo que model.pkl
+    """
+    bundle_path = os.path.join(model_dir, FOREST_DIR)
+    meta_path = os.path.join(bundle_path, FlatForest.META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    model_path = os.path.join(model_dir, MODEL_FILE)
+    if os.path.exists(model_path) and os.path.getmtime(model_path) > os.path.getmtime(meta_path):
+        return None
+
+    return FlatForest.load(bundle_path, mmap_mode=mmap_mode)
+
+
+def read_manifest(model_dir):
+    """
+    Lee manifest.json
+
+    Returns:
+        dict: {'version', 'path', 'published_at'} o None si no hay manifest
+    """
+    try:
+        with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(model_dir, manifest):
+    """Reemplaza manifest.json de forma atómica (escritura temporal + os.replace)"""
+    manifest_path = os.path.join(model_dir, MANIFEST_FILE)
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+
+
+def resolve_artifact_dir(model_dir):
+    """
+    Directorio de la versión activa
+
+    Returns:
+        tuple: (versión, directorio). Sin manifest se usan los artefactos
+        sueltos de model_dir con la versión LEGACY_VERSION.
+    """
+    manifest = read_manifest(model_dir)
+    if manifest is None:
+        return LEGACY_VERSION, model_dir
+    return manifest['version'], os.path.join(model_dir, manifest['path'])
+
+
+def publish_artifacts(model_dir, model, encoders, metrics, version=None, keep=KEEP_VERSIONS,
+                      features=None):
+    """
+    Publica una nueva versión del modelo y la activa
+
+    La versión se escribe completa en un directorio temporal, se renombra a
+    versions/<versión>/ y solo entonces se actualiza manifest.json.
+
+    Returns:
+        str: Versión publicada
+    """
+    versions_dir = os.path.join(model_dir, VERSIONS_DIR)
+    os.makedirs(versions_dir, exist_ok=True)
+
+    if version is None:
+        base = datetime.now().strftime('%Y%m%d-%H%M%S')
+        version, suffix = base, 1
+        while os.path.exists(os.path.join(versions_dir, version)):
+            suffix += 1
+            version = f'{base}-{suffix}'
+
+    version_dir = os.path.join(versions_dir, version)
+    if os.path.exists(version_dir):
+        raise FileExistsError(f"La versión {version} ya existe")
+
+    tmp_dir = f'{version_dir}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    save_artifacts(tmp_dir, model, encoders, metrics, features=features)
+    os.rename(tmp_dir, version_dir)
+
+    write_manifest(model_dir, {
+        'version': version,
+        'path': os.path.join(VERSIONS_DIR, version),
+        'published_at': datetime.now().isoformat(timespec='seconds'),
+    })
+
+    prune_versions(model_dir, keep=keep)
+    return version
+
+
+def prune_versions(model_dir, keep=KEEP_VERSIONS):
+    """Elimina las versiones más antiguas, conservando la activa y las `keep` más recientes"""
+    versions_dir = os.path.join(model_dir, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return
+
+    active_version, _ = resolve_artifact_dir(model_dir)
+    versions = sorted(
+        (name for name in os.listdir(versions_dir) if not name.endswith('.tmp')),
+        key=lambda name: os.path.getmtime(os.path.join(versions_dir, name)),
+    )
+    for name in versions[:-keep] if keep else versions:
+        if name != active_version:
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
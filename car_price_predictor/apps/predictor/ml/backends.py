@@ -0,0 +1,140 @@
+"""
+Backends de modelo para los scripts de entrenamiento
+
+- forest: RandomForestRegressor sobre los códigos de LabelEncoder (el modelo
+  original). Se sirve con el motor compilado de forest.py.
+- hgb: HistGradientBoostingRegressor con las columnas categóricas nativas:
+  cada categoría es un valor sin orden (los códigos de LabelEncoder imponían
+  un orden falso a marca y ubicación) y las categorías no vistas llegan como
+  NaN (faltante) en vez de hacerse pasar por el código 0.
+
+El predictor no necesita saber qué backend se usó: features.pkl guarda cómo
+codificar y el estimador de model.pkl predice las filas codificadas.
+"""
+
+import numpy as np
+
+
+DEFAULT_BACKEND = 'forest'
+
+BACKENDS = ('forest', 'hgb')
+
+# HistGradientBoosting solo admite columnas categóricas con hasta max_bins (255) categorías
+HGB_MAX_CATEGORIES = 255
+
+
+# Hiperparámetros de referencia: benchmark y punto de partida de la búsqueda si no hay una anterior
+DEFAULT_PARAMS = {
+    'forest': {
+        'n_estimators': 200,        # Aumentado de 100 a 200
+        'max_depth': 15,            # Reducido de 20 a 15 para evitar overfitting
+        'min_samples_split': 10,    # Aumentado de 5 a 10
+        'min_samples_leaf': 4,      # Aumentado de 2 a 4
+        'max_features': 'sqrt',     # Usar sqrt de features en cada split
+    },
+    'hgb': {
+        'learning_rate': 0.1,
+        'max_iter': 400,
+        'max_leaf_nodes': 31,
+        'min_samples_leaf': 20,
+    },
+}
+
+
+def _check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend '{backend}' no soportado. Usa uno de: {', '.join(BACKENDS)}")
+
+
+def feature_options(backend):
+    """
+    Opciones de FeatureTransformer.fit para el backend
+
+    Returns:
+        dict: Parámetros de FeatureTransformer (unknown_value)
+    """
+    _check_backend(backend)
+    if backend == 'hgb':
+        return {'unknown_value': np.nan}
+    return {}
+
+
+def categorical_mask(features):
+    """
+    Columnas que HistGradientBoosting trata como categóricas nativas
+
+    Las columnas con más de HGB_MAX_CATEGORIES categorías se dejan como
+    códigos numéricos (el estimador no las acepta como categóricas).
+
+    Returns:
+        list: Un booleano por columna de features.feature_names
+    """
+    return [
+        name in features.category_codes and len(features.category_codes[name]) <= HGB_MAX_CATEGORIES
+        for name in features.feature_names
+    ]
+
+
+def build_model(backend, features, random_state=42, **params):
+    """
+    Crea el estimador sin entrenar
+
+    Args:
+        backend (str): 'forest' o 'hgb'
+        features (FeatureTransformer): Pipeline ajustado (define las columnas categóricas)
+        random_state (int): Semilla
+        **params: Hiperparámetros del estimador
+
+    Returns:
+        Estimador de sklearn
+    """
+    _check_backend(backend)
+    if backend == 'hgb':
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        return HistGradientBoostingRegressor(
+            categorical_features=categorical_mask(features),
+            random_state=random_state,
+            **params
+        )
+
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(random_state=random_state, n_jobs=-1, **params)
+
+
+def param_grid(backend):
+    """Grilla de hiperparámetros de GridSearchCV para el backend"""
+    _check_backend(backend)
+    if backend == 'hgb':
+        return {
+            'learning_rate': [0.05, 0.1],
+            'max_iter': [300, 600],
+            'max_leaf_nodes': [31, 63],
+            'min_samples_leaf': [10, 20],
+            'l2_regularization': [0.0, 1.0],
+        }
+    return {
+        'n_estimators': [150, 200, 250],
+        'max_depth': [12, 15, 18],
+        'min_samples_split': [8, 10, 12],
+        'min_samples_leaf': [3, 4, 5],
+        'max_features': ['sqrt', 'log2']
+    }
+
+
+def feature_importances(model, X, y, random_state=42):
+    """
+    Importancia de cada columna
+
+    El bosque trae feature_importances_; HistGradientBoosting no, así que se
+    usa permutation_importance sobre (X, y).
+
+    Returns:
+        np.ndarray: Una importancia por columna
+    """
+    importances = getattr(model, 'feature_importances_', None)
+    if importances is not None:
+        return importances
+
+    from sklearn.inspection import permutation_importance
+    result = permutation_importance(model, X, y, n_repeats=5, random_state=random_state, n_jobs=-1)
+    return result.importances_mean
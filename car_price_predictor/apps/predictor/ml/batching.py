@@ -0,0 +1,128 @@
+"""
+Micro-batching de predicciones concurrentes
+
+Las peticiones que llegan dentro de una ventana corta (max_wait segundos o
+max_batch autos, lo que ocurra primero) se agrupan y se predicen con una
+sola llamada vectorizada; cada llamador recibe su propio resultado. Así el
+recorrido de los árboles se amortiza entre peticiones concurrentes a
+cambio de una latencia extra acotada por max_wait.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Cola que agrupa predicciones de una fila en lotes vectorizados
+
+    predict_detailed() tiene la misma firma y resultado que el de
+    CarPricePredictor, así que las vistas pueden usar uno u otro.
+    """
+
+    def __init__(self, predictor, max_wait=0.002, max_batch=64):
+        """
+        Args:
+            predictor (CarPricePredictor): Predictor a usar (se toma un snapshot por lote)
+            max_wait (float): Segundos máximos que espera el primer auto de un lote
+            max_batch (int): Autos máximos por lote
+        """
+        self.predictor = predictor
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = {}
+        self._requests = 0
+        self._wait_time = 0.0
+
+    @property
+    def version(self):
+        return self.predictor.version
+
+    def ensure_loaded(self):
+        return self.predictor.ensure_loaded()
+
+    def predict_detailed(self, brand, year, fuel, transmission, location, subcategory):
+        """
+        Predice un auto dentro del próximo lote (bloquea hasta tener el resultado)
+
+        Returns:
+            dict: {'price': float, 'unseen': {columna: valor}, 'version': str}
+        """
+        return self.submit((brand, year, fuel, transmission, location, subcategory)).result()
+
+    def submit(self, row):
+        """
+        Encola un auto
+
+        Args:
+            row (tuple): (brand, year, fuel, transmission, location, subcategory)
+
+        Returns:
+            Future: Se resuelve con el mismo dict que predict_detailed()
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((row, future, time.perf_counter()))
+        return future
+
+    def stats(self):
+        """Métricas de tamaño de lote y espera en cola"""
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                'requests': self._requests,
+                'batches': batches,
+                'mean_batch_size': self._requests / batches if batches else 0.0,
+                'max_batch_size': max(self._batch_sizes, default=0),
+                'batch_sizes': dict(sorted(self._batch_sizes.items())),
+                'mean_wait_ms': self._wait_time / self._requests * 1000 if self._requests else 0.0,
+                'max_wait_ms': self.max_wait * 1000,
+                'max_batch': self.max_batch,
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='predictor-microbatch', daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        """Espera el primer auto y agrega los que lleguen dentro de la ventana"""
+        items = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(items) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            started = time.perf_counter()
+            rows = [row for row, _, _ in items]
+            try:
+                state = self.predictor.snapshot()
+                prices, unseen = state.predict_many(rows)
+            except Exception as e:
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), price, row_unseen in zip(items, prices, unseen):
+                future.set_result({'price': float(price), 'unseen': row_unseen, 'version': state.version})
+
+            with self._stats_lock:
+                self._requests += len(items)
+                self._batch_sizes[len(items)] = self._batch_sizes.get(len(items), 0) + 1
+                self._wait_time += sum(started - queued_at for _, _, queued_at in items)
@@ -0,0 +1,176 @@
+"""
+Caché de predicciones
+
+Las entradas vienen de un conjunto finito de categorías más un año y el
+tráfico se concentra en pocas combinaciones (Toyota, Hyundai, Kia...), así
+que las combinaciones populares se responden sin pasar por el modelo.
+
+La clave es la tupla normalizada de entrada más la versión del modelo: una
+recarga en caliente nunca devuelve precios de la versión anterior. El
+almacenamiento es intercambiable:
+- LocalLRUCache: memoria del proceso, acotada por tamaño y TTL
+- DjangoCacheBackend: una caché de Django (Redis, Memcached, BD...), compartida entre workers
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalLRUCache:
+    """LRU en memoria del proceso con expiración por TTL"""
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        """
+        Args:
+            maxsize (int): Entradas máximas (se descarta la usada hace más tiempo)
+            ttl (float): Segundos de vida de cada entrada (0 = sin expiración)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCacheBackend:
+    """
+    Caché de Django compartida entre workers
+
+    clear() no borra nada: la caché puede tener otros datos y las claves de
+    una versión anterior del modelo dejan de consultarse y expiran por TTL.
+    """
+
+    def __init__(self, alias='default', ttl=3600, prefix='predictor'):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+        self.ttl = ttl or None
+        self.prefix = prefix
+
+    def _key(self, key):
+        # Hash de la tupla: clave corta, sin espacios (requisito de Memcached) y
+        # sin colisiones entre entradas que solo difieren en espacios o separadores
+        return f"{self.prefix}:{hashlib.sha1(repr(key).encode()).hexdigest()}"
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    def set(self, key, value):
+        self.cache.set(self._key(key), value, timeout=self.ttl)
+
+    def clear(self):
+        pass
+
+
+def normalize_input(brand, year, fuel, transmission, location, subcategory):
+    """Tupla de entrada con los tipos que usa el encoder (texto y año entero)"""
+    return (str(brand), int(year), str(fuel), str(transmission), str(location), str(subcategory))
+
+
+class PredictionCache:
+    """
+    Memoriza predict_detailed() de un predictor
+
+    Funciona delante de CarPricePredictor, MicroBatcher o InferenceClient.
+    """
+
+    def __init__(self, predictor, backend):
+        """
+        Args:
+            predictor: Objeto con predict_detailed() y la propiedad version
+            backend: LocalLRUCache, DjangoCacheBackend o cualquier objeto con get/set/clear
+        """
+        self.predictor = predictor
+        self.backend = backend
+        self._version = None
+        # Protege la versión y los contadores (los comparten los hilos del servidor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _current_version(self):
+        """Versión activa; si cambió desde la última consulta se vacía la caché"""
+        ensure_loaded = getattr(self.predictor, 'ensure_loaded', None)
+        if ensure_loaded is not None:
+            # Mantiene la revisión periódica de recarga aunque todo sean aciertos
+            ensure_loaded()
+        version = self.predictor.version
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self.backend.clear()
+                    self._version = version
+        return version
+
+    def predict_detailed(self, brand, year, fuel, transmission, location, subcategory):
+        """
+        Returns:
+            dict: {'price': float, 'unseen': {columna: valor}, 'version': str, 'cached': bool}
+        """
+        row = normalize_input(brand, year, fuel, transmission, location, subcategory)
+        version = self._current_version()
+
+        if version is not None:
+            hit = self.backend.get(row + (version,))
+            if hit is not None:
+                with self._lock:
+                    self.hits += 1
+                price, unseen = hit
+                return {'price': price, 'unseen': dict(unseen), 'version': version, 'cached': True}
+
+        with self._lock:
+            self.misses += 1
+        result = self.predictor.predict_detailed(*row)
+        self.backend.set(row + (result['version'],), (result['price'], result['unseen']))
+        return {**result, 'cached': False}
+
+    def predict(self, brand, year, fuel, transmission, location, subcategory):
+        return self.predict_detailed(brand, year, fuel, transmission, location, subcategory)['price']
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """Aciertos y fallos de este proceso"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        stats = {
+            'backend': type(self.backend).__name__,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'version': self._version,
+        }
+        if isinstance(self.backend, LocalLRUCache):
+            stats['size'] = len(self.backend)
+            stats['maxsize'] = self.backend.maxsize
+        return stats
+
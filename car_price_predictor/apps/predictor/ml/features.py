@@ -0,0 +1,267 @@
+"""
+Pipeline de features compartido por entrenamiento e inferencia
+
+FeatureTransformer convierte los datos de entrada de un auto (marca, año,
+combustible, transmisión, ubicación, subcategoría) en la matriz numérica
+que recibe el modelo. Se ajusta al entrenar, se guarda junto al modelo
+(features.pkl) y el predictor usa ese mismo objeto, así que las reglas de
+los features derivados existen en un solo lugar.
+
+Los features derivados dependen solo del año: al predecir no se conoce el
+precio, y calcularlos con el precio real al entrenar filtraba el objetivo
+dentro del modelo.
+"""
+
+import numpy as np
+
+from . import INPUT_FIELDS
+
+
+# Columnas del modelo completo, en orden
+FEATURES = ['brand', 'year', 'fuel', 'transmission', 'location', 'subcategory',
+            'car_age', 'price_per_year', 'price_category']
+
+CATEGORICAL_FEATURES = ['brand', 'fuel', 'transmission', 'location', 'subcategory', 'price_category']
+
+# Valor de las categorías faltantes (el fillna de los scripts de entrenamiento)
+FILL_VALUE = 'Unknown'
+
+# Subir al cambiar las reglas de transform: invalida los snapshots de ml/snapshots.py
+PIPELINE_VERSION = 1
+
+
+def _clean(value):
+    """Texto de una categoría; None y NaN se tratan como FILL_VALUE"""
+    if value is None or value != value:
+        return FILL_VALUE
+    return str(value)
+
+
+class FeatureTransformer:
+    """Transforma autos en la matriz de features del modelo (una fila o un lote)"""
+
+    def __init__(self, encoders, feature_names=FEATURES, current_year=2026, base_year=1990,
+                 price_per_year_base=20000, category_years=(2015, 2020), unknown_value=0):
+        """
+        Args:
+            encoders (dict): LabelEncoder ajustado por columna categórica
+            feature_names (list): Columnas del modelo, en orden
+            current_year (int): Año de referencia para car_age
+            base_year (int): price_per_year = price_per_year_base / (year - base_year + 1)
+            price_per_year_base (float): Numerador de price_per_year
+            category_years (tuple): Años desde los que price_category es 'medio' y 'alto'
+            unknown_value (float): Código de las categorías no vistas al entrenar
+                (0 para el bosque; NaN para los modelos que manejan faltantes)
+        """
+        self.encoders = encoders
+        self.feature_names = list(feature_names)
+        self.current_year = current_year
+        self.base_year = base_year
+        self.price_per_year_base = price_per_year_base
+        self.category_years = tuple(category_years)
+        self.unknown_value = unknown_value
+        self._build_lookups()
+
+    def _build_lookups(self):
+        """
+        Precalcula lo necesario para codificar sin pandas ni LabelEncoder
+
+        - category_codes: {columna: {categoría: código}} equivalente a encoder.transform
+        - positions: {columna: posición en la matriz}
+        """
+        self.category_codes = {
+            col: {str(cls): code for code, cls in enumerate(self.encoders[col].classes_)}
+            for col in CATEGORICAL_FEATURES
+            if col in self.encoders and col in self.feature_names
+        }
+        self.positions = {name: position for position, name in enumerate(self.feature_names)}
+
+    def __getstate__(self):
+        # Los mapas se reconstruyen al cargar: el pickle guarda solo los parámetros
+        state = self.__dict__.copy()
+        del state['category_codes'], state['positions']
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('unknown_value', 0)
+        self.__dict__.update(state)
+        self._build_lookups()
+
+    def config(self):
+        """
+        Parámetros que definen la codificación (sin los encoders ajustados)
+
+        Returns:
+            dict: Serializable a JSON; con PIPELINE_VERSION identifica el pipeline
+        """
+        return {
+            'pipeline_version': PIPELINE_VERSION,
+            'feature_names': self.feature_names,
+            'current_year': self.current_year,
+            'base_year': self.base_year,
+            'price_per_year_base': self.price_per_year_base,
+            'category_years': list(self.category_years),
+            'unknown_value': repr(self.unknown_value),
+        }
+
+    @classmethod
+    def fit(cls, frame, feature_names=FEATURES, **options):
+        """
+        Ajusta los encoders con los datos de entrenamiento
+
+        Args:
+            frame (pd.DataFrame): Autos con las columnas de INPUT_FIELDS
+            feature_names (list): Columnas del modelo, en orden
+            **options: Parámetros de __init__ (current_year, base_year...)
+
+        Returns:
+            FeatureTransformer: Transformador ajustado
+        """
+        from sklearn.preprocessing import LabelEncoder
+
+        transformer = cls({}, feature_names, **options)
+        year = frame['year'].to_numpy(dtype=np.float64)
+        raw = {
+            **{col: frame[col].to_numpy() for col in INPUT_FIELDS if col != 'year'},
+            **transformer.year_columns(year),
+        }
+        transformer.encoders = {
+            col: LabelEncoder().fit([_clean(value) for value in raw[col]])
+            for col in CATEGORICAL_FEATURES
+            if col in transformer.feature_names
+        }
+        transformer._build_lookups()
+        return transformer
+
+    def year_columns(self, year):
+        """Columnas que dependen del año, vectorizadas (mismas reglas que transform_row)"""
+        medio, alto = self.category_years
+        return {
+            'year': year,
+            'car_age': self.current_year - year,
+            'price_per_year': self.price_per_year_base / (year - self.base_year + 1),
+            'price_category': np.where(year >= alto, 'alto', np.where(year >= medio, 'medio', 'economico')),
+        }
+
+    def encode_column(self, col, values):
+        """
+        Codifica una columna categórica
+
+        Returns:
+            tuple: (códigos como float64, máscara de valores no vistos codificados como unknown_value)
+        """
+        codes = self.category_codes[col]
+        encoded = np.fromiter((codes.get(_clean(value), -1) for value in values),
+                              dtype=np.float64, count=len(values))
+        missing = encoded < 0
+        encoded[missing] = self.unknown_value
+        return encoded, missing
+
+    def transform(self, brand, year, fuel, transmission, location, subcategory):
+        """
+        Codifica un lote: cada argumento es una secuencia (una posición por auto)
+
+        Returns:
+            tuple: (np.ndarray de forma (n, n_features), {columna: máscara booleana de no vistos})
+        """
+        year = np.asarray(year, dtype=np.float64)
+        values = {
+            'brand': brand,
+            'fuel': fuel,
+            'transmission': transmission,
+            'location': location,
+            'subcategory': subcategory,
+            **self.year_columns(year),
+        }
+
+        # Codificar variables categóricas (categoría no vista -> unknown_value)
+        unseen = {}
+        for col in self.category_codes:
+            values[col], unseen[col] = self.encode_column(col, values[col])
+
+        X = np.empty((len(year), len(self.feature_names)), dtype=np.float64)
+        for position, name in enumerate(self.feature_names):
+            X[:, position] = values[name]
+        return X, unseen
+
+    def transform_row(self, brand, year, fuel, transmission, location, subcategory):
+        """
+        Codifica un solo auto sin crear arrays intermedios
+
+        Produce exactamente los mismos bytes que la fila correspondiente de transform().
+
+        Returns:
+            tuple: (np.ndarray de forma (1, n_features), dict de categorías no vistas)
+        """
+        medio, alto = self.category_years
+        if year >= alto:
+            price_category = 'alto'
+        elif year >= medio:
+            price_category = 'medio'
+        else:
+            price_category = 'economico'
+
+        values = {
+            'brand': brand,
+            'year': year,
+            'fuel': fuel,
+            'transmission': transmission,
+            'location': location,
+            'subcategory': subcategory,
+            'car_age': self.current_year - year,
+            'price_per_year': self.price_per_year_base / (year - self.base_year + 1),
+            'price_category': price_category,
+        }
+
+        # Codificar variables categóricas (categoría no vista -> unknown_value)
+        unseen = {}
+        for col, codes in self.category_codes.items():
+            value = _clean(values[col])
+            code = codes.get(value)
+            if code is None:
+                unseen[col] = value
+                code = self.unknown_value
+            values[col] = code
+
+        row = np.array([[values[name] for name in self.feature_names]], dtype=np.float64)
+        return row, unseen
+
+    def transform_frame(self, frame):
+        """
+        Codifica un DataFrame de entrenamiento (columnas de INPUT_FIELDS)
+
+        Returns:
+            pd.DataFrame: Matriz de features con los nombres de columna del modelo
+        """
+        import pandas as pd
+
+        X, _ = self.transform(*(frame[col].to_numpy() for col in INPUT_FIELDS))
+        return pd.DataFrame(X, columns=self.feature_names, index=frame.index)
+
+    def transform_variations(self, base, field, values):
+        """
+        Repite la fila de base reemplazando solo las columnas afectadas por field
+
+        Returns:
+            tuple: (matriz (len(values), n_features), {columna: máscara de no vistos},
+            dict de no vistos de las columnas que no cambian)
+        """
+        base = {**base, field: values[0]}
+        row, base_unseen = self.transform_row(*(base[col] for col in INPUT_FIELDS))
+        X = np.repeat(row, len(values), axis=0)
+
+        if field == 'year':
+            columns = self.year_columns(np.asarray(values, dtype=np.float64))
+        else:
+            columns = {field: values}
+
+        unseen = {}
+        for col, column in columns.items():
+            if col not in self.positions:
+                continue
+            if col in self.category_codes:
+                column, unseen[col] = self.encode_column(col, column)
+            X[:, self.positions[col]] = column
+
+        fixed_unseen = {col: value for col, value in base_unseen.items() if col not in columns}
+        return X, unseen, fixed_unseen
@@ -0,0 +1,204 @@
+"""
+Motor de inferencia para Random Forest compilado a arrays planos
+
+Convierte los árboles entrenados de sklearn en arrays contiguos de NumPy
+(feature, threshold, hijos y valor) y evalúa todos los árboles a la vez
+sobre un lote, sin la validación ni el despacho de hilos de joblib que
+hace RandomForestRegressor.predict en cada llamada.
+
+El bosque compilado se puede guardar como un directorio de archivos .npy
+que se abren con mmap: todos los workers de un mismo host comparten una
+sola copia en el page cache en lugar de deserializar el pickle cada uno.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class FlatForest:
+    """Bosque de árboles de regresión almacenado como arrays planos"""
+
+    # Filas por bloque al evaluar lotes grandes
+    CHUNK_SIZE = 1024
+
+    # Arrays que se guardan como .npy en el bundle
+    ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots')
+    META_FILE = 'meta.json'
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, n_features,
+                 feature_names=None):
+        """
+        Args:
+            feature (np.ndarray): Índice de la columna evaluada en cada nodo
+            threshold (np.ndarray): Umbral de cada nodo (las hojas usan +inf)
+            children (np.ndarray): Hijos intercalados [derecho, izquierdo] de cada
+                nodo; se indexa con 2 * nodo + (x <= umbral). Las hojas apuntan a sí mismas
+            value (np.ndarray): Valor predicho en cada nodo
+            roots (np.ndarray): Nodo raíz de cada árbol
+            max_depth (int): Profundidad máxima entre todos los árboles
+            n_features (int): Número de columnas esperadas
+            feature_names (list): Nombres de columnas con los que se entrenó (opcional)
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.n_threads = os.cpu_count() or 1
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Compila un RandomForestRegressor (o ExtraTreesRegressor) entrenado
+
+        Raises:
+            TypeError: Si el modelo no es un bosque de árboles de regresión
+        """
+        estimators = getattr(model, 'estimators_', None)
+        if not estimators or not all(hasattr(est, 'tree_') for est in estimators):
+            raise TypeError(f"{type(model).__name__} no es un bosque de árboles compilable")
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise TypeError("Solo se soportan bosques de una salida")
+
+        trees = [est.tree_ for est in estimators]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        features, thresholds, children, values = [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Las hojas se apuntan a sí mismas con umbral +inf: recorrer
+            # max_depth pasos deja cada fila detenida en su hoja.
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            left = np.where(is_leaf, nodes, tree.children_left) + offset
+            right = np.where(is_leaf, nodes, tree.children_right) + offset
+            children.append(np.stack([right, left], axis=1).ravel())
+            values.append(tree.value[:, 0, 0])
+
+        feature_names = getattr(model, 'feature_names_in_', None)
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            children=np.ascontiguousarray(np.concatenate(children), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.ascontiguousarray(offsets, dtype=np.intp),
+            max_depth=max(tree.max_depth for tree in trees),
+            n_features=model.n_features_in_,
+            feature_names=[str(name) for name in feature_names] if feature_names is not None else None,
+        )
+
+    def save(self, path):
+        """
+        Guarda el bosque como un directorio de archivos .npy
+
+        meta.json se escribe al final: un bundle sin meta.json está incompleto.
+        """
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, self.META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+
+        meta = {
+            'max_depth': self.max_depth,
+            'n_features': self.n_features,
+            'n_trees': self.n_trees,
+            'feature_names': self.feature_names,
+        }
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Abre un bosque guardado con save()
+
+        Con mmap_mode='r' los arrays se mapean en memoria de solo lectura y
+        las páginas se comparten entre procesos del mismo host.
+
+        Raises:
+            FileNotFoundError: Si el bundle no existe o está incompleto
+        """
+        with open(os.path.join(path, cls.META_FILE)) as f:
+            meta = json.load(f)
+
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in cls.ARRAYS
+        }
+        return cls(**arrays, **{key: meta[key] for key in ('max_depth', 'n_features', 'feature_names')})
+
+    def predict(self, X):
+        """
+        Predice un lote de filas ya codificadas
+
+        Una sola fila (o lotes pequeños) se evalúa en el hilo actual; los lotes
+        grandes se dividen en bloques que se evalúan en paralelo.
+
+        Args:
+            X (np.ndarray): Matriz de forma (n_filas, n_features)
+
+        Returns:
+            np.ndarray: Precios predichos
+        """
+        # sklearn compara en float32 contra umbrales float64
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Se esperaban {self.n_features} columnas, se recibió forma {X.shape}")
+
+        n_rows = X.shape[0]
+        if n_rows <= self.CHUNK_SIZE or self.n_threads == 1:
+            return self._predict_chunk(X)
+
+        chunks = [X[start:start + self.CHUNK_SIZE] for start in range(0, n_rows, self.CHUNK_SIZE)]
+        return np.concatenate(list(self._get_executor().map(self._predict_chunk, chunks)))
+
+    def _predict_chunk(self, X):
+        """Recorre todos los árboles a la vez: un paso de profundidad por iteración"""
+        X = np.ascontiguousarray(X)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = np.arange(n_rows, dtype=np.intp) * n_features
+
+        # nodes[t, i]: nodo actual del árbol t para la fila i
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            x = flat_X[row_offsets + self.feature[nodes]]
+            nodes = self.children[2 * nodes + (x <= self.threshold[nodes])]
+
+        # Promedio por fila sobre un eje contiguo: el orden de la suma no depende
+        # de cuántas filas tenga el lote, así una fila da el mismo precio sola o en lote
+        return np.ascontiguousarray(self.value[nodes].T).mean(axis=1)
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.n_threads)
+            return self._executor
+
+
+def compile_forest(model):
+    """Compila el modelo si es un bosque soportado; None en caso contrario"""
+    try:
+        return FlatForest.from_sklearn(model)
+    except TypeError:
+        return None
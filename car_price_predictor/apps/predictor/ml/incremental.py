@@ -0,0 +1,150 @@
+"""
+Reentrenamiento incremental del bosque con los autos nuevos
+
+Cada entrenamiento guarda en metrics.pkl la marca de agua de sus datos
+(fecha máxima leída de tbl_auto_raw_taller). El modo incremental lee solo
+los autos con fecha posterior y agrega árboles al bosque existente
+(warm_start) entrenados con ellos, sin tocar los árboles anteriores.
+
+Los árboles nuevos solo ven el delta y los encoders quedan congelados, así
+que cada tanto hay que reconstruir el modelo completo: should_rebuild
+decide cuándo (cantidad de actualizaciones, antigüedad, tamaño del bosque
+o drift en los datos nuevos).
+"""
+
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+
+# Actualizaciones incrementales seguidas antes de reconstruir todo
+MAX_INCREMENTAL_UPDATES = 10
+
+# Días máximos desde la última reconstrucción completa
+FULL_REBUILD_DAYS = 7
+
+# El bosque no crece más que esto respecto a la última reconstrucción
+MAX_TREE_GROWTH = 2.0
+
+# Drift: autos nuevos con categorías no vistas al entrenar
+MAX_UNSEEN_RATE = 0.05
+
+# Drift: MAE del modelo actual sobre los autos nuevos respecto al MAE de test
+MAX_ERROR_RATIO = 1.5
+
+# Árboles mínimos por actualización
+MIN_NEW_TREES = 5
+
+
+def data_watermark(frame, column='fecha'):
+    """
+    Marca de agua de los datos de entrenamiento
+
+    Args:
+        frame (pd.DataFrame): Autos leídos de la BD (antes de filtrar)
+
+    Returns:
+        str: Fecha máxima de column en ISO 8601, o None si no hay datos
+    """
+    if column not in frame or frame[column].isna().all():
+        return None
+    return frame[column].max().isoformat()
+
+
+def full_rebuild_metadata(watermark, model, now=None):
+    """
+    Entradas de metrics.pkl de un entrenamiento completo (ver should_rebuild)
+
+    Args:
+        watermark (str): data_watermark de los autos leídos (antes de filtrar)
+        model: Estimador entrenado
+    """
+    now = now or datetime.now(timezone.utc)
+    return {
+        'watermark': watermark,
+        'last_full_rebuild': now.isoformat(),
+        'incremental_updates': 0,
+        'base_estimators': len(getattr(model, 'estimators_', ())) or None,
+    }
+
+
+def new_tree_count(base_estimators, base_rows, new_rows):
+    """
+    Árboles a agregar: la misma proporción de árboles que de filas
+
+    Así el peso de los autos nuevos en el promedio del bosque es parecido al
+    que tendrían en un entrenamiento completo.
+    """
+    return max(MIN_NEW_TREES, math.ceil(base_estimators * new_rows / max(base_rows, 1)))
+
+
+def should_rebuild(model, metrics, unseen_rate=0.0, delta_mae=None, now=None):
+    """
+    Política de reconstrucción completa
+
+    Args:
+        model: Estimador activo (model.pkl)
+        metrics (dict): metrics.pkl del modelo activo
+        unseen_rate (float): Fracción de autos nuevos con alguna categoría no vista
+        delta_mae (float): MAE del modelo activo sobre los autos nuevos
+        now (datetime): Hora actual (UTC)
+
+    Returns:
+        tuple: (reconstruir, motivo)
+    """
+    now = now or datetime.now(timezone.utc)
+
+    if not hasattr(model, 'estimators_') or not hasattr(model, 'warm_start'):
+        return True, 'el modelo activo no es un bosque ampliable'
+    if not metrics.get('watermark') or not metrics.get('last_full_rebuild'):
+        return True, 'el modelo activo no tiene marca de agua'
+
+    updates = metrics.get('incremental_updates', 0)
+    if updates >= MAX_INCREMENTAL_UPDATES:
+        return True, f'{updates} actualizaciones incrementales desde la última reconstrucción'
+
+    last_full = datetime.fromisoformat(metrics['last_full_rebuild'])
+    if now - last_full > timedelta(days=FULL_REBUILD_DAYS):
+        return True, f'última reconstrucción completa hace más de {FULL_REBUILD_DAYS} días'
+
+    base_estimators = metrics.get('base_estimators') or len(model.estimators_)
+    if len(model.estimators_) >= base_estimators * MAX_TREE_GROWTH:
+        return True, f'el bosque ya tiene {len(model.estimators_)} árboles'
+
+    if unseen_rate > MAX_UNSEEN_RATE:
+        return True, f'{unseen_rate:.0%} de los autos nuevos tienen categorías no vistas'
+
+    test_mae = metrics.get('test_mae')
+    if delta_mae is not None and test_mae and delta_mae > test_mae * MAX_ERROR_RATIO:
+        return True, f'MAE en los autos nuevos ${delta_mae:,.0f} vs ${test_mae:,.0f} en test'
+
+    return False, None
+
+
+def extend_forest(model, X_new, y_new, n_trees):
+    """
+    Agrega n_trees árboles entrenados con X_new al bosque (warm_start)
+
+    Los árboles existentes no cambian. El modelo se modifica en el lugar.
+
+    Returns:
+        Estimador ampliado (el mismo objeto)
+    """
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_trees)
+    model.fit(X_new, y_new)
+    model.set_params(warm_start=False)
+    return model
+
+
+def unseen_rate(features, frame):
+    """Fracción de autos de frame con alguna categoría que el pipeline no vio al entrenar"""
+    from . import INPUT_FIELDS
+
+    if not len(frame):
+        return 0.0
+    _, masks = features.transform(*(frame[col].to_numpy() for col in INPUT_FIELDS))
+    masks = [mask for col, mask in masks.items() if col in INPUT_FIELDS]
+    if not masks:
+        return 0.0
+    return float(np.logical_or.reduce(masks).mean())
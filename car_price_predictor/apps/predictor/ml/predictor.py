@@ -1,58 +1,323 @@
 """
 Módulo Predictor de Precios de Autos
 Carga el modelo entrenado y realiza predicciones
+
+El modelo se carga de forma perezosa en el primer uso (ver ensure_loaded).
 """
 
+import logging
 import pickle
 import os
-import pandas as pd
+import threading
+import time
 import numpy as np
 
+from . import INPUT_FIELDS
+from .artifacts import (
+    MODEL_FILE, ENCODERS_FILE, METRICS_FILE, FEATURES_FILE,
+    load_forest_bundle, read_manifest, resolve_artifact_dir,
+)
+from .features import FEATURES, FeatureTransformer
+from .forest import compile_forest
 
-class CarPricePredictor:
-    """Predictor de precios de autos usando Random Forest"""
 
-    def __init__(self):
-        """Inicializa el predictor cargando el modelo y encoders"""
-        self.model = None
-        self.encoders = None
-        self.metrics = None
-        self.is_loaded = False
+logger = logging.getLogger(__name__)
 
-        # Cargar modelo automáticamente
-        self.load_model()
+# Campos que se pueden variar en una curva de precios (ver LoadedModel.predict_curve)
+CURVE_FIELDS = ('year', 'location', 'fuel')
 
-    def load_model(self):
-        """Carga el modelo y encoders desde archivos pickle"""
-        try:
-            # Directorio del modelo
-            model_dir = os.path.dirname(__file__)
 
-            # Cargar modelo
-            model_path = os.path.join(model_dir, 'model.pkl')
+class LoadedModel:
+    """
+    Una versión cargada del modelo: estimador, pipeline de features, encoders y métricas
+
+    Se construye completa antes de publicarse en el predictor y no se modifica
+    después, así que una predicción que toma una referencia usa modelo,
+    features y métricas de la misma versión aunque haya una recarga en curso.
+    """
+
+    def __init__(self, artifact_dir, version):
+        """
+        Carga los artefactos de artifact_dir
+
+        Si existe el bundle compilado (forest/) se abre con mmap y no se
+        deserializa model.pkl: los workers del host comparten esas páginas y
+        self.model queda en None.
+        """
+        self.artifact_dir = artifact_dir
+        self.version = version
+
+        # Cargar modelo
+        self.engine = load_forest_bundle(artifact_dir)
+        if self.engine is not None:
+            self.model = None
+        else:
+            model_path = os.path.join(artifact_dir, MODEL_FILE)
             with open(model_path, 'rb') as f:
                 self.model = pickle.load(f)
+            # Bosque compilado a arrays planos; None si el modelo no es un bosque
+            self.engine = compile_forest(self.model)
+
+        # Cargar encoders
+        encoders_path = os.path.join(artifact_dir, ENCODERS_FILE)
+        with open(encoders_path, 'rb') as f:
+            self.encoders = pickle.load(f)
+
+        # Cargar métricas
+        metrics_path = os.path.join(artifact_dir, METRICS_FILE)
+        with open(metrics_path, 'rb') as f:
+            self.metrics = pickle.load(f)
 
-            # Cargar encoders
-            encoders_path = os.path.join(model_dir, 'encoders.pkl')
-            with open(encoders_path, 'rb') as f:
-                self.encoders = pickle.load(f)
+        self.features = self._load_features()
 
-            # Cargar métricas
-            metrics_path = os.path.join(model_dir, 'metrics.pkl')
-            with open(metrics_path, 'rb') as f:
-                self.metrics = pickle.load(f)
+        # El modelo se entrenó con un DataFrame: quitamos los nombres de columna
+        # para que sklearn no valide/advierta en cada llamada con arrays de NumPy
+        if hasattr(self.model, 'feature_names_in_'):
+            del self.model.feature_names_in_
+
+    def _load_features(self):
+        """
+        Pipeline de features guardado con el modelo (features.pkl)
+
+        Los modelos publicados antes de features.pkl usan un FeatureTransformer
+        construido con sus encoders y el orden de columnas del estimador.
+        """
+        features_path = os.path.join(self.artifact_dir, FEATURES_FILE)
+        if os.path.exists(features_path):
+            with open(features_path, 'rb') as f:
+                return pickle.load(f)
+
+        feature_names = getattr(self.model, 'feature_names_in_', None)
+        if feature_names is None and self.engine is not None:
+            feature_names = self.engine.feature_names
+        if feature_names is None:
+            feature_names = FEATURES
+        return FeatureTransformer(self.encoders, [str(name) for name in feature_names])
+
+    @property
+    def feature_names(self):
+        return self.features.feature_names
+
+    def predict_rows(self, X):
+        """Predice filas ya codificadas con el motor compilado o con sklearn"""
+        if self.engine is not None:
+            return self.engine.predict(X)
+        return self.model.predict(X)
+
+    def predict_curve(self, base, vary, values):
+        """
+        Precios de una configuración variando un solo campo
 
-            self.is_loaded = True
-            print("✅ Modelo cargado exitosamente")
+        La fila base se codifica una vez y solo se reemplazan las columnas
+        afectadas por el campo que varía (con 'year' también car_age,
+        price_per_year y price_category), así una curva de 30 puntos cuesta
+        casi lo mismo que una predicción.
+
+        Args:
+            base (dict): Configuración con los campos de INPUT_FIELDS
+            vary (str): Campo que varía ('year', 'location' o 'fuel')
+            values (list): Valores de ese campo, uno por punto de la curva
+
+        Returns:
+            tuple: (np.ndarray de precios, lista con el dict de categorías no vistas de cada punto)
+        """
+        if vary not in CURVE_FIELDS:
+            raise ValueError(f"No se puede variar '{vary}'. Usa uno de: {', '.join(CURVE_FIELDS)}")
+        if not values:
+            return np.empty(0), []
+
+        X, unseen_masks, fixed_unseen = self.features.transform_variations(base, vary, values)
+        prices = self.predict_rows(X)
+
+        # Mismo criterio que predict_many: solo se reportan columnas de entrada
+        fixed_unseen = {col: value for col, value in fixed_unseen.items() if col in INPUT_FIELDS}
+        unseen = [dict(fixed_unseen) for _ in values]
+        for col, mask in unseen_masks.items():
+            if col not in INPUT_FIELDS:
+                continue
+            for index in np.flatnonzero(mask):
+                unseen[index][col] = values[index]
+        return prices, unseen
+
+    def predict_many(self, rows):
+        """
+        Predice una lista de autos en una sola llamada vectorizada
+
+        Args:
+            rows (list): Tuplas (brand, year, fuel, transmission, location, subcategory)
+
+        Returns:
+            tuple: (np.ndarray de precios, lista con el dict de categorías no vistas de cada auto)
+        """
+        if not rows:
+            return np.empty(0), []
+
+        columns = list(zip(*rows))
+        X, unseen_masks = self.features.transform(*columns)
+        prices = self.predict_rows(X)
+
+        # Solo se reportan columnas de entrada (las derivadas salen de year)
+        unseen = [{} for _ in rows]
+        for col, mask in unseen_masks.items():
+            if col not in INPUT_FIELDS:
+                continue
+            values = columns[INPUT_FIELDS.index(col)]
+            for index in np.flatnonzero(mask):
+                unseen[index][col] = values[index]
+        return prices, unseen
+
+
+class CarPricePredictor:
+    """Predictor de precios de autos usando Random Forest"""
+
+    def __init__(self, model_dir=None, autoload=True, reload_interval=0):
+        """
+        Inicializa el predictor
+
+        Args:
+            model_dir (str): Directorio con los artefactos (por defecto el de este módulo)
+            autoload (bool): Cargar el modelo ahora; si es False se carga en el primer uso
+            reload_interval (float): Segundos entre revisiones de manifest.json para
+                recargar una nueva versión en caliente (0 = sin recarga)
+        """
+        self.model_dir = model_dir or os.path.dirname(__file__)
+        self.reload_interval = reload_interval
+        self._state = None
+        self._load_attempted = False
+        self._load_lock = threading.Lock()
+        self._reload_thread = None
+        self._last_reload_check = time.monotonic()
+
+        if autoload:
+            self.ensure_loaded()
+
+    # Atributos de la versión activa (compatibilidad con el código existente)
+    @property
+    def is_loaded(self):
+        return self._state is not None
+
+    @property
+    def version(self):
+        """Versión activa del modelo (None si no está cargado)"""
+        state = self._state
+        return state.version if state else None
+
+    @property
+    def model(self):
+        state = self._state
+        return state.model if state else None
+
+    @property
+    def engine(self):
+        state = self._state
+        return state.engine if state else None
+
+    @property
+    def encoders(self):
+        state = self._state
+        return state.encoders if state else None
+
+    @property
+    def metrics(self):
+        state = self._state
+        return state.metrics if state else None
+
+    @property
+    def feature_names(self):
+        state = self._state
+        return state.feature_names if state else FEATURES
+
+    def ensure_loaded(self):
+        """
+        Carga el modelo si aún no se intentó (una sola vez, seguro entre hilos)
+        y, si reload_interval > 0, revisa si hay una nueva versión publicada
+
+        Returns:
+            bool: True si el modelo está disponible
+        """
+        if not self._load_attempted:
+            with self._load_lock:
+                if not self._load_attempted:
+                    self.load_model()
+                    self._load_attempted = True
+        elif self.reload_interval:
+            self._maybe_reload()
+        return self.is_loaded
+
+    def load_model(self):
+        """
+        Carga la versión activa (según manifest.json) y la publica
+
+        Returns:
+            bool: True si se cargó
+        """
+        try:
+            version, artifact_dir = resolve_artifact_dir(self.model_dir)
+            # Asignar la referencia es atómico: las predicciones en curso
+            # terminan con la versión que ya habían tomado.
+            self._state = LoadedModel(artifact_dir, version)
+            print(f"✅ Modelo cargado exitosamente (versión {version})")
+            return True
 
         except FileNotFoundError as e:
             print(f"❌ Error: Modelo no encontrado. Ejecuta primero el script de entrenamiento.")
             print(f"   Archivo faltante: {e.filename}")
-            self.is_loaded = False
         except Exception as e:
             print(f"❌ Error cargando modelo: {str(e)}")
-            self.is_loaded = False
+        return False
+
+    def _maybe_reload(self):
+        """Si el manifest apunta a otra versión, la carga en segundo plano"""
+        now = time.monotonic()
+        if now - self._last_reload_check < self.reload_interval:
+            return
+        self._last_reload_check = now
+
+        manifest = read_manifest(self.model_dir)
+        if manifest is None or manifest['version'] == self.version:
+            return
+
+        with self._load_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return
+            self._reload_thread = threading.Thread(
+                target=self.load_model, name='predictor-reload', daemon=True
+            )
+            self._reload_thread.start()
+
+    def reload(self):
+        """Recarga la versión activa de forma síncrona (la anterior sigue sirviendo mientras tanto)"""
+        loaded = self.load_model()
+        self._load_attempted = True
+        return loaded
+
+    def snapshot(self):
+        """
+        Versión activa (LoadedModel) para una operación completa
+
+        Usar la misma referencia durante toda la operación garantiza que una
+        recarga en caliente no mezcle versiones a mitad de un lote.
+        """
+        if not self.ensure_loaded():
+            raise Exception("Modelo no cargado. No se puede realizar predicción.")
+        return self._state
+
+    def predict_detailed(self, brand, year, fuel, transmission, location, subcategory):
+        """
+        Predice el precio de un auto e informa las categorías no vistas en entrenamiento
+
+        Returns:
+            dict: {'price': float, 'unseen': {columna: valor}, 'version': str}
+        """
+        state = self.snapshot()
+        row, unseen = state.features.transform_row(brand, year, fuel, transmission, location, subcategory)
+        if unseen:
+            logger.info("Categorías no vistas en entrenamiento (se codifican como %s): %s",
+                        state.features.unknown_value, unseen)
+
+        prediction = state.predict_rows(row)[0]
+
+        return {'price': float(prediction), 'unseen': unseen, 'version': state.version}
 
     def predict(self, brand, year, fuel, transmission, location, subcategory):
         """
@@ -69,132 +334,89 @@ class CarPricePredictor:
         Returns:
             float: Precio predicho en USD
         """
-        if not self.is_loaded:
-            raise Exception("Modelo no cargado. No se puede realizar predicción.")
+        return self.predict_detailed(brand, year, fuel, transmission, location, subcategory)['price']
 
-        # Calcular features derivados
-        current_year = 2026
-        car_age = current_year - year
-        price_per_year = 20000 / (year - 1990 + 1)
+    def predict_curve(self, base, vary, values):
+        """
+        Curva de precios de una configuración (ver LoadedModel.predict_curve)
 
-        # Categoría de precio estimada
-        if year >= 2020:
-            price_category = 'alto'
-        elif year >= 2015:
-            price_category = 'medio'
-        else:
-            price_category = 'economico'
-
-        # Crear DataFrame con los datos de entrada
-        input_data = pd.DataFrame({
-            'brand': [brand],
-            'year': [year],
-            'fuel': [fuel],
-            'transmission': [transmission],
-            'location': [location],
-            'subcategory': [subcategory],
-            'car_age': [car_age],
-            'price_per_year': [price_per_year],
-            'price_category': [price_category]
-        })
-
-        # Codificar variables categóricas
-        input_encoded = input_data.copy()
-
-        categorical_features = ['brand', 'fuel', 'transmission', 'location', 'subcategory', 'price_category']
-
-        for col in categorical_features:
-            try:
-                # Intentar transformar usando el encoder
-                input_encoded[col] = self.encoders[col].transform(input_data[col].astype(str))
-            except ValueError:
-                # Si la categoría no existe en el encoder, usar la primera clase
-                print(f"⚠️  Advertencia: '{input_data[col].iloc[0]}' no visto en entrenamiento para {col}. Usando valor por defecto.")
-                input_encoded[col] = 0  # Valor por defecto
-
-        # Realizar predicción
-        prediction = self.model.predict(input_encoded)[0]
-
-        return float(prediction)
+        Returns:
+            dict: {'prices': list, 'unseen': list de dicts por punto, 'version': str}
+        """
+        state = self.snapshot()
+        prices, unseen = state.predict_curve(base, vary, values)
+        return {'prices': prices.tolist(), 'unseen': unseen, 'version': state.version}
 
     def predict_batch(self, data):
         """
         Predice precios para múltiples autos
 
+        Usa las mismas reglas que predict(); las categorías no vistas se
+        codifican con 0 fila por fila en lugar de abortar el lote.
+
         Args:
             data (pd.DataFrame): DataFrame con columnas: brand, year, fuel, transmission, location, subcategory
 
         Returns:
             np.array: Array de precios predichos
         """
-        if not self.is_loaded:
-            raise Exception("Modelo no cargado. No se puede realizar predicción.")
-
-        # Calcular features derivados
-        current_year = 2026
-        data_with_features = data.copy()
-        data_with_features['car_age'] = current_year - data_with_features['year']
-        data_with_features['price_per_year'] = 20000 / (data_with_features['year'] - 1990 + 1)
-
-        # Categoría de precio
-        data_with_features['price_category'] = pd.cut(
-            data_with_features['year'],
-            bins=[0, 2010, 2015, 2020, 3000],
-            labels=['economico', 'medio', 'alto', 'premium']
-        )
-
-        # Codificar variables categóricas
-        data_encoded = data_with_features.copy()
-
-        categorical_features = ['brand', 'fuel', 'transmission', 'location', 'subcategory', 'price_category']
+        state = self.snapshot()
 
-        for col in categorical_features:
-            data_encoded[col] = self.encoders[col].transform(data_with_features[col].astype(str))
-
-        # Realizar predicciones
-        predictions = self.model.predict(data_encoded)
-
-        return predictions
+        X, _ = state.features.transform(*(data[col].to_numpy() for col in INPUT_FIELDS))
+        return state.predict_rows(X)
 
     def get_metrics(self):
         """Retorna las métricas del modelo"""
-        if not self.is_loaded:
+        if not self.ensure_loaded():
             return None
         return self.metrics
 
     def get_available_brands(self):
         """Retorna lista de marcas disponibles"""
-        if not self.is_loaded:
+        if not self.ensure_loaded():
             return []
         return sorted(self.encoders['brand'].classes_.tolist())
 
     def get_available_fuels(self):
         """Retorna lista de tipos de combustible disponibles"""
-        if not self.is_loaded:
+        if not self.ensure_loaded():
             return []
         return sorted(self.encoders['fuel'].classes_.tolist())
 
     def get_available_transmissions(self):
         """Retorna lista de transmisiones disponibles"""
-        if not self.is_loaded:
+        if not self.ensure_loaded():
             return []
         return sorted(self.encoders['transmission'].classes_.tolist())
 
     def get_available_locations(self):
         """Retorna lista de ubicaciones disponibles"""
-        if not self.is_loaded:
+        if not self.ensure_loaded():
             return []
         return sorted(self.encoders['location'].classes_.tolist())
 
     def get_available_subcategories(self):
         """Retorna lista de subcategorías disponibles"""
-        if not self.is_loaded:
+        if not self.ensure_loaded():
             return []
         return sorted(self.encoders['subcategory'].classes_.tolist())
 
 
-# Instancia global del predictor
-predictor = CarPricePredictor()
+def _reload_interval():
+    """PREDICTOR_RELOAD_INTERVAL de settings (0 fuera de Django, por ejemplo en notebooks/)"""
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
+    try:
+        return settings.PREDICTOR_RELOAD_INTERVAL
+    except ImproperlyConfigured:
+        return 0
+
+
+# Segundos entre revisiones de manifest.json para recargar en caliente (0 = desactivado)
+RELOAD_INTERVAL = _reload_interval()
+
+# Instancia global del predictor (el modelo se carga en el primer uso)
+predictor = CarPricePredictor(autoload=False, reload_interval=RELOAD_INTERVAL)
 
 
 # Función de conveniencia para predicciones rápidas
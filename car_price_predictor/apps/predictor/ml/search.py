@@ -0,0 +1,235 @@
+"""
+Búsqueda de hiperparámetros por successive halving con presupuesto de tiempo
+
+En vez de entrenar todas las combinaciones de la grilla con todos los datos
+(GridSearchCV), se evalúan muchas configuraciones con pocas filas y solo el
+mejor tercio pasa a la ronda siguiente, que usa el triple de filas. La
+búsqueda se corta cuando la próxima evaluación (más el reentrenamiento
+final) no entra en el presupuesto, así que el tiempo total está acotado.
+
+- Los folds se codifican y se copian a arrays contiguos una sola vez
+  (EncodedFolds); cada ronda usa un prefijo de las filas ya barajadas, sin
+  volver a indexar el DataFrame.
+- El resultado se guarda en metrics.pkl ('search') y las mejores
+  configuraciones de la búsqueda anterior entran primero en la siguiente.
+"""
+
+import math
+import os
+import pickle
+import time
+
+import numpy as np
+
+from .artifacts import METRICS_FILE, resolve_artifact_dir
+from .backends import build_model
+
+
+# Filas de entrenamiento mínimas en la primera ronda
+MIN_RESOURCES = 500
+
+# Configuraciones de la búsqueda anterior que se vuelven a evaluar
+WARM_START_TOP = 3
+
+
+class EncodedFolds:
+    """Folds de validación cruzada ya codificados, reutilizados por todas las evaluaciones"""
+
+    def __init__(self, X, y, cv=5, random_state=42):
+        """
+        Args:
+            X (pd.DataFrame | np.ndarray): Matriz de features codificada
+            y (pd.Series | np.ndarray): Precios
+            cv (int): Número de folds
+            random_state (int): Semilla de los folds y del orden de las filas
+        """
+        from sklearn.model_selection import KFold
+
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        y = np.ascontiguousarray(y, dtype=np.float64)
+        rng = np.random.default_rng(random_state)
+
+        # Filas de entrenamiento barajadas: las primeras n son una muestra al azar de n filas
+        self.folds = []
+        for train, val in KFold(cv, shuffle=True, random_state=random_state).split(X):
+            train = rng.permutation(train)
+            self.folds.append((X[train], y[train], X[val], y[val]))
+
+        self.n_rows = len(X)
+        self.max_resources = min(len(fold[0]) for fold in self.folds)
+
+    def __len__(self):
+        return len(self.folds)
+
+    def score(self, make_model, n_samples):
+        """
+        R² de validación de cada fold entrenando con n_samples filas
+
+        Returns:
+            np.ndarray: Un R² por fold
+        """
+        from sklearn.metrics import r2_score
+
+        scores = []
+        for X_train, y_train, X_val, y_val in self.folds:
+            model = make_model()
+            model.fit(X_train[:n_samples], y_train[:n_samples])
+            scores.append(r2_score(y_val, model.predict(X_val)))
+        return np.array(scores)
+
+
+def _params_key(params):
+    return repr(sorted(params.items()))
+
+
+def sample_candidates(param_grid, n_candidates, warm_start=(), random_state=42):
+    """
+    Configuraciones a evaluar: primero las de warm_start, luego muestras de la grilla
+
+    Args:
+        param_grid (dict): {parámetro: lista de valores}
+        n_candidates (int): Total de configuraciones
+        warm_start (list): Configuraciones que se evalúan sí o sí (búsqueda anterior)
+
+    Returns:
+        list: dicts de parámetros sin repetidos
+    """
+    from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+    candidates = {}
+    for params in warm_start:
+        params = {key: value for key, value in params.items() if key in param_grid}
+        candidates.setdefault(_params_key(params), params)
+
+    n_grid = len(ParameterGrid(param_grid))
+    for params in ParameterSampler(param_grid, min(n_candidates, n_grid), random_state=random_state):
+        if len(candidates) >= n_candidates:
+            break
+        candidates.setdefault(_params_key(params), params)
+    return list(candidates.values())
+
+
+def halving_search(backend, features, folds, param_grid, budget_seconds, n_candidates=27,
+                   factor=3, warm_start=(), random_state=42, log=None):
+    """
+    Successive halving sobre las filas de entrenamiento con presupuesto de tiempo
+
+    Args:
+        backend (str): Backend de backends.py ('forest' o 'hgb')
+        features (FeatureTransformer): Pipeline ajustado (columnas categóricas de hgb)
+        folds (EncodedFolds): Folds codificados
+        param_grid (dict): {parámetro: lista de valores}
+        budget_seconds (float): Tiempo máximo de búsqueda más reentrenamiento final
+        n_candidates (int): Configuraciones de la primera ronda
+        factor (int): En cada ronda sobrevive 1/factor y las filas se multiplican por factor
+        warm_start (list): Configuraciones a evaluar primero (ver previous_search)
+        log (callable): Función para reportar el progreso (por ejemplo print)
+
+    Returns:
+        dict: best_params, best_score, best_cv_scores, best_n_samples, results
+        (una entrada por evaluación), completed (False si se cortó por tiempo)
+    """
+    start = time.perf_counter()
+    deadline = start + budget_seconds
+    log = log or (lambda message: None)
+
+    candidates = sample_candidates(param_grid, n_candidates, warm_start, random_state)
+
+    # Rondas: hasta quedar con ~factor configuraciones, sin bajar de MIN_RESOURCES filas
+    n_rungs = max(1, math.ceil(math.log(len(candidates), factor))) if len(candidates) > 1 else 1
+    max_rungs = 1 + int(math.log(max(folds.max_resources / MIN_RESOURCES, 1), factor))
+    n_rungs = min(n_rungs, max_rungs)
+
+    seconds_per_row = 0.0
+    results = []
+    finished = None     # Evaluaciones de la última ronda completa
+    completed = True
+    for rung in range(n_rungs):
+        n_samples = int(folds.max_resources / factor ** (n_rungs - 1 - rung))
+        log(f"   Ronda {rung + 1}/{n_rungs}: {len(candidates)} configuraciones x {n_samples} filas")
+
+        scored = []
+        for params in candidates:
+            # Evaluar (cv entrenamientos) y reentrenar con todo debe entrar en el tiempo que queda
+            estimate = seconds_per_row * (len(folds) * n_samples + folds.n_rows)
+            if (results or scored) and time.perf_counter() + estimate > deadline:
+                completed = False
+                break
+
+            fit_start = time.perf_counter()
+            scores = folds.score(
+                lambda: build_model(backend, features, random_state=random_state, **params),
+                n_samples,
+            )
+            fit_time = time.perf_counter() - fit_start
+            seconds_per_row = max(seconds_per_row, fit_time / (len(folds) * n_samples))
+
+            scored.append({
+                'params': params,
+                'rung': rung,
+                'n_samples': n_samples,
+                'mean_score': float(scores.mean()),
+                'std_score': float(scores.std()),
+                'cv_scores': scores.tolist(),
+                'fit_time': fit_time,
+            })
+        results.extend(scored)
+
+        # Una ronda cortada por tiempo no compara a todos con las mismas filas:
+        # se decide con la anterior (salvo que sea la primera)
+        if len(scored) == len(candidates) or finished is None:
+            finished = scored
+        if not completed:
+            log(f"   ⏱️  Presupuesto de {budget_seconds:.0f} s agotado en la ronda {rung + 1}")
+            break
+
+        ranked = sorted(scored, key=lambda r: r['mean_score'], reverse=True)
+        candidates = [r['params'] for r in ranked[:max(1, math.ceil(len(ranked) / factor))]]
+
+    best = max(finished, key=lambda r: r['mean_score'])
+
+    return {
+        'backend': backend,
+        'best_params': best['params'],
+        'best_score': best['mean_score'],
+        'best_cv_scores': best['cv_scores'],
+        'best_n_samples': best['n_samples'],
+        'results': results,
+        'n_rungs': n_rungs,
+        'budget_seconds': budget_seconds,
+        'elapsed_seconds': time.perf_counter() - start,
+        'completed': completed,
+    }
+
+
+def previous_search(model_dir, backend, top=WARM_START_TOP):
+    """
+    Mejores configuraciones de la búsqueda guardada en el modelo activo
+
+    Args:
+        model_dir (str): Directorio de artefactos (con manifest.json o sin versiones)
+        backend (str): Solo se reutilizan búsquedas del mismo backend
+
+    Returns:
+        list: Hasta top dicts de parámetros, el mejor primero ([] si no hay búsqueda)
+    """
+    _, artifact_dir = resolve_artifact_dir(model_dir)
+    try:
+        with open(os.path.join(artifact_dir, METRICS_FILE), 'rb') as f:
+            metrics = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return []
+
+    search = metrics.get('search') if isinstance(metrics, dict) else None
+    if not search or search.get('backend') != backend:
+        return []
+
+    # Ranking de la ronda más alta (la de más filas) y luego de las anteriores
+    ranked = sorted(search['results'], key=lambda r: (r['rung'], r['mean_score']), reverse=True)
+    best = [search['best_params']]
+    for result in ranked:
+        if len(best) >= top:
+            break
+        if _params_key(result['params']) not in {_params_key(params) for params in best}:
+            best.append(result['params'])
+    return best[:top]
@@ -0,0 +1,373 @@
+"""
+Servicio de inferencia en procesos separados
+
+Modo opcional en el que los workers web no cargan el modelo: un pool de
+procesos (uno por núcleo) mantiene cada uno su propia copia y atiende
+predicciones por un socket Unix (socket_dir/worker-<n>.sock). Los workers
+web usan InferenceClient, que envía cada petición al proceso con menos
+peticiones pendientes.
+
+Protocolo (multiprocessing.connection, mensajes pickle autenticados con authkey):
+    petición:  (operación, argumento)
+    respuesta: ('ok', resultado, pendientes) o ('error', mensaje, pendientes)
+
+Operaciones:
+    predict: lista de tuplas en el orden de INPUT_FIELDS -> {'prices', 'unseen', 'version'}
+    curve: (base, campo, valores) -> {'prices', 'unseen', 'version'} (ver predict_curve)
+    pin / unpin: fija (o libera) la versión del modelo para esta conexión
+    call: método de solo lectura del predictor (ver REMOTE_METHODS)
+"""
+
+import glob
+import os
+import signal
+import threading
+import time
+import multiprocessing
+from multiprocessing.connection import Client, Listener
+
+
+SOCKET_PATTERN = 'worker-{}.sock'
+
+DEFAULT_SOCKET_DIR = '/tmp/car_price_inference'
+
+# Métodos de CarPricePredictor que se pueden invocar con la operación 'call'
+REMOTE_METHODS = (
+    'version',
+    'get_metrics',
+    'get_available_brands',
+    'get_available_fuels',
+    'get_available_transmissions',
+    'get_available_locations',
+    'get_available_subcategories',
+)
+
+
+class InferenceServiceError(Exception):
+    """Ningún proceso del servicio de inferencia respondió"""
+
+
+def _serve_connection(conn, predictor, in_flight):
+    """Atiende las peticiones de una conexión hasta que el cliente la cierre"""
+    pinned = None
+    try:
+        while True:
+            try:
+                op, arg = conn.recv()
+            except EOFError:
+                return
+
+            with in_flight['lock']:
+                in_flight['count'] += 1
+            try:
+                if op == 'predict':
+                    state = pinned or predictor.snapshot()
+                    prices, unseen = state.predict_many(arg)
+                    result = {'prices': prices.tolist(), 'unseen': unseen, 'version': state.version}
+                elif op == 'curve':
+                    result = predictor.predict_curve(*arg)
+                elif op == 'pin':
+                    pinned = predictor.snapshot()
+                    result = pinned.version
+                elif op == 'unpin':
+                    pinned = result = None
+                elif op == 'call' and arg in REMOTE_METHODS:
+                    value = getattr(predictor, arg)
+                    result = value() if callable(value) else value
+                else:
+                    raise ValueError(f"Operación no soportada: {op} {arg or ''}".strip())
+                reply = ('ok', result)
+            except Exception as e:
+                reply = ('error', str(e))
+            finally:
+                with in_flight['lock']:
+                    in_flight['count'] -= 1
+                    depth = in_flight['count']
+
+            conn.send(reply + (depth,))
+    except (OSError, EOFError):
+        pass
+    finally:
+        conn.close()
+
+
+def run_worker(socket_path, model_dir, authkey, reload_interval=0):
+    """
+    Proceso del pool: carga el modelo y atiende conexiones en socket_path
+
+    El socket se crea después de cargar el modelo, así los clientes solo
+    encuentran procesos listos para predecir.
+    """
+    from .predictor import CarPricePredictor
+
+    predictor = CarPricePredictor(model_dir=model_dir, reload_interval=reload_interval)
+    in_flight = {'count': 0, 'lock': threading.Lock()}
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    listener = Listener(socket_path, family='AF_UNIX', authkey=authkey)
+    signal.signal(signal.SIGTERM, lambda *_: (listener.close(), os._exit(0)))
+
+    while True:
+        try:
+            conn = listener.accept()
+        except (OSError, EOFError, multiprocessing.AuthenticationError):
+            continue
+        threading.Thread(
+            target=_serve_connection, args=(conn, predictor, in_flight), daemon=True
+        ).start()
+
+
+class InferenceService:
+    """Pool de procesos de inferencia; reinicia los procesos que terminan"""
+
+    def __init__(self, socket_dir, model_dir, authkey, workers=None, reload_interval=0):
+        """
+        Args:
+            socket_dir (str): Directorio de los sockets Unix
+            model_dir (str): Directorio de artefactos del modelo
+            authkey (bytes): Clave compartida con los clientes
+            workers (int): Procesos del pool (por defecto uno por núcleo)
+            reload_interval (float): Segundos entre revisiones de manifest.json
+        """
+        self.socket_dir = socket_dir
+        self.model_dir = model_dir
+        self.authkey = authkey
+        self.workers = workers or os.cpu_count() or 1
+        self.reload_interval = reload_interval
+        # spawn: los procesos no heredan hilos ni conexiones a BD del proceso padre
+        self._context = multiprocessing.get_context('spawn')
+        self._processes = {}
+
+    def socket_path(self, index):
+        return os.path.join(self.socket_dir, SOCKET_PATTERN.format(index))
+
+    def start(self):
+        os.makedirs(self.socket_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(self.socket_dir, SOCKET_PATTERN.format('*'))):
+            os.remove(path)
+        for index in range(self.workers):
+            self._start_worker(index)
+
+    def _start_worker(self, index):
+        process = self._context.Process(
+            target=run_worker,
+            args=(self.socket_path(index), self.model_dir, self.authkey, self.reload_interval),
+            name=f'inference-worker-{index}',
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+
+    def supervise(self, poll_interval=1.0):
+        """Bloquea reiniciando los procesos caídos hasta recibir Ctrl+C o SIGTERM"""
+        try:
+            while True:
+                for index, process in list(self._processes.items()):
+                    if not process.is_alive():
+                        print(f"❌ Proceso de inferencia {index} terminó (código {process.exitcode}); reiniciando")
+                        self._start_worker(index)
+                time.sleep(poll_interval)
+        finally:
+            self.stop()
+
+    def stop(self):
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.join(timeout=5)
+        for index in self._processes:
+            if os.path.exists(self.socket_path(index)):
+                os.remove(self.socket_path(index))
+        self._processes = {}
+
+
+class InferenceClient:
+    """
+    Cliente del servicio de inferencia para los workers web
+
+    Tiene la misma interfaz que CarPricePredictor para las vistas. Cada
+    petición va al proceso con menos trabajo pendiente: las peticiones en
+    curso desde este cliente más la cola que el proceso reportó en su
+    última respuesta.
+    """
+
+    def __init__(self, socket_dir, authkey):
+        self.socket_dir = socket_dir
+        self.authkey = authkey
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._outstanding = {}
+        self._reported = {}
+        self._addresses = []
+        self._scanned_at = 0.0
+        self._version = (None, 0.0)
+
+    def _refresh_addresses(self, force=False):
+        """Relee los sockets disponibles (como máximo una vez por segundo)"""
+        now = time.monotonic()
+        if not force and self._addresses and now - self._scanned_at < 1.0:
+            return
+        self._scanned_at = now
+        self._addresses = sorted(glob.glob(os.path.join(self.socket_dir, SOCKET_PATTERN.format('*'))))
+
+    def _acquire(self, exclude=()):
+        """
+        Reserva una conexión al proceso con menos trabajo pendiente
+
+        Returns:
+            tuple: (dirección, conexión)
+
+        Raises:
+            InferenceServiceError: Si no se pudo conectar con ningún proceso
+        """
+        failed = set(exclude)
+        while True:
+            with self._lock:
+                self._refresh_addresses(force=bool(failed))
+                candidates = [address for address in self._addresses if address not in failed]
+                if not candidates:
+                    raise InferenceServiceError(
+                        f"No hay procesos de inferencia disponibles en {self.socket_dir}"
+                    )
+                address = min(
+                    candidates,
+                    key=lambda a: self._outstanding.get(a, 0) + self._reported.get(a, 0),
+                )
+                self._outstanding[address] = self._outstanding.get(address, 0) + 1
+                idle = self._idle.setdefault(address, [])
+                conn = idle.pop() if idle else None
+
+            if conn is not None:
+                return address, conn
+            try:
+                return address, Client(address, family='AF_UNIX', authkey=self.authkey)
+            except (OSError, multiprocessing.AuthenticationError):
+                self._release(address, None, broken=True)
+                failed.add(address)
+
+    def _release(self, address, conn, depth=None, broken=False):
+        with self._lock:
+            self._outstanding[address] -= 1
+            if depth is not None:
+                self._reported[address] = depth
+            if broken:
+                if conn is not None:
+                    conn.close()
+            else:
+                self._idle.setdefault(address, []).append(conn)
+
+    def _request(self, conn, op, arg):
+        conn.send((op, arg))
+        status, result, depth = conn.recv()
+        return status, result, depth
+
+    def _call(self, op, arg=None):
+        """Envía una petición, reintentando en otro proceso si la conexión se cae"""
+        failed = set()
+        while True:
+            address, conn = self._acquire(exclude=failed)
+            try:
+                status, result, depth = self._request(conn, op, arg)
+            except (OSError, EOFError):
+                self._release(address, conn, broken=True)
+                failed.add(address)
+                continue
+            self._release(address, conn, depth)
+            if status == 'error':
+                raise Exception(result)
+            return result
+
+    def predict_many(self, rows):
+        """
+        Returns:
+            tuple: (precios, categorías no vistas por fila)
+        """
+        result = self._call('predict', list(rows))
+        return result['prices'], result['unseen']
+
+    def predict_detailed(self, brand, year, fuel, transmission, location, subcategory):
+        result = self._call('predict', [(brand, year, fuel, transmission, location, subcategory)])
+        return {'price': result['prices'][0], 'unseen': result['unseen'][0], 'version': result['version']}
+
+    def predict(self, brand, year, fuel, transmission, location, subcategory):
+        return self.predict_detailed(brand, year, fuel, transmission, location, subcategory)['price']
+
+    def predict_curve(self, base, vary, values):
+        return self._call('curve', (base, vary, list(values)))
+
+    def snapshot(self):
+        """
+        Sesión fijada a un proceso y a una versión del modelo (para lotes)
+
+        Raises:
+            Exception: Si el proceso no tiene un modelo cargado
+        """
+        return RemoteSnapshot(self)
+
+    @property
+    def version(self):
+        """Versión del modelo en el servicio (se consulta como máximo una vez por segundo)"""
+        version, checked_at = self._version
+        now = time.monotonic()
+        if now - checked_at >= 1.0:
+            version = self._call('call', 'version')
+            self._version = (version, now)
+        return version
+
+    def get_metrics(self):
+        return self._call('call', 'get_metrics')
+
+    def get_available_brands(self):
+        return self._call('call', 'get_available_brands')
+
+    def get_available_fuels(self):
+        return self._call('call', 'get_available_fuels')
+
+    def get_available_transmissions(self):
+        return self._call('call', 'get_available_transmissions')
+
+    def get_available_locations(self):
+        return self._call('call', 'get_available_locations')
+
+    def get_available_subcategories(self):
+        return self._call('call', 'get_available_subcategories')
+
+
+class RemoteSnapshot:
+    """
+    Conexión reservada a un proceso con la versión del modelo fijada
+
+    Equivale a LoadedModel.predict_many/version para batch.predict_stream;
+    hay que llamar a close() al terminar para devolver la conexión.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._address, self._conn = client._acquire()
+        try:
+            status, result, _ = client._request(self._conn, 'pin', None)
+        except (OSError, EOFError):
+            client._release(self._address, self._conn, broken=True)
+            raise InferenceServiceError('El proceso de inferencia cerró la conexión')
+        if status == 'error':
+            client._release(self._address, self._conn)
+            raise Exception(result)
+        self.version = result
+
+    def predict_many(self, rows):
+        status, result, _ = self._client._request(self._conn, 'predict', list(rows))
+        if status == 'error':
+            raise Exception(result)
+        return result['prices'], result['unseen']
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            self._client._request(conn, 'unpin', None)
+        except (OSError, EOFError):
+            self._client._release(self._address, conn, broken=True)
+        else:
+            self._client._release(self._address, conn)
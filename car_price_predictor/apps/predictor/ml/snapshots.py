@@ -0,0 +1,131 @@
+"""
+Snapshots de la matriz de features de entrenamiento
+
+Un snapshot guarda X (codificada), y y el FeatureTransformer ajustado en un
+directorio identificado por una clave:
+
+- huella de las filas de origen (conteo y hash calculados en la BD)
+- marca de agua de los datos
+- configuración del pipeline (FeatureTransformer.config, con PIPELINE_VERSION)
+
+Si la clave existe, el entrenamiento carga el snapshot y no vuelve a leer
+ni codificar los autos; si cambian los datos o el pipeline, la clave cambia
+y el snapshot se reconstruye.
+
+Estructura:
+
+    snapshots/<clave>/data.npz       X, y (np.savez_compressed)
+    snapshots/<clave>/features.pkl   FeatureTransformer ajustado
+    snapshots/<clave>/meta.json      clave, columnas, filas y fecha
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+DATA_FILE = 'data.npz'
+FEATURES_FILE = 'features.pkl'
+META_FILE = 'meta.json'
+
+# Snapshots que se conservan (los más recientes)
+KEEP_SNAPSHOTS = 3
+
+
+def snapshot_key(fingerprint, watermark, pipeline_config):
+    """
+    Clave del snapshot
+
+    Args:
+        fingerprint (dict): Huella de las filas de origen (por ejemplo conteo y hash)
+        watermark (str): Marca de agua de los datos
+        pipeline_config (dict): Configuración del pipeline y de los filtros
+
+    Returns:
+        str: 16 caracteres hexadecimales
+    """
+    payload = json.dumps(
+        {'fingerprint': fingerprint, 'watermark': watermark, 'pipeline': pipeline_config},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def save_snapshot(snapshot_dir, key, X, y, features, keep=KEEP_SNAPSHOTS):
+    """
+    Guarda un snapshot de forma atómica (directorio temporal + rename)
+
+    Args:
+        X (pd.DataFrame | np.ndarray): Matriz de features codificada
+        y (pd.Series | np.ndarray): Precios
+        features (FeatureTransformer): Pipeline ajustado
+
+    Returns:
+        str: Directorio del snapshot
+    """
+    path = os.path.join(snapshot_dir, key)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    np.savez_compressed(
+        os.path.join(tmp_path, DATA_FILE),
+        X=np.asarray(X, dtype=np.float64),
+        y=np.asarray(y, dtype=np.float64),
+    )
+    with open(os.path.join(tmp_path, FEATURES_FILE), 'wb') as f:
+        pickle.dump(features, f)
+    with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+        json.dump({
+            'key': key,
+            'columns': list(features.feature_names),
+            'rows': len(y),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp_path, path)
+    prune_snapshots(snapshot_dir, keep)
+    return path
+
+
+def load_snapshot(snapshot_dir, key):
+    """
+    Carga un snapshot
+
+    Returns:
+        tuple: (X como pd.DataFrame con los nombres de columna, y como pd.Series,
+        FeatureTransformer), o None si no existe
+    """
+    import pandas as pd
+
+    path = os.path.join(snapshot_dir, key)
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        return None
+
+    with open(os.path.join(path, FEATURES_FILE), 'rb') as f:
+        features = pickle.load(f)
+    with np.load(os.path.join(path, DATA_FILE)) as data:
+        X = pd.DataFrame(data['X'], columns=features.feature_names)
+        y = pd.Series(data['y'], name='price')
+
+    # Marca el uso para que prune_snapshots conserve los más usados recientemente
+    os.utime(os.path.join(path, META_FILE))
+    return X, y, features
+
+
+def prune_snapshots(snapshot_dir, keep=KEEP_SNAPSHOTS):
+    """Borra los snapshots menos usados recientemente, dejando keep"""
+    snapshots = [
+        os.path.join(snapshot_dir, name)
+        for name in os.listdir(snapshot_dir)
+        if os.path.exists(os.path.join(snapshot_dir, name, META_FILE))
+    ]
+    snapshots.sort(key=lambda path: os.path.getmtime(os.path.join(path, META_FILE)), reverse=True)
+    for path in snapshots[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
@@ -27,3 +27,35 @@ class Prediction(models.Model):
 
     def __str__(self):
         return f"{self.marca} {self.anio} - ${self.precio_predicho}"
+
+
+class ListingScore(models.Model):
+    """Precio predicho y residuo de cada auto publicado (ver score_listings)"""
+
+    car = models.OneToOneField(
+        'cars.Car',
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_constraint=False,  # tbl_auto_raw_taller no la maneja Django
+        related_name='score',
+    )
+
+    # Resultado
+    precio_predicho = models.DecimalField(max_digits=12, decimal_places=2)
+    # Precio al puntuarlo: --since-last-run vuelve a puntuar si cambió
+    precio_publicado = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    residuo = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    residuo_pct = models.FloatField(null=True, blank=True, db_index=True)
+
+    # Metadata
+    model_version = models.CharField(max_length=50, db_index=True)
+    car_fecha = models.DateTimeField(null=True, blank=True)  # fecha del auto al puntuarlo (puede faltar en filas viejas)
+    scored_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['residuo_pct']
+        verbose_name = 'Puntaje de mercado'
+        verbose_name_plural = 'Puntajes de mercado'
+
+    def __str__(self):
+        return f"Auto #{self.car_id} - predicho ${self.precio_predicho} ({self.residuo_pct or 0:+.0%})"
@@ -0,0 +1,52 @@
+"""
+Puntaje de mercado de los autos publicados
+
+Predice el precio de cada auto de tbl_auto_raw_taller y calcula el residuo
+(precio publicado - precio predicho) para detectar publicaciones baratas o
+caras. Las funciones de este módulo corren en los procesos del pool de
+score_listings, así que no importan Django ni los modelos de la BD.
+"""
+
+from .ml import INPUT_FIELDS
+
+
+# Columnas que se leen de Car, en este orden
+CAR_FIELDS = ['id'] + INPUT_FIELDS + ['price', 'fecha']
+
+# Modelo del proceso del pool (ver init_worker)
+_model = None
+
+
+def init_worker(artifact_dir, version):
+    """Inicializador del pool: cada proceso carga la misma versión del modelo"""
+    global _model
+    from .ml.predictor import LoadedModel
+    _model = LoadedModel(artifact_dir, version)
+
+
+def score_rows(rows, model=None):
+    """
+    Predice un bloque de autos
+
+    Args:
+        rows (list): Tuplas en el orden de CAR_FIELDS
+        model (LoadedModel): Modelo a usar (por defecto el del proceso)
+
+    Returns:
+        list: Tuplas (id, precio predicho, precio publicado, residuo, residuo_pct, fecha)
+    """
+    model = model or _model
+    # Los campos vacíos (None) se codifican como en el entrenamiento (ver features.FILL_VALUE)
+    inputs = [row[1:7] for row in rows]
+    prices, _ = model.predict_many(inputs)
+
+    scores = []
+    for (car_id, *_, price, fecha), predicted in zip(rows, prices):
+        predicted = round(float(predicted), 2)
+        if price:
+            residual = round(float(price) - predicted, 2)
+            residual_pct = residual / predicted if predicted else None
+        else:
+            price = residual = residual_pct = None
+        scores.append((car_id, predicted, price, residual, residual_pct, fecha))
+    return scores
@@ -17,3 +17,51 @@ class PredictionOutputSerializer(serializers.Serializer):
     input_data = serializers.DictField()
     metrics = serializers.DictField()
     similar_cars = serializers.ListField()
+    unseen_categories = serializers.DictField(required=False)
+    model_version = serializers.CharField(required=False)
+
+
+class PriceCurveInputSerializer(serializers.Serializer):
+    """
+    Serializer para la curva de precios de una configuración
+
+    Con vary='year' se usa el rango year_from..year_to (o la lista values);
+    con 'location' o 'fuel' la lista values con las alternativas.
+    """
+    MAX_POINTS = 200
+
+    brand = serializers.CharField(max_length=100)
+    year = serializers.IntegerField(required=False)
+    fuel = serializers.CharField(max_length=50)
+    transmission = serializers.CharField(max_length=50)
+    location = serializers.CharField(max_length=100)
+    subcategory = serializers.CharField(max_length=100)
+    vary = serializers.ChoiceField(choices=['year', 'location', 'fuel'], default='year')
+    year_from = serializers.IntegerField(required=False)
+    year_to = serializers.IntegerField(required=False)
+    values = serializers.ListField(child=serializers.CharField(max_length=100), required=False)
+
+    def validate(self, data):
+        if data['vary'] == 'year':
+            if 'values' in data:
+                try:
+                    data['values'] = [int(value) for value in data['values']]
+                except ValueError:
+                    raise serializers.ValidationError({'values': 'Los años deben ser enteros'})
+            elif 'year_from' in data and 'year_to' in data:
+                if data['year_from'] > data['year_to']:
+                    raise serializers.ValidationError({'year_to': 'Debe ser mayor o igual que year_from'})
+                data['values'] = list(range(data['year_from'], data['year_to'] + 1))
+            else:
+                raise serializers.ValidationError('Indica year_from y year_to, o la lista values')
+        else:
+            if 'year' not in data:
+                raise serializers.ValidationError({'year': 'Requerido si no se varía el año'})
+            if not data.get('values'):
+                raise serializers.ValidationError({'values': f"Indica las alternativas de {data['vary']}"})
+
+        if not data['values']:
+            raise serializers.ValidationError({'values': 'La curva no tiene puntos'})
+        if len(data['values']) > self.MAX_POINTS:
+            raise serializers.ValidationError({'values': f'Máximo {self.MAX_POINTS} puntos por curva'})
+        return data
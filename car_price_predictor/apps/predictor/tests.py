@@ -1,3 +1,1174 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.test import SimpleTestCase
+from django.urls import reverse
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+from apps.cars.models import Car
+from apps.cars.tests import car_tables
+
+from . import batch, scoring, training
+from .management.commands.score_listings import bounded_map, pending_scores
+from . import ml
+from .ml import INPUT_FIELDS
+from .ml.batching import MicroBatcher
+from .ml.cache import DjangoCacheBackend, LocalLRUCache, PredictionCache
+from .ml.artifacts import (
+    FOREST_DIR, MODEL_FILE, load_forest_bundle, publish_artifacts, read_manifest, save_artifacts,
+)
+from .ml.backends import build_model, categorical_mask, feature_options
+from .ml.features import CATEGORICAL_FEATURES, FEATURES, FeatureTransformer
+from .ml.forest import FlatForest
+from .ml.incremental import (
+    MAX_INCREMENTAL_UPDATES, extend_forest, full_rebuild_metadata, new_tree_count, should_rebuild,
+    unseen_rate,
+)
+from .ml.snapshots import load_snapshot, save_snapshot, snapshot_key
+from .ml.search import EncodedFolds, halving_search, previous_search, sample_candidates
+from .ml.service import InferenceClient, InferenceService
+from .ml.predictor import CarPricePredictor
+
+
+CLASSES = {
+    'brand': ['HYUNDAI', 'KIA', 'NISSAN', 'TOYOTA'],
+    'fuel': ['Diesel', 'Gasolina', 'Híbrido'],
+    'transmission': ['Automática', 'Mecánica'],
+    'location': ['Arequipa, Arequipa', 'Lima, Lima', 'Trujillo, La Libertad'],
+    'subcategory': ['Camioneta', 'Hatchback', 'Sedán'],
+    'price_category': ['alto', 'economico', 'medio', 'premium'],
+}
+
+SAMPLE_CARS = [
+    ('TOYOTA', 2020, 'Gasolina', 'Automática', 'Lima, Lima', 'Sedán'),
+    ('KIA', 2015, 'Diesel', 'Mecánica', 'Arequipa, Arequipa', 'Camioneta'),
+    ('HYUNDAI', 2008, 'Gasolina', 'Mecánica', 'Trujillo, La Libertad', 'Hatchback'),
+    ('NISSAN', 2023, 'Híbrido', 'Automática', 'Lima, Lima', 'Camioneta'),
+]
+
+
+def train_artifacts(n_estimators=30, n_rows=400, seed=0, max_depth=8):
+    """Entrena un modelo pequeño con datos sintéticos: (modelo, encoders, métricas)"""
+    rng = np.random.default_rng(seed)
+    encoders = {}
+    X = pd.DataFrame({'year': rng.integers(1995, 2026, n_rows)})
+    for col in CATEGORICAL_FEATURES:
+        encoders[col] = LabelEncoder().fit(CLASSES[col])
+        X[col] = rng.integers(0, len(CLASSES[col]), n_rows)
+    X['car_age'] = 2026 - X['year']
+    X['price_per_year'] = 20000 / (X['year'] - 1990 + 1)
+    X = X[FEATURES]
+    y = 3000 + (X['year'] - 1995) * 900 + X['brand'] * 1500 + rng.normal(0, 500, n_rows)
+
+    model = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=seed)
+    model.fit(X, y)
+
+    metrics = {'test_r2': 0.9, 'test_mae': 500.0, 'test_rmse': 700.0, 'features_used': FEATURES}
+    return model, encoders, metrics
+
+
+def build_model_dir(**kwargs):
+    """Guarda un modelo sintético como los scripts de entrenamiento"""
+    model_dir = tempfile.mkdtemp()
+    save_artifacts(model_dir, *train_artifacts(**kwargs))
+    return model_dir
+
+
+def legacy_predict(predictor, model, brand, year, fuel, transmission, location, subcategory):
+    """Camino original de CarPricePredictor.predict: DataFrame + LabelEncoder.transform"""
+    if year >= 2020:
+        price_category = 'alto'
+    elif year >= 2015:
+        price_category = 'medio'
+    else:
+        price_category = 'economico'
+
+    input_data = pd.DataFrame({
+        'brand': [brand], 'year': [year], 'fuel': [fuel], 'transmission': [transmission],
+        'location': [location], 'subcategory': [subcategory], 'car_age': [2026 - year],
+        'price_per_year': [20000 / (year - 1990 + 1)], 'price_category': [price_category],
+    })
+    input_encoded = input_data.copy()
+    for col in CATEGORICAL_FEATURES:
+        try:
+            input_encoded[col] = predictor.encoders[col].transform(input_data[col].astype(str))
+        except ValueError:
+            input_encoded[col] = 0
+    return float(model.predict(input_encoded)[0])
+
+
+# Comparaciones de tiempo: dependen de la carga de la máquina, solo a pedido
+RUN_BENCHMARKS = os.getenv('RUN_BENCHMARKS') == '1'
+
+
+class PredictorFastPathTests(SimpleTestCase):
+    """Camino de una fila contra el camino DataFrame original (resultados y, con RUN_BENCHMARKS=1, tiempos)"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model_dir = build_model_dir()
+        cls.predictor = CarPricePredictor(model_dir=cls.model_dir)
+        # Modelo sin modificar (con feature_names_in_) para el camino original
+        with open(os.path.join(cls.model_dir, 'model.pkl'), 'rb') as f:
+            cls.reference_model = pickle.load(f)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_same_output_as_dataframe_path(self):
+        cars = SAMPLE_CARS + [('MARCA NUEVA', 2019, 'Eléctrico', 'Automática', 'Cusco, Cusco', 'Sedán')]
+        for car in cars:
+            expected = legacy_predict(self.predictor, self.reference_model, *car)
+            self.assertAlmostEqual(self.predictor.predict(*car), expected, delta=1e-6)
+
+    def test_reports_unseen_categories(self):
+        result = self.predictor.predict_detailed('MARCA NUEVA', 2019, 'Gasolina', 'Automática',
+                                                 'Cusco, Cusco', 'Sedán')
+        self.assertEqual(result['unseen'], {'brand': 'MARCA NUEVA', 'location': 'Cusco, Cusco'})
+
+    @skipUnless(RUN_BENCHMARKS, 'Microbenchmark: correr con RUN_BENCHMARKS=1')
+    def test_latency_reduction(self):
+        repeats = 100
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for car in SAMPLE_CARS:
+                legacy_predict(self.predictor, self.reference_model, *car)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for car in SAMPLE_CARS:
+                self.predictor.predict(*car)
+        fast_time = time.perf_counter() - start
+
+        calls = repeats * len(SAMPLE_CARS)
+        self.assertLess(
+            fast_time * 2, legacy_time,
+            msg=f"predict: DataFrame {legacy_time / calls * 1e3:.3f} ms/llamada, "
+                f"fast path {fast_time / calls * 1e3:.3f} ms/llamada",
+        )
+
+
+class FlatForestTests(SimpleTestCase):
+    """El motor de arrays planos debe reproducir RandomForestRegressor.predict"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(1)
+        cls.X_train = rng.normal(size=(600, 5))
+        y = cls.X_train[:, 0] * 3 + np.sin(cls.X_train[:, 1]) + rng.normal(0, 0.1, 600)
+        cls.model = RandomForestRegressor(n_estimators=25, min_samples_leaf=2, random_state=0)
+        cls.model.fit(cls.X_train, y)
+        cls.forest = FlatForest.from_sklearn(cls.model)
+
+    def test_matches_sklearn_single_row(self):
+        for row in self.X_train[:20]:
+            row = row.reshape(1, -1)
+            np.testing.assert_allclose(self.forest.predict(row), self.model.predict(row), rtol=1e-10)
+
+    def test_matches_sklearn_large_batch(self):
+        # Más filas que CHUNK_SIZE para pasar por la evaluación en paralelo
+        X = np.random.default_rng(2).normal(size=(FlatForest.CHUNK_SIZE * 3 + 17, 5))
+        np.testing.assert_allclose(self.forest.predict(X), self.model.predict(X), rtol=1e-10)
+
+    def test_rejects_wrong_shape(self):
+        with self.assertRaises(ValueError):
+            self.forest.predict(np.zeros((1, 4)))
+
+    def test_non_forest_is_not_compiled(self):
+        from sklearn.linear_model import LinearRegression
+
+        with self.assertRaises(TypeError):
+            FlatForest.from_sklearn(LinearRegression().fit(self.X_train, self.X_train[:, 0]))
+
+
+class ForestBundleTests(SimpleTestCase):
+    """Artefactos mmap: el predictor no necesita deserializar model.pkl"""
+
+    def setUp(self):
+        self.model_dir = build_model_dir(n_estimators=10)
+        self.addCleanup(shutil.rmtree, self.model_dir, True)
+
+    def test_predictor_uses_mmap_bundle(self):
+        predictor = CarPricePredictor(model_dir=self.model_dir)
+
+        self.assertTrue(predictor.is_loaded)
+        self.assertIsNone(predictor.model)
+        self.assertIsInstance(predictor.engine.threshold, np.memmap)
+        self.assertEqual(predictor.feature_names, FEATURES)
+
+        with open(os.path.join(self.model_dir, MODEL_FILE), 'rb') as f:
+            model = pickle.load(f)
+        for car in SAMPLE_CARS:
+            self.assertAlmostEqual(predictor.predict(*car), legacy_predict(predictor, model, *car), delta=1e-6)
+
+    def test_stale_bundle_is_ignored(self):
+        bundle_meta = os.path.join(self.model_dir, FOREST_DIR, FlatForest.META_FILE)
+        model_path = os.path.join(self.model_dir, MODEL_FILE)
+        mtime = os.path.getmtime(bundle_meta)
+        os.utime(model_path, (mtime + 10, mtime + 10))
+
+        self.assertIsNone(load_forest_bundle(self.model_dir))
+        predictor = CarPricePredictor(model_dir=self.model_dir)
+        self.assertIsNotNone(predictor.model)
+        self.assertIsNotNone(predictor.engine)
+
+
+def import_times(statement):
+    """
+    Ejecuta el import en un proceso nuevo con `python -X importtime`
+
+    Returns:
+        dict: {módulo: tiempo acumulado en microsegundos}
+    """
+    code = (
+        "import os, django\n"
+        "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')\n"
+        "django.setup()\n"
+        f"{statement}\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class LazyLoadingTests(SimpleTestCase):
+    """Importar el URLconf o un comando no debe cargar el modelo ni las librerías de ML"""
+
+    HEAVY_MODULES = ('numpy', 'pandas', 'sklearn', 'apps.predictor.ml.predictor')
+
+    def test_urlconf_does_not_import_model(self):
+        times = import_times('import config.urls')
+
+        self.assertIn('config.urls', times)
+        for module in self.HEAVY_MODULES:
+            self.assertNotIn(module, times)
+
+    def test_scrape_command_does_not_import_model(self):
+        times = import_times('import apps.cars.management.commands.scrape_cars')
+
+        self.assertNotIn('sklearn', times)
+        self.assertNotIn('apps.predictor.ml.predictor', times)
+
+    def test_model_loads_on_first_use(self):
+        model_dir = build_model_dir(n_estimators=5)
+        self.addCleanup(shutil.rmtree, model_dir, True)
+
+        predictor = CarPricePredictor(model_dir=model_dir, autoload=False)
+        self.assertFalse(predictor.is_loaded)
+
+        predictor.predict(*SAMPLE_CARS[0])
+        self.assertTrue(predictor.is_loaded)
+
+
+class HotReloadTests(SimpleTestCase):
+    """Las versiones publicadas se cargan en segundo plano y se activan de forma atómica"""
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir, True)
+
+    def test_reloads_new_version_in_background(self):
+        publish_artifacts(self.model_dir, *train_artifacts(n_estimators=5, seed=1), version='v1')
+        predictor = CarPricePredictor(model_dir=self.model_dir, reload_interval=0.01)
+        first = predictor.predict_detailed(*SAMPLE_CARS[0])
+        self.assertEqual(first['version'], 'v1')
+
+        model, encoders, metrics = train_artifacts(n_estimators=5, seed=2)
+        publish_artifacts(self.model_dir, model, encoders, metrics, version='v2')
+        time.sleep(0.02)
+
+        # La llamada que detecta el cambio sigue usando v1 mientras v2 se carga
+        self.assertEqual(predictor.predict_detailed(*SAMPLE_CARS[0])['version'], 'v1')
+        predictor._reload_thread.join()
+
+        second = predictor.predict_detailed(*SAMPLE_CARS[0])
+        self.assertEqual(second['version'], 'v2')
+        self.assertAlmostEqual(second['price'], legacy_predict(predictor, model, *SAMPLE_CARS[0]), delta=1e-6)
+
+    def test_publish_keeps_recent_versions(self):
+        for version in ('v1', 'v2', 'v3', 'v4'):
+            publish_artifacts(self.model_dir, *train_artifacts(n_estimators=2), version=version, keep=2)
+            time.sleep(0.01)
+
+        self.assertEqual(read_manifest(self.model_dir)['version'], 'v4')
+        self.assertEqual(sorted(os.listdir(os.path.join(self.model_dir, 'versions'))), ['v3', 'v4'])
+
+
+class BatchPredictionTests(SimpleTestCase):
+    """POST /predictor/api/predict/batch/ con entrada y salida en streaming"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model_dir = build_model_dir(n_estimators=10)
+        cls.predictor = CarPricePredictor(model_dir=cls.model_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        patcher = mock.patch('apps.predictor.api_views.get_predictor', return_value=self.predictor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, body, content_type, **extra):
+        response = self.client.post(reverse('predictor:api_predict_batch'), data=body,
+                                    content_type=content_type, **extra)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def records(self):
+        fields = ['brand', 'year', 'fuel', 'transmission', 'location', 'subcategory']
+        return [dict(zip(fields, car)) for car in SAMPLE_CARS]
+
+    def test_json_array_matches_single_predictions(self):
+        body = json.dumps(self.records() + [{'brand': 'KIA', 'year': 'abc'}])
+        lines = [json.loads(line) for line in self.post(body, 'application/json').splitlines()]
+
+        self.assertEqual([line['row'] for line in lines], list(range(len(SAMPLE_CARS) + 1)))
+        for line, car in zip(lines, SAMPLE_CARS):
+            self.assertAlmostEqual(line['predicted_price'], round(self.predictor.predict(*car), 2), places=2)
+        self.assertIn('error', lines[-1])
+
+    def test_ndjson_reports_unseen_per_row(self):
+        records = self.records()
+        records[1]['brand'] = 'MARCA NUEVA'
+        body = '\n'.join(json.dumps(record) for record in records) + '\n{malformado\n'
+        lines = [json.loads(line) for line in self.post(body, 'application/x-ndjson').splitlines()]
+
+        self.assertEqual(lines[0]['unseen_categories'], {})
+        self.assertEqual(lines[1]['unseen_categories'], {'brand': 'MARCA NUEVA'})
+        self.assertIn('error', lines[-1])
+
+    def test_csv_in_csv_out(self):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(self.records()[0]))
+        writer.writeheader()
+        writer.writerows(self.records())
+
+        output = self.post(buffer.getvalue(), 'text/csv', HTTP_ACCEPT='text/csv')
+        rows = list(csv.DictReader(io.StringIO(output)))
+
+        self.assertEqual(len(rows), len(SAMPLE_CARS))
+        self.assertEqual(rows[0]['brand'], 'TOYOTA')
+        self.assertTrue(float(rows[0]['predicted_price']) > 0)
+
+    def test_truncated_json_ends_with_error_line(self):
+        body = json.dumps(self.records())[:-10]
+        lines = [json.loads(line) for line in self.post(body, 'application/json').splitlines()]
+
+        self.assertEqual(len(lines), len(SAMPLE_CARS))
+        self.assertIn('error', lines[-1])
+
+    def test_json_array_parser_across_read_boundaries(self):
+        records = self.records() * 50
+        stream = io.BytesIO(json.dumps(records, ensure_ascii=False).encode('utf-8'))
+        self.assertEqual(list(batch.iter_json_array(stream, read_size=7)), records)
+
+    def test_unsupported_content_type(self):
+        response = self.client.post(reverse('predictor:api_predict_batch'), data='x', content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+
+
+class MicroBatchingTests(SimpleTestCase):
+    """MicroBatcher agrupa predicciones concurrentes de una fila"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Árboles sin límite de profundidad, como el modelo de producción
+        cls.model_dir = build_model_dir(n_estimators=100, n_rows=3000, max_depth=None)
+        cls.predictor = CarPricePredictor(model_dir=cls.model_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def run_concurrently(self, predict, n_threads=64, per_thread=50):
+        """Lanza n_threads hilos que predicen per_thread autos cada uno; resultados por hilo"""
+        results = [None] * n_threads
+        barrier = threading.Barrier(n_threads)
+
+        def worker(index):
+            barrier.wait()
+            results[index] = [predict(*SAMPLE_CARS[i % len(SAMPLE_CARS)]) for i in range(per_thread)]
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_results_match_direct_predictions(self):
+        batcher = MicroBatcher(self.predictor, max_wait=0.002, max_batch=64)
+        futures = [batcher.submit(car) for car in SAMPLE_CARS + [('MARCA NUEVA',) + SAMPLE_CARS[0][1:]]]
+
+        for future, car in zip(futures, SAMPLE_CARS):
+            self.assertEqual(future.result(timeout=5), self.predictor.predict_detailed(*car))
+        self.assertEqual(futures[-1].result(timeout=5)['unseen'], {'brand': 'MARCA NUEVA'})
+
+    def test_concurrent_requests_are_coalesced(self):
+        # max_wait amplio: los 64 hilos alcanzan a sumarse al lote aunque la máquina esté cargada
+        batcher = MicroBatcher(self.predictor, max_wait=0.05, max_batch=64)
+
+        direct = self.run_concurrently(self.predictor.predict_detailed)
+        batched = self.run_concurrently(batcher.predict_detailed)
+        stats = batcher.stats()
+
+        self.assertTrue(batched == direct, 'micro-batching cambió algún resultado')
+        self.assertEqual(stats['requests'], 64 * 50)
+        self.assertLessEqual(stats['max_batch_size'], 64)
+        self.assertGreater(stats['mean_batch_size'], 1)
+
+    def test_errors_reach_every_caller(self):
+        predictor = CarPricePredictor(model_dir=tempfile.mkdtemp(), autoload=False)
+        self.addCleanup(shutil.rmtree, predictor.model_dir, ignore_errors=True)
+        batcher = MicroBatcher(predictor)
+
+        futures = [batcher.submit(car) for car in SAMPLE_CARS]
+        for future in futures:
+            with self.assertRaises(Exception):
+                future.result(timeout=5)
+
+
+class InferenceServiceTests(SimpleTestCase):
+    """Pool de procesos de inferencia detrás de sockets Unix"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model_dir = build_model_dir(n_estimators=10)
+        cls.socket_dir = tempfile.mkdtemp()
+        cls.service = InferenceService(cls.socket_dir, cls.model_dir, authkey=b'test', workers=2)
+        cls.service.start()
+
+        # Los sockets aparecen cuando cada proceso terminó de cargar el modelo
+        deadline = time.monotonic() + 60
+        while len(os.listdir(cls.socket_dir)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        cls.local = CarPricePredictor(model_dir=cls.model_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.stop()
+        shutil.rmtree(cls.socket_dir, ignore_errors=True)
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_predictions_match_local_model(self):
+        client = InferenceClient(self.socket_dir, authkey=b'test')
+        for car in SAMPLE_CARS:
+            self.assertEqual(client.predict_detailed(*car), self.local.predict_detailed(*car))
+        self.assertEqual(client.get_available_brands(), self.local.get_available_brands())
+        self.assertEqual(client.version, self.local.version)
+
+    def test_concurrent_requests_use_every_process(self):
+        client = InferenceClient(self.socket_dir, authkey=b'test')
+        sessions = [client.snapshot() for _ in range(2)]
+        self.addCleanup(lambda: [session.close() for session in sessions])
+
+        # Con una sesión abierta en cada proceso, ninguno queda sin trabajo
+        self.assertEqual(len({session._address for session in sessions}), 2)
+        prices, _ = sessions[0].predict_many(SAMPLE_CARS)
+        self.assertEqual(prices, self.local.snapshot().predict_many(SAMPLE_CARS)[0].tolist())
+
+    def test_dead_socket_is_skipped(self):
+        stale = os.path.join(self.socket_dir, 'worker-9.sock')
+        open(stale, 'w').close()
+        self.addCleanup(os.remove, stale)
+
+        client = InferenceClient(self.socket_dir, authkey=b'test')
+        results = [client.predict(*SAMPLE_CARS[0]) for _ in range(5)]
+        self.assertEqual(len(set(results)), 1)
+
+    def test_batch_endpoint_through_service(self):
+        fields = ['brand', 'year', 'fuel', 'transmission', 'location', 'subcategory']
+        body = json.dumps([dict(zip(fields, car)) for car in SAMPLE_CARS])
+        with self.settings(PREDICTOR_SERVICE_SOCKET_DIR=self.socket_dir, SECRET_KEY='test'):
+            response = self.client.post(reverse('predictor:api_predict_batch'), data=body,
+                                        content_type='application/json')
+            lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+            response.close()
+
+        self.assertEqual(response['X-Model-Version'], self.local.version)
+        for line, car in zip(lines, SAMPLE_CARS):
+            self.assertAlmostEqual(line['predicted_price'], round(self.local.predict(*car), 2), places=2)
+
+
+class PredictionCacheTests(SimpleTestCase):
+    """PredictionCache responde combinaciones repetidas sin pasar por el modelo"""
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir, ignore_errors=True)
+        publish_artifacts(self.model_dir, *train_artifacts(n_estimators=10), version='v1')
+        self.predictor = CarPricePredictor(model_dir=self.model_dir)
+
+    def test_repeated_lookup_skips_model(self):
+        cache = PredictionCache(self.predictor, LocalLRUCache())
+        with mock.patch.object(self.predictor, 'predict_detailed', wraps=self.predictor.predict_detailed) as spy:
+            first = cache.predict_detailed(*SAMPLE_CARS[0])
+            second = cache.predict_detailed(*SAMPLE_CARS[0][:1] + ('2020',) + SAMPLE_CARS[0][2:])
+
+        self.assertEqual(spy.call_count, 1)
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['price'], first['price'])
+        self.assertEqual(cache.stats()['hit_ratio'], 0.5)
+
+    def test_reload_flushes_cache(self):
+        cache = PredictionCache(self.predictor, LocalLRUCache())
+        old = cache.predict_detailed(*SAMPLE_CARS[0])
+
+        publish_artifacts(self.model_dir, *train_artifacts(n_estimators=10, seed=1), version='v2')
+        self.predictor.reload()
+        new = cache.predict_detailed(*SAMPLE_CARS[0])
+
+        self.assertFalse(new['cached'])
+        self.assertEqual((old['version'], new['version']), ('v1', 'v2'))
+        self.assertEqual(len(cache.backend), 1)
+
+    def test_lru_is_bounded(self):
+        storage = LocalLRUCache(maxsize=2)
+        cache = PredictionCache(self.predictor, storage)
+        for car in SAMPLE_CARS[:3]:
+            cache.predict_detailed(*car)
+        cache.predict_detailed(*SAMPLE_CARS[0])
+
+        self.assertEqual(len(storage), 2)
+        self.assertEqual(cache.stats()['hits'], 0)
+
+    def test_django_backend_is_shared_between_workers(self):
+        worker_a = PredictionCache(self.predictor, DjangoCacheBackend())
+        worker_b = PredictionCache(self.predictor, DjangoCacheBackend())
+
+        price = worker_a.predict_detailed(*SAMPLE_CARS[1])['price']
+        result = worker_b.predict_detailed(*SAMPLE_CARS[1])
+
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['price'], price)
+
+
+    def test_concurrent_first_requests_share_one_cache(self):
+        def slow_storage(**kwargs):
+            time.sleep(0.05)
+            return LocalLRUCache(**kwargs)
+
+        with mock.patch.object(ml, '_prediction_cache', None), \
+                mock.patch('apps.predictor.ml.cache.LocalLRUCache', side_effect=slow_storage) as storage:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                caches = list(pool.map(lambda _: ml.get_prediction_cache(self.predictor), range(8)))
+
+        self.assertEqual(storage.call_count, 1)
+        self.assertTrue(all(cache is caches[0] for cache in caches))
+
+    def test_django_backend_keys_do_not_collide(self):
+        storage = DjangoCacheBackend()
+        spaced = ('MERCEDES BENZ', 2018, 'Gasolina', 'Automática', 'Lima, Lima', 'Sedán', 'v1')
+        underscored = ('MERCEDES_BENZ',) + spaced[1:]
+        storage.set(spaced, {'price': 1.0})
+
+        self.assertIsNone(storage.get(underscored))
+        self.assertEqual(storage.get(spaced), {'price': 1.0})
+        self.assertNotIn(' ', storage._key(spaced))
+
+class PredictViewTests(SimpleTestCase):
+    """POST /predictor/api/predict/ con caché y micro-batching"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model_dir = build_model_dir(n_estimators=10)
+        cls.predictor = CarPricePredictor(model_dir=cls.model_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        for target, kwargs in (
+            ('apps.predictor.api_views.get_predictor', {'return_value': self.predictor}),
+            ('apps.predictor.api_views.Prediction.objects.create', {}),
+            # Sin autos similares: filter().exclude().order_by()[:5] vacío
+            ('apps.predictor.api_views.Car.objects.filter', {'new': mock.MagicMock(**{
+                'return_value.exclude.return_value.order_by.return_value.__getitem__.return_value.count.return_value': 0,
+            })}),
+        ):
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_predict_through_cache_and_batcher(self):
+        fields = ['brand', 'year', 'fuel', 'transmission', 'location', 'subcategory']
+        payload = dict(zip(fields, SAMPLE_CARS[0]))
+
+        for microbatch in (False, True):
+            with self.settings(PREDICTOR_MICROBATCH=microbatch, PREDICTOR_CACHE='local'):
+                response = self.client.post(reverse('predictor:api_predict'), data=payload,
+                                            content_type='application/json')
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(response.json()['predicted_price'], self.predictor.predict(*SAMPLE_CARS[0]))
+            self.assertEqual(response.json()['metrics'], self.predictor.get_metrics())
+
+
+class PriceCurveTests(SimpleTestCase):
+    """Curvas de precio con una sola predicción vectorizada"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model_dir = build_model_dir(n_estimators=100, n_rows=3000, max_depth=None)
+        cls.predictor = CarPricePredictor(model_dir=cls.model_dir)
+        cls.base = dict(zip(INPUT_FIELDS, SAMPLE_CARS[0]))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def single(self, **changes):
+        return self.predictor.predict_detailed(**{**self.base, **changes})
+
+    def test_year_curve_matches_single_predictions(self):
+        years = list(range(1995, 2025))
+        result = self.predictor.predict_curve(self.base, 'year', years)
+
+        self.assertEqual(result['prices'], [self.single(year=year)['price'] for year in years])
+
+    def test_location_curve_reports_unseen(self):
+        locations = ['Lima, Lima', 'Cusco, Cusco', 'Arequipa, Arequipa']
+        result = self.predictor.predict_curve({**self.base, 'brand': 'MARCA NUEVA'}, 'location', locations)
+
+        for location, price, unseen in zip(locations, result['prices'], result['unseen']):
+            expected = self.single(brand='MARCA NUEVA', location=location)
+            self.assertEqual(price, expected['price'])
+            self.assertEqual(unseen, expected['unseen'])
+        self.assertEqual(result['unseen'][1], {'brand': 'MARCA NUEVA', 'location': 'Cusco, Cusco'})
+
+    def test_curve_runs_one_vectorized_prediction(self):
+        years = list(range(1995, 2025))
+        expected = [self.single(year=year)['price'] for year in years]
+
+        with mock.patch.object(FlatForest, 'predict', autospec=True, side_effect=FlatForest.predict) as predict:
+            result = self.predictor.predict_curve(self.base, 'year', years)
+
+        self.assertEqual(predict.call_count, 1)
+        self.assertEqual(len(predict.call_args[0][1]), len(years))
+        self.assertEqual(result['prices'], expected)
+
+    def test_curve_endpoint(self):
+        with mock.patch('apps.predictor.api_views.get_predictor', return_value=self.predictor):
+            response = self.client.post(
+                reverse('predictor:api_predict_curve'),
+                data={**self.base, 'year_from': 2010, 'year_to': 2015},
+                content_type='application/json',
+            )
+            invalid = self.client.post(
+                reverse('predictor:api_predict_curve'),
+                data={**self.base, 'vary': 'fuel'},
+                content_type='application/json',
+            )
+
+        self.assertEqual(response.status_code, 200, response.content)
+        points = response.json()['points']
+        self.assertEqual([point['year'] for point in points], list(range(2010, 2016)))
+        self.assertEqual(points[0]['predicted_price'], self.single(year=2010)['price'])
+        self.assertNotIn('year', response.json()['base'])
+        self.assertEqual(invalid.status_code, 400)
+
+
+class ScoreListingsTests(SimpleTestCase):
+    """Puntaje de mercado por bloques (score_listings)"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model_dir = build_model_dir(n_estimators=10)
+        cls.predictor = CarPricePredictor(model_dir=cls.model_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_scores_match_predictor(self):
+        fecha = datetime(2026, 1, 1)
+        rows = [(index, *car, Decimal('15000.00'), fecha) for index, car in enumerate(SAMPLE_CARS)]
+        rows.append((99, 'KIA', 2015, 'Diesel', 'Mecánica', 'Lima, Lima', None, None, fecha))
+
+        scores = scoring.score_rows(rows, model=self.predictor.snapshot())
+
+        for (car_id, predicted, price, residual, residual_pct, _), car in zip(scores, SAMPLE_CARS):
+            expected = round(self.predictor.predict(*car), 2)
+            self.assertEqual(predicted, expected)
+            self.assertEqual(residual, round(15000 - expected, 2))
+            self.assertAlmostEqual(residual_pct, residual / expected)
+
+        # Sin subcategoría ni precio: se predice igual, sin residuo
+        self.assertEqual(scores[-1][0], 99)
+        self.assertEqual(scores[-1][2:5], (None, None, None))
+
+    def test_since_last_run_rescores_only_price_or_model_changes(self):
+        connection = car_tables(self)
+        scored = datetime(2026, 10, 1, tzinfo=timezone.utc)
+        later = datetime(2026, 10, 8, tzinfo=timezone.utc)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE predictor_listingscore ("
+                "id bigserial PRIMARY KEY, car_id bigint UNIQUE, precio_predicho numeric(12, 2) NOT NULL, "
+                "precio_publicado numeric(12, 2), residuo numeric(12, 2), residuo_pct double precision, "
+                "model_version varchar(50) NOT NULL, car_fecha timestamptz, scored_at timestamptz NOT NULL)"
+            )
+            # Todos vistos de nuevo en una carga posterior (fecha actualizada)
+            cursor.execute(
+                "INSERT INTO tbl_auto_raw_taller (id, price, fecha) VALUES "
+                "(1, 10000, %(later)s), (2, 12000, %(later)s), (3, NULL, %(later)s), "
+                "(4, 9000, %(later)s), (5, 8000, %(later)s)",
+                {'later': later},
+            )
+            # 1: mismo precio; 2: cambió de precio; 3: sigue sin precio; 4: otra versión; 5: sin puntaje
+            cursor.execute(
+                "INSERT INTO predictor_listingscore "
+                "(car_id, precio_predicho, precio_publicado, model_version, car_fecha, scored_at) VALUES "
+                "(1, 9500, 10000, 'v1', %(scored)s, %(scored)s), (2, 9500, 11000, 'v1', %(scored)s, %(scored)s), "
+                "(3, 9500, NULL, 'v1', NULL, %(scored)s), (4, 9500, 9000, 'v0', %(scored)s, %(scored)s)",
+                {'scored': scored},
+            )
+            queryset = pending_scores(Car.objects.filter(is_active=True), 'v1')
+            sql, params = queryset.order_by('id').values_list('id', flat=True).query.sql_with_params()
+            cursor.execute(sql, params)
+            pending = [row[0] for row in cursor.fetchall()]
+
+        self.assertEqual(pending, [2, 4, 5])
+
+    def test_bounded_map_keeps_order(self):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = list(bounded_map(executor, lambda x: x * 2, range(20), max_pending=4))
+        self.assertEqual(results, [x * 2 for x in range(20)])
+
+
+class FeaturePipelineTests(SimpleTestCase):
+    """Mismo pipeline de features al entrenar, al predecir una fila y al predecir lotes"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(3)
+        n_rows = 300
+        cls.frame = pd.DataFrame({
+            col: rng.choice(CLASSES[col], n_rows) for col in INPUT_FIELDS if col != 'year'
+        })
+        cls.frame['year'] = rng.integers(1995, 2026, n_rows)
+        cls.frame.loc[::17, 'fuel'] = None
+        cls.features = FeatureTransformer.fit(cls.frame)
+        y = 3000 + (cls.frame['year'] - 1995) * 900 + rng.normal(0, 500, n_rows)
+
+        cls.model = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0)
+        cls.model.fit(cls.features.transform_frame(cls.frame), y)
+        cls.model_dir = tempfile.mkdtemp()
+        publish_artifacts(cls.model_dir, cls.model, cls.features.encoders,
+                          {'test_r2': 0.9, 'features_used': FEATURES}, features=cls.features)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_row_and_batch_are_byte_identical(self):
+        cars = SAMPLE_CARS + [
+            ('FERRARI', 2019, None, 'Automática', 'Cusco, Cusco', 'Sedán'),
+            ('KIA', 2015, float('nan'), 'Mecánica', 'Lima, Lima', None),
+        ]
+        X, unseen = self.features.transform(*zip(*cars))
+        for i, car in enumerate(cars):
+            row, row_unseen = self.features.transform_row(*car)
+            self.assertEqual(row.tobytes(), X[i:i + 1].tobytes())
+            self.assertEqual(set(row_unseen), {col for col, mask in unseen.items() if mask[i]})
+
+        # None y NaN se codifican como la categoría de relleno vista al entrenar
+        self.assertEqual(X[4, FEATURES.index('fuel')], X[5, FEATURES.index('fuel')])
+        self.assertNotIn('fuel', self.features.transform_row(*cars[4])[1])
+
+    def test_predictor_matches_training_matrix(self):
+        predictor = CarPricePredictor(model_dir=self.model_dir)
+        expected = self.model.predict(self.features.transform_frame(self.frame.head(50)))
+        rows = self.frame.head(50)[INPUT_FIELDS].itertuples(index=False)
+        prices, _ = predictor.snapshot().predict_many([tuple(row) for row in rows])
+        np.testing.assert_allclose(prices, expected, rtol=1e-9)
+
+    def test_pickle_round_trip(self):
+        restored = pickle.loads(pickle.dumps(self.features))
+        self.assertEqual(restored.category_codes, self.features.category_codes)
+        X, _ = restored.transform(*zip(*SAMPLE_CARS))
+        self.assertEqual(X.tobytes(), self.features.transform(*zip(*SAMPLE_CARS))[0].tobytes())
+
+
+class ModelBackendTests(SimpleTestCase):
+    """Backend hgb: HistGradientBoosting con categóricas nativas servido por el mismo predictor"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(5)
+        n_rows = 400
+        cls.frame = pd.DataFrame({
+            col: rng.choice(CLASSES[col], n_rows) for col in INPUT_FIELDS if col != 'year'
+        })
+        cls.frame['year'] = rng.integers(1995, 2026, n_rows)
+        y = 3000 + (cls.frame['year'] - 1995) * 900 + (cls.frame['brand'] == 'TOYOTA') * 4000
+
+        cls.features = FeatureTransformer.fit(cls.frame, **feature_options('hgb'))
+        cls.model = build_model('hgb', cls.features, max_iter=50)
+        cls.model.fit(cls.features.transform_frame(cls.frame), y)
+        cls.model_dir = tempfile.mkdtemp()
+        publish_artifacts(cls.model_dir, cls.model, cls.features.encoders,
+                          {'test_r2': 0.9, 'model_backend': 'hgb'}, features=cls.features)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_categorical_columns_are_native(self):
+        mask = categorical_mask(self.features)
+        self.assertEqual([name for name, flag in zip(FEATURES, mask) if flag], CATEGORICAL_FEATURES)
+        self.assertTrue(self.model.is_categorical_.any())
+
+    def test_predictor_serves_hgb_model(self):
+        predictor = CarPricePredictor(model_dir=self.model_dir)
+        state = predictor.snapshot()
+        self.assertIsNone(state.engine)
+
+        expected = self.model.predict(self.features.transform_frame(self.frame.head(20)))
+        rows = [tuple(row) for row in self.frame.head(20)[INPUT_FIELDS].itertuples(index=False)]
+        prices, _ = state.predict_many(rows)
+        np.testing.assert_allclose(prices, expected, rtol=1e-9)
+
+        # Categoría no vista: faltante (NaN) en vez del código 0 de otra marca
+        row, unseen = self.features.transform_row('FERRARI', 2020, 'Gasolina', 'Automática', 'Lima, Lima', 'Sedán')
+        self.assertTrue(np.isnan(row[0, FEATURES.index('brand')]))
+        result = predictor.predict_detailed('FERRARI', 2020, 'Gasolina', 'Automática', 'Lima, Lima', 'Sedán')
+        self.assertIn('brand', result['unseen'])
+        self.assertTrue(np.isfinite(result['price']))
+
+
+class HalvingSearchTests(SimpleTestCase):
+    """Búsqueda de hiperparámetros con presupuesto de tiempo y warm start desde metrics.pkl"""
+
+    GRID = {'max_iter': [10, 20, 30], 'max_leaf_nodes': [7, 15, 31], 'learning_rate': [0.1, 0.3]}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(9)
+        n_rows = 3000
+        frame = pd.DataFrame({
+            col: rng.choice(CLASSES[col], n_rows) for col in INPUT_FIELDS if col != 'year'
+        })
+        frame['year'] = rng.integers(1995, 2026, n_rows)
+        cls.y = 3000 + (frame['year'] - 1995) * 900 + rng.normal(0, 500, n_rows)
+        cls.features = FeatureTransformer.fit(frame, **feature_options('hgb'))
+        cls.X = cls.features.transform_frame(frame)
+        cls.folds = EncodedFolds(cls.X, cls.y, cv=3, random_state=0)
+
+    def test_folds_are_encoded_once(self):
+        self.assertEqual(len(self.folds), 3)
+        X_train, y_train, X_val, y_val = self.folds.folds[0]
+        self.assertTrue(X_train.flags['C_CONTIGUOUS'])
+        self.assertEqual(len(X_train) + len(X_val), len(self.X))
+        # Cada ronda entrena con un prefijo (vista) de las filas ya barajadas
+        self.assertEqual(self.folds.max_resources, min(len(fold[0]) for fold in self.folds.folds))
+
+    def test_search_halves_candidates_each_rung(self):
+        search = halving_search('hgb', self.features, self.folds, self.GRID, budget_seconds=600,
+                                n_candidates=9, random_state=0)
+        self.assertTrue(search['completed'])
+        self.assertEqual(search['n_rungs'], 2)
+
+        rungs = [result['rung'] for result in search['results']]
+        self.assertEqual((rungs.count(0), rungs.count(1)), (9, 3))
+        last_rung = [result for result in search['results'] if result['rung'] == 1]
+        self.assertEqual(search['best_n_samples'], self.folds.max_resources)
+        self.assertEqual(search['best_score'], max(result['mean_score'] for result in last_rung))
+        self.assertEqual(len(search['best_cv_scores']), 3)
+
+    def test_budget_stops_search(self):
+        search = halving_search('hgb', self.features, self.folds, self.GRID, budget_seconds=0,
+                                n_candidates=9, random_state=0)
+        self.assertFalse(search['completed'])
+        # Siempre se evalúa al menos una configuración
+        self.assertEqual(len(search['results']), 1)
+        self.assertEqual(search['best_params'], search['results'][0]['params'])
+
+    def test_previous_search_warm_starts_next_one(self):
+        search = halving_search('hgb', self.features, self.folds, self.GRID, budget_seconds=600,
+                                n_candidates=9, random_state=0)
+        model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, model_dir, True)
+        model = build_model('hgb', self.features, **search['best_params']).fit(self.X, self.y)
+        publish_artifacts(model_dir, model, self.features.encoders, {'search': search},
+                          features=self.features)
+
+        warm_start = previous_search(model_dir, 'hgb')
+        self.assertEqual(warm_start[0], search['best_params'])
+        self.assertEqual(len(warm_start), 3)
+        self.assertEqual(previous_search(model_dir, 'forest'), [])
+        self.assertEqual(previous_search(tempfile.gettempdir() + '/no-existe', 'hgb'), [])
+
+        candidates = sample_candidates(self.GRID, 9, warm_start, random_state=1)
+        self.assertEqual(candidates[:3], warm_start)
+        self.assertEqual(len({repr(sorted(c.items())) for c in candidates}), 9)
+
+
+class IncrementalRetrainTests(SimpleTestCase):
+    """Reentrenamiento incremental: árboles nuevos con el delta y política de reconstrucción"""
+
+    def setUp(self):
+        self.model, self.encoders, metrics = train_artifacts(n_estimators=20, n_rows=300)
+        self.now = datetime(2026, 10, 19, tzinfo=timezone.utc)
+        self.metrics = {
+            **metrics,
+            **full_rebuild_metadata('2026-10-18T00:00:00+00:00', self.model, now=self.now),
+        }
+
+    def test_extend_forest_keeps_existing_trees(self):
+        old_trees = list(self.model.estimators_)
+        X_new, _ = FeatureTransformer(self.encoders).transform(*zip(*SAMPLE_CARS * 10))
+        extend_forest(self.model, pd.DataFrame(X_new, columns=FEATURES), np.full(len(X_new), 9000.0), 5)
+
+        self.assertEqual(len(self.model.estimators_), 25)
+        self.assertEqual(self.model.estimators_[:20], old_trees)
+        self.assertFalse(self.model.warm_start)
+        # El bosque ampliado se sigue compilando para servir
+        self.assertEqual(FlatForest.from_sklearn(self.model).n_trees, 25)
+
+    def test_new_trees_follow_row_share(self):
+        self.assertEqual(new_tree_count(200, 10000, 1000), 20)
+        self.assertEqual(new_tree_count(200, 10000, 10), 5)
+
+    def test_rebuild_policy(self):
+        self.assertEqual(should_rebuild(self.model, self.metrics, now=self.now), (False, None))
+
+        cases = [
+            ({'watermark': None}, {}),
+            ({'incremental_updates': MAX_INCREMENTAL_UPDATES}, {}),
+            ({'last_full_rebuild': '2026-10-01T00:00:00+00:00'}, {}),
+            ({'base_estimators': 10}, {}),
+            ({}, {'unseen_rate': 0.2}),
+            ({}, {'delta_mae': self.metrics['test_mae'] * 3}),
+        ]
+        for overrides, kwargs in cases:
+            with self.subTest(overrides=overrides, kwargs=kwargs):
+                rebuild, reason = should_rebuild(self.model, {**self.metrics, **overrides}, now=self.now, **kwargs)
+                self.assertTrue(rebuild)
+                self.assertTrue(reason)
+
+        rebuild, _ = should_rebuild(object(), self.metrics, now=self.now)
+        self.assertTrue(rebuild)
+
+    def test_unseen_rate_counts_input_columns(self):
+        features = FeatureTransformer(self.encoders)
+        frame = pd.DataFrame(SAMPLE_CARS + [('FERRARI', 2020, 'Gasolina', 'Automática', 'Lima, Lima', 'Sedán')],
+                             columns=INPUT_FIELDS)
+        self.assertAlmostEqual(unseen_rate(features, frame), 1 / 5)
+
+
+class TrainingModuleTests(SimpleTestCase):
+    """Carga compacta con filtros en SQL y entrenamiento compartido (comando train_model)"""
+
+    def test_query_projects_columns_and_pushes_filters(self):
+        sql, params = training.build_training_query(**training.DEFAULT_FILTERS)
+        self.assertNotIn('*', sql.split('FROM tbl_auto_raw_taller')[0])
+        self.assertNotIn('title', sql)
+        self.assertIn('percentile_cont(0.25)', sql)
+        self.assertIn('HAVING count(*) >= %(min_count)s', sql)
+        self.assertIn('fecha <= %(watermark)s', sql)
+        self.assertEqual(params['price_min'], 3000)
+
+        sql, _ = training.build_training_query(3000, 80000, 1995, 2026, iqr_factor=0, min_category_count=0)
+        self.assertNotIn('percentile_cont', sql)
+        self.assertNotIn('HAVING', sql)
+
+    def test_delta_selects_only_first_seen_after_watermark(self):
+        connection = car_tables(self)
+        watermark = datetime(2026, 10, 1, tzinfo=timezone.utc)
+        later = datetime(2026, 10, 8, tzinfo=timezone.utc)
+        with connection.cursor() as cursor:
+            # 1: visto antes y de nuevo en la carga nueva (fecha actualizada)
+            # 2: nuevo; 3: nuevo pero ya retirado
+            cursor.execute(
+                "INSERT INTO tbl_auto_raw_taller (id, brand, year, price, fecha, is_active) VALUES "
+                "(1, 'KIA', 2018, 9000, %(later)s, true), (2, 'TOYOTA', 2020, 15000, %(later)s, true), "
+                "(3, 'NISSAN', 2019, 12000, %(later)s, false)",
+                {'later': later},
+            )
+            cursor.execute(
+                "INSERT INTO car_price_history (car_id, price, observed_at) VALUES "
+                "(1, 9500, %(before)s), (1, 9000, %(later)s), (2, 15000, %(later)s), (3, 12000, %(later)s)",
+                {'before': datetime(2026, 9, 1, tzinfo=timezone.utc), 'later': later},
+            )
+            sql, params = training.build_delta_query(watermark)
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        self.assertEqual([(row[0], row[-1]) for row in rows], [('TOYOTA', later)])
+
+    def test_delta_trimmed_with_stored_training_bounds(self):
+        connection = car_tables(self)
+        watermark = datetime(2026, 10, 1, tzinfo=timezone.utc)
+        prices = [5000, 9000, 10000, 11000, 12000, 15000, 90000]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO tbl_auto_raw_taller (id, year, price, fecha) VALUES (%s, 2018, %s, %s)",
+                [(i, price, watermark) for i, price in enumerate(prices)],
+            )
+        filters = {**training.DEFAULT_FILTERS, 'price_max': 80000}
+        bounds = training.training_price_bounds(connection, watermark, **filters)
+        # Sin el auto de 90000 (price_max): Q1 9250, Q3 11750, límites IQR 5500 - 15500
+        self.assertEqual(bounds, {'min': 5500.0, 'max': 15500.0})
+
+        filters, bounds = training.delta_filters({'filters': filters, 'price_bounds': bounds})
+        delta = pd.DataFrame({'price': [4000, 5600, 15000, 16000, None, 8000], 'year': [2018] * 5 + [1990]})
+        self.assertEqual(training.filter_delta(delta, filters, bounds)['price'].tolist(), [5600, 15000])
+
+        # Modelo sin filtros guardados: los mismos de una reconstrucción (DEFAULT_FILTERS)
+        filters, bounds = training.delta_filters({'price_range': {'min': 9000, 'max': 12000}})
+        self.assertEqual(bounds, {'min': 3000, 'max': 100000})
+        self.assertEqual(filters['year_min'], 1995)
+
+    def test_compact_frame_builder(self):
+        builder = training.CompactFrameBuilder()
+        rows = [car + (Decimal('15000.00'),) for car in SAMPLE_CARS]
+        builder.add(rows[:2])
+        builder.add(rows[2:] + [('KIA', 2018, None, 'Mecánica', 'Lima, Lima', None, Decimal('9000'))])
+        frame = builder.build()
+
+        self.assertEqual(len(frame), 5)
+        self.assertEqual(str(frame['brand'].dtype), 'category')
+        self.assertEqual(frame['year'].dtype, np.int16)
+        self.assertEqual(frame['price'].dtype, np.float32)
+        self.assertEqual(list(frame['brand']), ['TOYOTA', 'KIA', 'HYUNDAI', 'NISSAN', 'KIA'])
+        self.assertTrue(pd.isna(frame['fuel'].iloc[4]))
+
+        # El pipeline de features acepta el frame compacto igual que uno de pandas
+        features = FeatureTransformer.fit(frame)
+        X = features.transform_frame(frame)
+        row, _ = features.transform_row('KIA', 2018, None, 'Mecánica', 'Lima, Lima', None)
+        self.assertEqual(X.iloc[4:5].to_numpy().tobytes(), row.tobytes())
+
+    def test_train_returns_publishable_model(self):
+        rng = np.random.default_rng(11)
+        builder = training.CompactFrameBuilder()
+        years = rng.integers(1995, 2026, 1500)
+        builder.add([
+            (str(rng.choice(CLASSES['brand'])), int(year), str(rng.choice(CLASSES['fuel'])),
+             str(rng.choice(CLASSES['transmission'])), str(rng.choice(CLASSES['location'])),
+             str(rng.choice(CLASSES['subcategory'])), 3000 + (year - 1995) * 900)
+            for year in years
+        ])
+        frame = builder.build()
+
+        X, y, features = training.encode(frame, 'hgb')
+        model, metrics = training.train(X, y, features, 'hgb', budget_seconds=2)
+        for key in ('test_mae', 'test_r2', 'cv_r2_mean', 'best_params', 'search', 'price_range'):
+            self.assertIn(key, metrics)
+        self.assertGreater(metrics['test_r2'], 0.9)
+
+        model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, model_dir, True)
+        publish_artifacts(model_dir, model, features.encoders, metrics, features=features)
+        price = CarPricePredictor(model_dir=model_dir).predict(*SAMPLE_CARS[0])
+        self.assertAlmostEqual(price, 3000 + 25 * 900, delta=2000)
+
+
+class FeatureSnapshotTests(SimpleTestCase):
+    """Snapshots de la matriz codificada, con clave por datos y pipeline"""
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_dir, True)
+        frame = pd.DataFrame(SAMPLE_CARS * 5, columns=INPUT_FIELDS)
+        frame['price'] = np.arange(len(frame)) * 1000.0 + 5000
+        self.X, self.y, self.features = training.encode(frame, 'forest')
+
+    def test_key_changes_with_data_and_pipeline(self):
+        fingerprint = {'rows': 20, 'hash': 123}
+        config = self.features.config()
+        key = snapshot_key(fingerprint, '2026-10-19T00:00:00+00:00', config)
+
+        self.assertEqual(key, snapshot_key(dict(fingerprint), '2026-10-19T00:00:00+00:00', dict(config)))
+        self.assertNotEqual(key, snapshot_key({'rows': 20, 'hash': 124}, '2026-10-19T00:00:00+00:00', config))
+        self.assertNotEqual(key, snapshot_key(fingerprint, '2026-10-20T00:00:00+00:00', config))
+        hgb_config = FeatureTransformer({}, **feature_options('hgb')).config()
+        self.assertNotEqual(key, snapshot_key(fingerprint, '2026-10-19T00:00:00+00:00', hgb_config))
+
+    def test_round_trip(self):
+        self.assertIsNone(load_snapshot(self.snapshot_dir, 'abc'))
+        save_snapshot(self.snapshot_dir, 'abc', self.X, self.y, self.features)
+
+        X, y, features = load_snapshot(self.snapshot_dir, 'abc')
+        self.assertEqual(X.to_numpy().tobytes(), self.X.to_numpy().tobytes())
+        self.assertEqual(list(X.columns), FEATURES)
+        np.testing.assert_array_equal(y.to_numpy(), self.y.to_numpy())
+        self.assertEqual(features.category_codes, self.features.category_codes)
+
+    def test_old_snapshots_are_pruned(self):
+        for i, key in enumerate(['a', 'b', 'c', 'd']):
+            save_snapshot(self.snapshot_dir, key, self.X, self.y, self.features, keep=2)
+            meta = os.path.join(self.snapshot_dir, key, 'meta.json')
+            os.utime(meta, (1000 + i, 1000 + i))
+        self.assertEqual(sorted(os.listdir(self.snapshot_dir)), ['c', 'd'])
+
+    def test_load_features_skips_database_read_on_hit(self):
+        watermark = datetime(2026, 10, 19, tzinfo=timezone.utc)
+        fingerprint = {'rows': len(self.y), 'hash': 42}
+        config = {**self.features.config(), 'filters': training.DEFAULT_FILTERS}
+        key = snapshot_key(fingerprint, watermark.isoformat(), config)
+        save_snapshot(self.snapshot_dir, key, self.X, self.y, self.features)
+
+        with mock.patch.object(training, 'current_watermark', return_value=watermark), \
+                mock.patch.object(training, 'source_fingerprint', return_value=fingerprint), \
+                mock.patch.object(training, 'load_training_frame') as load_frame:
+            X, y, features, watermark_iso, hit = training.load_features(
+                mock.Mock(), 'forest', snapshot_dir=self.snapshot_dir
+            )
+        self.assertTrue(hit)
+        load_frame.assert_not_called()
+        self.assertEqual(watermark_iso, watermark.isoformat())
+        self.assertEqual(len(X), len(self.y))
@@ -0,0 +1,464 @@
+"""
+Entrenamiento del modelo a partir de tbl_auto_raw_taller
+
+Módulo compartido por el comando train_model: en vez de traer la tabla
+completa (SELECT *) y filtrar en pandas, la consulta proyecta solo las
+columnas del modelo y aplica en PostgreSQL los mismos filtros que
+MODELO_DEFINITIVO.py (rango de precios y años, outliers por IQR y
+categorías con pocos autos). Las filas llegan por bloques desde un cursor
+del servidor y se guardan con tipos compactos (categorías como códigos,
+year int16, price float32), así que la memoria depende de las columnas del
+modelo y no del ancho de la tabla.
+
+La matriz codificada se guarda como snapshot (ml/snapshots.py) con una clave
+que combina una huella de las filas calculada en la BD, la marca de agua y
+la configuración del pipeline: si nada cambió, load_features no lee ni
+codifica los autos.
+"""
+
+import os
+import resource
+import time
+
+import numpy as np
+
+from .ml import INPUT_FIELDS
+
+
+# Columnas categóricas filtradas por cantidad mínima de autos
+CATEGORY_FIELDS = [col for col in INPUT_FIELDS if col != 'year']
+
+DEFAULT_FILTERS = {
+    'price_min': 3000,
+    'price_max': 100000,
+    'year_min': 1995,
+    'year_max': 2026,
+    'iqr_factor': 1.5,
+    'min_category_count': 5,
+}
+
+
+def peak_memory_mb():
+    """Pico de memoria residente del proceso (MB)"""
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Autos que pasan los filtros de precio y año, hasta la marca de agua
+BASE_SQL = """
+        WITH base AS (
+            SELECT {columns}
+            FROM tbl_auto_raw_taller
+            WHERE price IS NOT NULL
+              AND price BETWEEN %(price_min)s AND %(price_max)s
+              AND year BETWEEN %(year_min)s AND %(year_max)s
+              AND fecha <= %(watermark)s
+              AND is_active
+        )"""
+
+# Cuartiles de precio de base (filtro IQR)
+BOUNDS_SQL = """,
+        bounds AS (
+            SELECT percentile_cont(0.25) WITHIN GROUP (ORDER BY price) AS q1,
+                   percentile_cont(0.75) WITHIN GROUP (ORDER BY price) AS q3
+            FROM base
+        )"""
+
+
+def build_training_query(price_min, price_max, year_min, year_max, iqr_factor=1.5,
+                         min_category_count=5):
+    """
+    Consulta de entrenamiento con los filtros aplicados en la BD
+
+    Los conteos de categorías se calculan una vez sobre los autos que pasan
+    los filtros de precio, año e IQR (MODELO_DEFINITIVO los recalculaba
+    columna por columna sobre el DataFrame ya filtrado).
+
+    Args:
+        iqr_factor (float): Outliers fuera de [Q1 - f*IQR, Q3 + f*IQR] (0 = sin filtro IQR)
+        min_category_count (int): Autos mínimos por categoría (0 = sin filtro)
+
+    Returns:
+        tuple: (sql, params) con marcadores %(nombre)s; params incluye
+        'watermark', que debe completarse con la fecha máxima leída
+    """
+    columns = ', '.join(INPUT_FIELDS + ['price'])
+    params = {
+        'price_min': price_min,
+        'price_max': price_max,
+        'year_min': year_min,
+        'year_max': year_max,
+        'iqr_factor': iqr_factor,
+        'min_count': min_category_count,
+        'watermark': None,
+    }
+
+    sql = BASE_SQL.format(columns=columns)
+
+    if iqr_factor:
+        sql += BOUNDS_SQL + """,
+        filtered AS (
+            SELECT base.*
+            FROM base, bounds
+            WHERE base.price BETWEEN bounds.q1 - %(iqr_factor)s * (bounds.q3 - bounds.q1)
+                                 AND bounds.q3 + %(iqr_factor)s * (bounds.q3 - bounds.q1)
+        )"""
+    else:
+        sql += """,
+        filtered AS (SELECT * FROM base)"""
+
+    sql += f"""
+        SELECT {columns}
+        FROM filtered"""
+
+    if min_category_count:
+        conditions = [
+            f"{col} IN (SELECT {col} FROM filtered GROUP BY {col} HAVING count(*) >= %(min_count)s)"
+            for col in CATEGORY_FIELDS
+        ]
+        sql += "\n        WHERE " + "\n          AND ".join(conditions)
+
+    return sql, params
+
+
+def training_price_bounds(connection, watermark, **filters):
+    """
+    Rango de precios efectivo del entrenamiento: filtro de precio más límites IQR
+
+    Se guarda en metrics.pkl (price_bounds) para que el reentrenamiento
+    incremental recorte los autos nuevos igual que la reconstrucción.
+
+    Args:
+        watermark: Fecha máxima leída por el entrenamiento
+        **filters: Parámetros de build_training_query (por defecto DEFAULT_FILTERS)
+
+    Returns:
+        dict: min y max
+    """
+    filters = {**DEFAULT_FILTERS, **filters}
+    if not filters['iqr_factor']:
+        return {'min': float(filters['price_min']), 'max': float(filters['price_max'])}
+
+    _, params = build_training_query(**filters)
+    params['watermark'] = watermark
+    sql = BASE_SQL.format(columns='price') + BOUNDS_SQL + """
+        SELECT greatest(%(price_min)s, q1 - %(iqr_factor)s * (q3 - q1)),
+               least(%(price_max)s, q3 + %(iqr_factor)s * (q3 - q1))
+        FROM bounds"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        low, high = cursor.fetchone()
+    if low is None:
+        return {'min': float(filters['price_min']), 'max': float(filters['price_max'])}
+    return {'min': float(low), 'max': float(high)}
+
+
+def delta_filters(metrics):
+    """
+    Filtros del modelo publicado para los autos del reentrenamiento incremental
+
+    Los modelos anteriores a price_bounds usan DEFAULT_FILTERS sin límites IQR.
+
+    Returns:
+        tuple: (filtros de build_training_query, rango de precios {min, max})
+    """
+    filters = {**DEFAULT_FILTERS, **metrics.get('filters', {})}
+    bounds = metrics.get('price_bounds') or {'min': filters['price_min'], 'max': filters['price_max']}
+    return filters, bounds
+
+
+def filter_delta(df, filters, bounds):
+    """Autos nuevos con precio dentro de bounds y año dentro de los filtros del modelo"""
+    df = df[df['price'].notna()]
+    df = df[(df['price'] >= bounds['min']) & (df['price'] <= bounds['max'])]
+    return df[(df['year'] >= filters['year_min']) & (df['year'] <= filters['year_max'])].copy()
+
+
+def build_delta_query(watermark):
+    """
+    Autos publicados por primera vez después de la marca de agua
+
+    No alcanza con fecha > watermark: cada carga actualiza fecha en todos los
+    autos que vuelve a ver, y el delta sería todo el inventario activo. La
+    primera aparición de un auto es su primer registro en car_price_history
+    (el upsert agrega uno al insertarlo). La columna fecha del resultado es
+    esa primera aparición, para calcular la nueva marca de agua.
+
+    Returns:
+        tuple: (sql, params) con marcadores %(nombre)s
+    """
+    columns = ', '.join(f'c.{col}' for col in INPUT_FIELDS + ['price'])
+    sql = f"""
+        SELECT {columns}, h.first_seen AS fecha
+        FROM (
+            SELECT car_id, min(observed_at) AS first_seen
+            FROM car_price_history
+            GROUP BY car_id
+            HAVING min(observed_at) > %(watermark)s
+        ) h
+        JOIN tbl_auto_raw_taller c ON c.id = h.car_id
+        WHERE c.is_active"""
+    return sql, {'watermark': watermark}
+
+
+class CompactFrameBuilder:
+    """
+    Acumula filas (INPUT_FIELDS + price) por bloques con tipos compactos
+
+    Cada texto de categoría se guarda una sola vez: las filas solo guardan
+    su código (int32) y al final se arma un pd.Categorical.
+    """
+
+    def __init__(self):
+        self.categories = {col: {} for col in CATEGORY_FIELDS}
+        self.chunks = {col: [] for col in INPUT_FIELDS + ['price']}
+        self.n_rows = 0
+
+    def add(self, rows):
+        """Agrega un bloque de tuplas en el orden de INPUT_FIELDS + ['price']"""
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        for col, values in zip(INPUT_FIELDS + ['price'], columns):
+            if col in self.categories:
+                codes = self.categories[col]
+                # None -> -1 (faltante en pd.Categorical)
+                encoded = np.fromiter(
+                    (-1 if value is None else codes.setdefault(value, len(codes)) for value in values),
+                    dtype=np.int32, count=len(values),
+                )
+            elif col == 'year':
+                encoded = np.asarray(values, dtype=np.int16)
+            else:
+                encoded = np.asarray(values, dtype=np.float32)
+            self.chunks[col].append(encoded)
+        self.n_rows += len(rows)
+
+    def build(self):
+        """
+        Returns:
+            pd.DataFrame: Columnas de INPUT_FIELDS (categóricas) y price
+        """
+        import pandas as pd
+
+        data = {}
+        for col, chunks in self.chunks.items():
+            values = np.concatenate(chunks) if chunks else np.empty(0)
+            if col in self.categories:
+                categories = list(self.categories[col])
+                data[col] = pd.Categorical.from_codes(values.astype(np.int32), categories=categories)
+            else:
+                data[col] = values
+        return pd.DataFrame(data)
+
+
+def current_watermark(connection):
+    """Fecha máxima de tbl_auto_raw_taller (datetime o None si la tabla está vacía)"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT max(fecha) FROM tbl_auto_raw_taller")
+        return cursor.fetchone()[0]
+
+
+def source_fingerprint(connection, watermark, **filters):
+    """
+    Huella de las filas de entrenamiento calculada en la BD (sin transferirlas)
+
+    Returns:
+        dict: {'rows': conteo, 'hash': suma de hashtext de cada fila}; la suma
+        no depende del orden y cambia si se agrega, borra o modifica un auto
+    """
+    sql, params = build_training_query(**{**DEFAULT_FILTERS, **filters})
+    params['watermark'] = watermark
+    columns = ', '.join(f'{col}::text' for col in INPUT_FIELDS + ['price'])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT count(*), coalesce(sum(hashtext(concat_ws('|', {columns}))::bigint), 0) "
+            f"FROM ({sql}) AS training_rows",
+            params,
+        )
+        rows, row_hash = cursor.fetchone()
+    return {'rows': rows, 'hash': int(row_hash)}
+
+
+def load_training_frame(connection, chunk_size=20000, log=None, watermark=None, **filters):
+    """
+    Lee los autos de entrenamiento por bloques desde un cursor del servidor
+
+    Args:
+        connection: Conexión de Django (django.db.connection)
+        chunk_size (int): Filas por fetchmany
+        log (callable): Función para reportar el progreso
+        watermark (datetime): Lee solo hasta esta fecha (por defecto la actual)
+        **filters: Parámetros de build_training_query (por defecto DEFAULT_FILTERS)
+
+    Returns:
+        tuple: (pd.DataFrame compacto, marca de agua ISO 8601 o None)
+    """
+    log = log or (lambda message: None)
+    filters = {**DEFAULT_FILTERS, **filters}
+
+    # La marca de agua se fija antes de leer: los autos que lleguen durante
+    # la lectura quedan para el próximo reentrenamiento incremental
+    watermark = watermark or current_watermark(connection)
+    if watermark is None:
+        return CompactFrameBuilder().build(), None
+
+    sql, params = build_training_query(**filters)
+    params['watermark'] = watermark
+
+    builder = CompactFrameBuilder()
+    start = time.perf_counter()
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            builder.add(rows)
+            log(f'  {builder.n_rows} autos leídos ({time.perf_counter() - start:.1f} s, '
+                f'pico {peak_memory_mb():.0f} MB)')
+
+    return builder.build(), watermark.isoformat()
+
+
+def evaluate(model, X, y):
+    """
+    Returns:
+        dict: mae, rmse y r2 de model sobre (X, y)
+    """
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    predictions = model.predict(X)
+    return {
+        'mae': mean_absolute_error(y, predictions),
+        'rmse': float(np.sqrt(mean_squared_error(y, predictions))),
+        'r2': r2_score(y, predictions),
+    }
+
+
+def encode(frame, backend):
+    """
+    Ajusta el pipeline de features y codifica los autos
+
+    Returns:
+        tuple: (X como pd.DataFrame, y como pd.Series float64, FeatureTransformer)
+    """
+    from .ml.backends import feature_options
+    from .ml.features import FeatureTransformer
+
+    features = FeatureTransformer.fit(frame, **feature_options(backend))
+    return features.transform_frame(frame), frame['price'].astype(np.float64), features
+
+
+def load_features(connection, backend, snapshot_dir=None, rebuild=False, chunk_size=20000,
+                  log=None, **filters):
+    """
+    Matriz de entrenamiento desde el snapshot vigente, o leyendo y codificando los autos
+
+    Args:
+        connection: Conexión de Django
+        backend (str): Backend de ml/backends.py (define la codificación)
+        snapshot_dir (str): Directorio de snapshots (None = sin snapshots)
+        rebuild (bool): Ignorar el snapshot existente y reconstruirlo
+        **filters: Parámetros de build_training_query
+
+    Returns:
+        tuple: (X, y, FeatureTransformer, marca de agua ISO 8601, si vino del snapshot)
+    """
+    from .ml.backends import feature_options
+    from .ml.features import FeatureTransformer
+    from .ml.snapshots import load_snapshot, save_snapshot, snapshot_key
+
+    log = log or (lambda message: None)
+    filters = {**DEFAULT_FILTERS, **filters}
+
+    watermark = current_watermark(connection)
+    if watermark is None:
+        raise ValueError('tbl_auto_raw_taller está vacía')
+
+    key = None
+    if snapshot_dir:
+        fingerprint = source_fingerprint(connection, watermark, **filters)
+        pipeline = {
+            **FeatureTransformer({}, **feature_options(backend)).config(),
+            'filters': filters,
+        }
+        key = snapshot_key(fingerprint, watermark.isoformat(), pipeline)
+        snapshot = None if rebuild else load_snapshot(snapshot_dir, key)
+        if snapshot is not None:
+            log(f'  Snapshot {key}: {fingerprint["rows"]} autos sin leer ni codificar')
+            return (*snapshot, watermark.isoformat(), True)
+
+    frame, watermark_iso = load_training_frame(connection, chunk_size=chunk_size, log=log,
+                                               watermark=watermark, **filters)
+    X, y, features = encode(frame, backend)
+    del frame
+
+    if key is not None:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        save_snapshot(snapshot_dir, key, X, y, features)
+        log(f'  Snapshot {key} guardado')
+    return X, y, features, watermark_iso, False
+
+
+def train(X, y, features, backend, budget_seconds, warm_start=(), test_size=0.2, random_state=42,
+          log=None):
+    """
+    Entrena un modelo completo: búsqueda de hiperparámetros, reentrenamiento y evaluación
+
+    Args:
+        X (pd.DataFrame): Matriz codificada (encode o load_features)
+        y (pd.Series): Precios
+        features (FeatureTransformer): Pipeline ajustado
+        backend (str): Backend de ml/backends.py
+        budget_seconds (float): Presupuesto de la búsqueda (ver ml/search.py)
+        warm_start (list): Configuraciones de la búsqueda anterior
+
+    Returns:
+        tuple: (modelo, métricas)
+    """
+    from sklearn.model_selection import train_test_split
+
+    from .ml.backends import build_model, feature_importances, param_grid
+    from .ml.search import EncodedFolds, halving_search
+
+    log = log or (lambda message: None)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    log(f'  Train: {len(X_train)} | Test: {len(X_test)} | pico {peak_memory_mb():.0f} MB')
+
+    folds = EncodedFolds(X_train, y_train, cv=5, random_state=random_state)
+    search = halving_search(backend, features, folds, param_grid(backend), budget_seconds,
+                            warm_start=warm_start, random_state=random_state, log=log)
+    del folds
+
+    model = build_model(backend, features, random_state=random_state, **search['best_params'])
+    model.fit(X_train, y_train)
+
+    train_scores = evaluate(model, X_train, y_train)
+    test_scores = evaluate(model, X_test, y_test)
+    cv_scores = np.array(search['best_cv_scores'])
+    importances = feature_importances(model, X_test, y_test, random_state=random_state)
+
+    metrics = {
+        **{f'train_{name}': value for name, value in train_scores.items()},
+        **{f'test_{name}': value for name, value in test_scores.items()},
+        'cv_r2_mean': cv_scores.mean(),
+        'cv_r2_std': cv_scores.std(),
+        'model_backend': backend,
+        'best_params': search['best_params'],
+        'search': search,
+        'feature_importance': {
+            'feature': dict(enumerate(features.feature_names)),
+            'importance': dict(enumerate(float(value) for value in importances)),
+        },
+        'total_records': len(X),
+        'price_range': {
+            'min': float(y.min()),
+            'max': float(y.max()),
+        },
+        'features_used': features.feature_names,
+    }
+    return model, metrics
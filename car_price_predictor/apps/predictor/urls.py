@@ -10,5 +10,7 @@ urlpatterns = [
     # API endpoints
     path('api/options/', api_views.get_form_options, name='api_options'),
     path('api/predict/', api_views.predict_price, name='api_predict'),
+    path('api/predict/curve/', api_views.predict_price_curve, name='api_predict_curve'),
+    path('api/predict/batch/', api_views.predict_price_batch, name='api_predict_batch'),
     path('api/stats/', api_views.get_dashboard_stats, name='api_stats'),
 ]
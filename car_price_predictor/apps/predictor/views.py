@@ -7,4 +7,4 @@ Este archivo se mantiene vacío para futuras vistas si es necesario.
 
 # Todas las funcionalidades de predicción están en:
 # - api_views.py (endpoints REST)
-# - ml/predictor_DEFINITIVO.py (motor de ML)
+# - ml/predictor.py (motor de ML)
@@ -160,3 +160,32 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
 }
+
+# Predictor de precios
+# El modelo se carga en el primer uso; con PREDICTOR_WARMUP=True se precarga
+# en segundo plano al arrancar cada worker
+PREDICTOR_WARMUP = os.getenv('PREDICTOR_WARMUP', 'False') == 'True'
+
+# Segundos entre revisiones de manifest.json para recargar en caliente una
+# versión nueva del modelo (0 = desactivado); también en run_inference_service
+PREDICTOR_RELOAD_INTERVAL = float(os.getenv('PREDICTOR_RELOAD_INTERVAL', '30'))
+
+# Micro-batching: las predicciones concurrentes que llegan dentro de la
+# ventana se agrupan en una sola predicción vectorizada
+PREDICTOR_MICROBATCH = os.getenv('PREDICTOR_MICROBATCH', 'False') == 'True'
+PREDICTOR_MICROBATCH_WAIT_MS = float(os.getenv('PREDICTOR_MICROBATCH_WAIT_MS', '2'))
+PREDICTOR_MICROBATCH_MAX_SIZE = int(os.getenv('PREDICTOR_MICROBATCH_MAX_SIZE', '64'))
+
+# Servicio de inferencia (python manage.py run_inference_service): si se define
+# el directorio de sockets, las vistas predicen en ese pool de procesos en lugar
+# de cargar el modelo en cada worker web
+PREDICTOR_SERVICE_SOCKET_DIR = os.getenv('PREDICTOR_SERVICE_SOCKET_DIR', '')
+PREDICTOR_SERVICE_WORKERS = int(os.getenv('PREDICTOR_SERVICE_WORKERS', '0')) or None
+
+# Caché de predicciones por combinación de entrada y versión del modelo:
+# 'local' (memoria de cada worker), 'django' (CACHES[PREDICTOR_CACHE_ALIAS],
+# compartida entre workers) o vacío para desactivarla
+PREDICTOR_CACHE = os.getenv('PREDICTOR_CACHE', 'local')
+PREDICTOR_CACHE_ALIAS = os.getenv('PREDICTOR_CACHE_ALIAS', 'default')
+PREDICTOR_CACHE_SIZE = int(os.getenv('PREDICTOR_CACHE_SIZE', '10000'))
+PREDICTOR_CACHE_TTL = int(os.getenv('PREDICTOR_CACHE_TTL', '3600'))
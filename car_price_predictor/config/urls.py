@@ -21,8 +21,12 @@ def api_root(request):
         },
         'api_docs': {
             'predict': 'POST /predictor/api/predict/',
+            'predict_curve': 'POST /predictor/api/predict/curve/ (año, ubicación o combustible)',
+            'predict_batch': 'POST /predictor/api/predict/batch/ (JSON, NDJSON o CSV)',
             'stats': 'GET /predictor/api/stats/',
             'options': 'GET /predictor/api/options/',
+            'cars': 'GET /cars/api/cars/ (filtros y paginación por cursor)',
+            'facets': 'GET /cars/api/facets/ (conteos por marca, combustible, año...)',
         },
         'frontend': 'React app en /frontend (puerto 5173 en desarrollo)'
     })
@@ -13,19 +13,35 @@ import numpy as np
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
 import os
-import pickle
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
+import sys
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from apps.cars.dataset import dataset_dir, has_partitions, read_dataset
+from apps.predictor.ml import INPUT_FIELDS
+from apps.predictor.ml.artifacts import publish_artifacts
+from apps.predictor.ml.backends import (
+    DEFAULT_BACKEND, DEFAULT_PARAMS, build_model, feature_importances, feature_options, param_grid,
+)
+from apps.predictor.ml.features import FILL_VALUE, FeatureTransformer
+from apps.predictor.ml.incremental import data_watermark, full_rebuild_metadata
+from apps.predictor.ml.search import EncodedFolds, halving_search, previous_search
+
 # Configuración
 load_dotenv()
+
+# Backend del modelo: forest (RandomForest) o hgb (HistGradientBoosting con categóricas nativas)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", DEFAULT_BACKEND)
+# Tiempo máximo de la búsqueda de hiperparámetros más el entrenamiento final (segundos)
+TRAIN_BUDGET_SECONDS = float(os.getenv("TRAIN_BUDGET_SECONDS", "600"))
+
 print("=" * 80)
 print("ENTRENAMIENTO MEJORADO DEL MODELO DE PREDICCIÓN DE PRECIOS")
 print("=" * 80)
 
-# Conexión a la base de datos
+# Cargar datos: dataset Parquet de los scrapings si existe, si no PostgreSQL
+dataset = dataset_dir()
 usuario = os.getenv("DB_USER")
 password = os.getenv("DB_PWD")
 host = os.getenv("DB_HOST")
@@ -36,12 +52,20 @@ engine = create_engine(
     f"postgresql+psycopg2://{usuario}:{password}@{host}:{puerto}/{base_datos}"
 )
 
-# Cargar datos
-print("\n📊 Cargando datos de PostgreSQL...")
-df = pd.read_sql("SELECT * FROM tbl_auto_raw_taller", engine)
+if has_partitions(dataset):
+    print(f"\n📊 Cargando datos del dataset Parquet ({dataset})...")
+    # Las particiones conservan los autos retirados después: solo los activos de hoy
+    activos = pd.read_sql("SELECT id FROM tbl_auto_raw_taller WHERE is_active", engine)['id']
+    df = read_dataset(dataset, ids=activos)
+else:
+    print("\n📊 Cargando datos de PostgreSQL...")
+    df = pd.read_sql("SELECT * FROM tbl_auto_raw_taller WHERE is_active", engine)
 engine.dispose()
 print(f"✅ Datos cargados: {len(df)} registros")
 
+# Marca de agua: el reentrenamiento incremental parte de los autos posteriores
+watermark = data_watermark(df)
+
 # ============================================================================
 # LIMPIEZA Y FILTRADO DE DATOS
 # ============================================================================
@@ -121,26 +145,25 @@ print("\n" + "=" * 80)
 print("2. PREPARACIÓN DE FEATURES")
 print("=" * 80)
 
-features = ['brand', 'year', 'fuel', 'transmission', 'location', 'subcategory']
 target = 'price'
 
 # Limpiar datos faltantes en features
 print("\nLimpiando datos faltantes...")
-for col in features:
+for col in INPUT_FIELDS:
     missing = df_filtrado[col].isna().sum()
     if missing > 0:
-        print(f"  - {col}: {missing} faltantes -> rellenando con 'Unknown'")
-        df_filtrado[col] = df_filtrado[col].fillna('Unknown')
-
-# FEATURE ENGINEERING: Agregar edad del auto
-df_filtrado['car_age'] = año_actual - df_filtrado['year']
+        print(f"  - {col}: {missing} faltantes -> rellenando con '{FILL_VALUE}'")
+        df_filtrado[col] = df_filtrado[col].fillna(FILL_VALUE)
+
+# FEATURE ENGINEERING: edad del auto, con el mismo pipeline que usa el predictor
+# (apps/predictor/ml/features.py)
+features_pipeline = FeatureTransformer.fit(df_filtrado, feature_names=INPUT_FIELDS + ['car_age'],
+                                           **feature_options(MODEL_BACKEND))
+features = features_pipeline.feature_names
 print(f"\n✅ Feature Engineering: Agregada 'car_age' (edad del auto)")
 
-# Actualizar features
-features.append('car_age')
-
 # Preparar dataset
-X = df_filtrado[features].copy()
+X = df_filtrado[INPUT_FIELDS].copy()
 y = df_filtrado[target].copy()
 
 print(f"\n✅ Dataset preparado:")
@@ -155,16 +178,10 @@ print("\n" + "=" * 80)
 print("3. CODIFICACIÓN DE VARIABLES CATEGÓRICAS")
 print("=" * 80)
 
-encoders = {}
-X_encoded = X.copy()
+X_encoded = features_pipeline.transform_frame(df_filtrado)
+encoders = features_pipeline.encoders
 
-categorical_features = ['brand', 'fuel', 'transmission', 'location', 'subcategory']
-
-for col in categorical_features:
-    print(f"\nCodificando {col}... ({X[col].nunique()} categorías únicas)")
-    le = LabelEncoder()
-    X_encoded[col] = le.fit_transform(X[col].astype(str))
-    encoders[col] = le
+for col, le in encoders.items():
     print(f"  ✅ {col}: {len(le.classes_)} clases")
 
 print(f"\n✅ 'year' y 'car_age': ya numéricos (no requieren encoding)")
@@ -184,31 +201,38 @@ print(f"✅ Train set: {len(X_train)} registros ({len(X_train)/len(X_encoded)*10
 print(f"✅ Test set: {len(X_test)} registros ({len(X_test)/len(X_encoded)*100:.1f}%)")
 
 # ============================================================================
-# ENTRENAMIENTO DEL MODELO - RANDOM FOREST MEJORADO
+# ENTRENAMIENTO DEL MODELO (backend MODEL_BACKEND)
 # ============================================================================
 print("\n" + "=" * 80)
-print("5. ENTRENAMIENTO DEL MODELO - RANDOM FOREST MEJORADO")
+print(f"5. ENTRENAMIENTO DEL MODELO - {MODEL_BACKEND.upper()}")
 print("=" * 80)
 
-print("\nEntrenando Random Forest Regressor con hiperparámetros optimizados...")
-model = RandomForestRegressor(
-    n_estimators=200,        # Aumentado de 100 a 200
-    max_depth=15,            # Reducido de 20 a 15 para evitar overfitting
-    min_samples_split=10,    # Aumentado de 5 a 10
-    min_samples_leaf=4,      # Aumentado de 2 a 4
-    max_features='sqrt',     # Usar sqrt de features en cada split
+model_dir = os.path.join(os.path.dirname(__file__), '..', 'apps', 'predictor', 'ml')
+
+# Búsqueda acotada en tiempo: parte de las mejores configuraciones del modelo
+# activo (o de los hiperparámetros por defecto) y de muestras de la grilla
+warm_start = previous_search(model_dir, MODEL_BACKEND) or [DEFAULT_PARAMS[MODEL_BACKEND]]
+print(f"\nBuscando hiperparámetros de {MODEL_BACKEND} (máximo {TRAIN_BUDGET_SECONDS:.0f} segundos)...")
+folds = EncodedFolds(X_train, y_train, cv=5, random_state=42)
+search = halving_search(
+    MODEL_BACKEND,
+    features_pipeline,
+    folds,
+    param_grid(MODEL_BACKEND),
+    budget_seconds=TRAIN_BUDGET_SECONDS,
+    warm_start=warm_start,
     random_state=42,
-    n_jobs=-1,
-    verbose=0
+    log=print,
 )
+print(f"✅ Hiperparámetros: {search['best_params']}")
 
+model = build_model(MODEL_BACKEND, features_pipeline, **search['best_params'])
 model.fit(X_train, y_train)
 print("✅ Modelo entrenado exitosamente")
 
-# Validación cruzada
-print("\n📊 Validación cruzada (5-fold)...")
-cv_scores = cross_val_score(model, X_train, y_train, cv=5,
-                            scoring='r2', n_jobs=-1)
+# Validación cruzada (la de la búsqueda, con los folds ya entrenados)
+cv_scores = np.array(search['best_cv_scores'])
+print(f"\n📊 Validación cruzada (5-fold, {search['best_n_samples']} filas por fold)...")
 print(f"   - R² scores: {cv_scores}")
 print(f"   - R² promedio: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
 
@@ -259,7 +283,7 @@ print("=" * 80)
 
 feature_importance = pd.DataFrame({
     'feature': features,
-    'importance': model.feature_importances_
+    'importance': feature_importances(model, X_test, y_test)
 }).sort_values('importance', ascending=False)
 
 print("\n" + str(feature_importance))
@@ -297,21 +321,8 @@ print("9. GUARDANDO MODELO Y ENCODERS")
 print("=" * 80)
 
 # Crear directorio si no existe
-model_dir = os.path.join(os.path.dirname(__file__), '..', 'apps', 'predictor', 'ml')
 os.makedirs(model_dir, exist_ok=True)
 
-# Guardar modelo
-model_path = os.path.join(model_dir, 'model.pkl')
-with open(model_path, 'wb') as f:
-    pickle.dump(model, f)
-print(f"✅ Modelo guardado en: {model_path}")
-
-# Guardar encoders
-encoders_path = os.path.join(model_dir, 'encoders.pkl')
-with open(encoders_path, 'wb') as f:
-    pickle.dump(encoders, f)
-print(f"✅ Encoders guardados en: {encoders_path}")
-
 # Guardar métricas
 metrics = {
     'train_mae': train_mae,
@@ -323,7 +334,15 @@ metrics = {
     'cv_r2_mean': cv_scores.mean(),
     'cv_r2_std': cv_scores.std(),
     'feature_importance': feature_importance.to_dict(),
+    'model_backend': MODEL_BACKEND,
+    'best_params': search['best_params'],
+    'search': search,
+    **full_rebuild_metadata(watermark, model),
     'total_records': len(df_filtrado),
+    # Filtros de este entrenamiento: 05_reentrenar_incremental.py recorta igual los autos nuevos
+    'filters': {'price_min': precio_min, 'price_max': precio_max, 'year_min': 1995, 'year_max': año_actual,
+                'iqr_factor': 1.5, 'min_category_count': 0},
+    'price_bounds': {'min': float(max(precio_min, lower_bound)), 'max': float(min(precio_max, upper_bound))},
     'price_range': {
         'min': float(df_filtrado['price'].min()),
         'max': float(df_filtrado['price'].max()),
@@ -332,17 +351,17 @@ metrics = {
     }
 }
 
-metrics_path = os.path.join(model_dir, 'metrics.pkl')
-with open(metrics_path, 'wb') as f:
-    pickle.dump(metrics, f)
-print(f"✅ Métricas guardadas en: {metrics_path}")
+# Publicar modelo, encoders, métricas y el bundle mmap como una nueva versión
+# (el servidor la detecta vía manifest.json y la carga sin reiniciar)
+version = publish_artifacts(model_dir, model, encoders, metrics, features=features_pipeline)
+print(f"✅ Versión {version} publicada en: {os.path.join(model_dir, 'versions', version)}")
 
 print("\n" + "=" * 80)
 print("✅ ENTRENAMIENTO MEJORADO COMPLETADO EXITOSAMENTE")
 print("=" * 80)
 print(f"""
 RESUMEN:
-- Modelo: Random Forest Regressor (Mejorado)
+- Modelo: {type(model).__name__} (backend {MODEL_BACKEND})
 - Registros totales: {len(df)}
 - Registros filtrados: {len(df_filtrado)}
 - Registros entrenamiento: {len(X_train)}
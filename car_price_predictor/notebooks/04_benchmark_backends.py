@@ -0,0 +1,182 @@
+"""
+BENCHMARK DE BACKENDS DEL MODELO
+Compara RandomForest (forest) contra HistGradientBoosting con categóricas
+nativas (hgb) con los mismos datos y el mismo split:
+- Tiempo de entrenamiento
+- Tamaño de los artefactos en disco (model.pkl, forest/, features.pkl...)
+- Latencia de una predicción y de un lote, con el predictor de la API
+- MAE y R² en test
+
+Uso:
+    python notebooks/04_benchmark_backends.py
+    MODEL_BACKENDS=hgb python notebooks/04_benchmark_backends.py
+"""
+
+import pandas as pd
+import numpy as np
+from sqlalchemy import create_engine
+from dotenv import load_dotenv
+import os
+import shutil
+import sys
+import tempfile
+import time
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_absolute_error, r2_score
+import warnings
+warnings.filterwarnings('ignore')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from apps.cars.dataset import dataset_dir, has_partitions, read_dataset
+from apps.predictor.ml import INPUT_FIELDS
+from apps.predictor.ml.artifacts import save_artifacts
+from apps.predictor.ml.backends import BACKENDS, DEFAULT_PARAMS, build_model, feature_options
+from apps.predictor.ml.features import FeatureTransformer
+from apps.predictor.ml.predictor import CarPricePredictor
+
+load_dotenv()
+
+BACKENDS_A_COMPARAR = os.getenv("MODEL_BACKENDS", ",".join(BACKENDS)).split(",")
+REPETICIONES = 200      # Predicciones de una fila por backend
+TAMAÑO_LOTE = 1000      # Autos por predicción en lote
+
+print("=" * 80)
+print("BENCHMARK DE BACKENDS DEL MODELO")
+print("=" * 80)
+
+# ============================================================================
+# 1. CARGAR Y LIMPIAR DATOS (mismos filtros que MODELO_DEFINITIVO)
+# ============================================================================
+dataset = dataset_dir()
+usuario = os.getenv("DB_USER")
+password = os.getenv("DB_PWD")
+host = os.getenv("DB_HOST")
+puerto = os.getenv("DB_PORT")
+base_datos = os.getenv("DB_NAME")
+
+engine = create_engine(f"postgresql+psycopg2://{usuario}:{password}@{host}:{puerto}/{base_datos}")
+
+if has_partitions(dataset):
+    print(f"\n📊 Cargando datos del dataset Parquet ({dataset})...")
+    # Las particiones conservan los autos retirados después: solo los activos de hoy
+    activos = pd.read_sql("SELECT id FROM tbl_auto_raw_taller WHERE is_active", engine)['id']
+    df = read_dataset(dataset, columns=INPUT_FIELDS + ['price'], ids=activos)
+else:
+    print("\n📊 Cargando datos de PostgreSQL...")
+    df = pd.read_sql(f"SELECT {', '.join(INPUT_FIELDS)}, price FROM tbl_auto_raw_taller WHERE is_active", engine)
+engine.dispose()
+print(f"✅ {len(df)} registros cargados")
+
+df = df[df['price'].notna()]
+df = df[(df['price'] >= 3000) & (df['price'] <= 100000)]
+df = df[(df['year'] >= 1995) & (df['year'] <= 2026)]
+Q1 = df['price'].quantile(0.25)
+Q3 = df['price'].quantile(0.75)
+IQR = Q3 - Q1
+df = df[(df['price'] >= Q1 - 1.5*IQR) & (df['price'] <= Q3 + 1.5*IQR)]
+for col in ['brand', 'fuel', 'transmission', 'subcategory', 'location']:
+    counts = df[col].value_counts()
+    df = df[df[col].isin(counts[counts >= 5].index)]
+df = df.copy()
+
+if len(df) < 100:
+    print(f"\n❌ ERROR: Solo quedan {len(df)} registros. Necesitas más datos limpios.")
+    exit(1)
+
+print(f"✅ {len(df)} registros limpios")
+
+# Mismo split para todos los backends
+train_idx, test_idx = train_test_split(df.index, test_size=0.2, random_state=42)
+df_train = df.loc[train_idx]
+df_test = df.loc[test_idx]
+y_train = df_train['price']
+y_test = df_test['price']
+
+# Autos de test como los recibe la API (valores originales, sin codificar)
+filas_test = list(df_test[INPUT_FIELDS].itertuples(index=False, name=None))
+lote = (filas_test * (TAMAÑO_LOTE // len(filas_test) + 1))[:TAMAÑO_LOTE]
+
+
+def tamaño_directorio(path):
+    """Bytes de todos los archivos bajo path"""
+    total = 0
+    for raiz, _, archivos in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(raiz, archivo)) for archivo in archivos)
+    return total
+
+
+# ============================================================================
+# 2. ENTRENAR Y MEDIR CADA BACKEND
+# ============================================================================
+resultados = []
+for backend in BACKENDS_A_COMPARAR:
+    print("\n" + "=" * 80)
+    print(f"BACKEND: {backend}")
+    print("=" * 80)
+
+    features_pipeline = FeatureTransformer.fit(df_train, **feature_options(backend))
+    X_train = features_pipeline.transform_frame(df_train)
+    X_test = features_pipeline.transform_frame(df_test)
+
+    model = build_model(backend, features_pipeline, **DEFAULT_PARAMS[backend])
+    inicio = time.perf_counter()
+    model.fit(X_train, y_train)
+    tiempo_entrenamiento = time.perf_counter() - inicio
+    print(f"✅ Entrenado en {tiempo_entrenamiento:.1f} s")
+
+    y_pred = model.predict(X_test)
+    test_mae = mean_absolute_error(y_test, y_pred)
+    test_r2 = r2_score(y_test, y_pred)
+
+    # Artefactos como los publica el entrenamiento y predictor de la API
+    model_dir = tempfile.mkdtemp()
+    try:
+        save_artifacts(model_dir, model, features_pipeline.encoders, {'model_backend': backend},
+                       features=features_pipeline)
+        tamaño = tamaño_directorio(model_dir)
+
+        predictor = CarPricePredictor(model_dir=model_dir)
+        estado = predictor.snapshot()
+
+        # Calentamiento (primeras llamadas a sklearn / páginas del mmap)
+        for fila in filas_test[:20]:
+            predictor.predict(*fila)
+
+        tiempos = []
+        for i in range(REPETICIONES):
+            fila = filas_test[i % len(filas_test)]
+            inicio = time.perf_counter()
+            predictor.predict(*fila)
+            tiempos.append(time.perf_counter() - inicio)
+        latencia_fila = np.median(tiempos) * 1000
+
+        tiempos = []
+        for _ in range(5):
+            inicio = time.perf_counter()
+            estado.predict_many(lote)
+            tiempos.append(time.perf_counter() - inicio)
+        latencia_lote = np.median(tiempos) * 1000
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+    print(f"✅ MAE: ${test_mae:,.2f} | R²: {test_r2:.4f}")
+    print(f"✅ Artefactos: {tamaño / 1024 / 1024:.2f} MB")
+    print(f"✅ Latencia: {latencia_fila:.3f} ms por auto | {latencia_lote:.1f} ms por lote de {TAMAÑO_LOTE}")
+
+    resultados.append({
+        'backend': backend,
+        'entrenamiento_s': round(tiempo_entrenamiento, 2),
+        'artefactos_mb': round(tamaño / 1024 / 1024, 2),
+        'fila_ms': round(latencia_fila, 3),
+        f'lote_{TAMAÑO_LOTE}_ms': round(latencia_lote, 1),
+        'test_mae': round(test_mae, 2),
+        'test_r2': round(test_r2, 4),
+    })
+
+# ============================================================================
+# 3. RESUMEN
+# ============================================================================
+print("\n" + "=" * 80)
+print("RESUMEN")
+print("=" * 80)
+print(pd.DataFrame(resultados).to_string(index=False))
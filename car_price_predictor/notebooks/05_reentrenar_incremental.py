@@ -0,0 +1,153 @@
+"""
+REENTRENAMIENTO INCREMENTAL DEL MODELO
+- Lee solo los autos publicados por primera vez desde la marca de agua del
+  modelo activo (primer registro en car_price_history)
+- Agrega árboles al bosque entrenados con esos autos (warm_start)
+- Reconstruye todo con 03_entrenar_modelo_mejorado.py cuando la política lo
+  pide: muchas actualizaciones seguidas, modelo antiguo o drift en los datos
+  nuevos (ver apps/predictor/ml/incremental.py)
+
+Uso (después de cada scraping):
+    python notebooks/05_reentrenar_incremental.py
+"""
+
+import pandas as pd
+from sqlalchemy import create_engine
+from dotenv import load_dotenv
+import os
+import pickle
+import subprocess
+import sys
+from datetime import datetime, timezone
+from sklearn.metrics import mean_absolute_error
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from apps.predictor.ml import INPUT_FIELDS
+from apps.predictor.ml.artifacts import (
+    FEATURES_FILE, METRICS_FILE, MODEL_FILE, publish_artifacts, resolve_artifact_dir,
+)
+from apps.predictor.ml.features import FILL_VALUE
+from apps.predictor.ml.incremental import (
+    data_watermark, extend_forest, new_tree_count, should_rebuild, unseen_rate,
+)
+from apps.predictor.training import build_delta_query, delta_filters, filter_delta
+
+load_dotenv()
+
+model_dir = os.path.join(os.path.dirname(__file__), '..', 'apps', 'predictor', 'ml')
+script_completo = os.path.join(os.path.dirname(os.path.abspath(__file__)), '03_entrenar_modelo_mejorado.py')
+
+print("=" * 80)
+print("REENTRENAMIENTO INCREMENTAL DEL MODELO")
+print("=" * 80)
+
+
+def reconstruir(motivo):
+    """Entrenamiento completo (nueva marca de agua, encoders y bosque)"""
+    print(f"\n🔁 Reconstrucción completa: {motivo}")
+    resultado = subprocess.run([sys.executable, script_completo])
+    sys.exit(resultado.returncode)
+
+
+# ============================================================================
+# 1. MODELO ACTIVO
+# ============================================================================
+version, artifact_dir = resolve_artifact_dir(model_dir)
+try:
+    with open(os.path.join(artifact_dir, MODEL_FILE), 'rb') as f:
+        model = pickle.load(f)
+    with open(os.path.join(artifact_dir, METRICS_FILE), 'rb') as f:
+        metrics = pickle.load(f)
+    with open(os.path.join(artifact_dir, FEATURES_FILE), 'rb') as f:
+        features_pipeline = pickle.load(f)
+except FileNotFoundError as e:
+    reconstruir(f"falta {os.path.basename(e.filename)} en la versión {version}")
+
+watermark = metrics.get('watermark')
+print(f"\n✅ Versión activa: {version}")
+print(f"   - Árboles: {len(getattr(model, 'estimators_', []))}")
+print(f"   - Marca de agua: {watermark}")
+print(f"   - Actualizaciones incrementales: {metrics.get('incremental_updates', 0)}")
+
+# Sin marca de agua no se sabe qué autos son nuevos
+rebuild, motivo = should_rebuild(model, metrics)
+if rebuild:
+    reconstruir(motivo)
+
+# ============================================================================
+# 2. AUTOS NUEVOS (publicados por primera vez después de la marca de agua)
+# ============================================================================
+usuario = os.getenv("DB_USER")
+password = os.getenv("DB_PWD")
+host = os.getenv("DB_HOST")
+puerto = os.getenv("DB_PORT")
+base_datos = os.getenv("DB_NAME")
+
+engine = create_engine(f"postgresql+psycopg2://{usuario}:{password}@{host}:{puerto}/{base_datos}")
+
+print("\n📊 Cargando autos nuevos de PostgreSQL...")
+consulta, params = build_delta_query(watermark)
+df = pd.read_sql(consulta, engine, params=params)
+engine.dispose()
+print(f"✅ {len(df)} autos nuevos desde {watermark}")
+
+if df.empty:
+    print("\n✅ El modelo ya está al día")
+    sys.exit(0)
+
+nueva_marca = data_watermark(df)
+
+# Mismos filtros y límites IQR que el entrenamiento completo del modelo activo
+filtros, limites = delta_filters(metrics)
+df = filter_delta(df, filtros, limites)
+for col in INPUT_FIELDS:
+    if col != 'year':
+        df[col] = df[col].fillna(FILL_VALUE)
+print(f"✅ {len(df)} autos nuevos válidos para entrenar "
+      f"(precio ${limites['min']:,.0f} - ${limites['max']:,.0f})")
+
+# Sin autos para entrenar no se publica nada: una versión nueva recargaría
+# los workers y vaciaría el caché de predicciones con el mismo modelo
+if df.empty:
+    print("\n✅ Ningún auto nuevo pasa los filtros: el modelo no cambia")
+    sys.exit(0)
+
+# ============================================================================
+# 3. POLÍTICA: INCREMENTAL O RECONSTRUCCIÓN
+# ============================================================================
+X_new = features_pipeline.transform_frame(df)
+y_new = df['price'].astype(float)
+
+tasa_no_vistos = unseen_rate(features_pipeline, df)
+delta_mae = mean_absolute_error(y_new, model.predict(X_new))
+
+print("\n📊 Drift en los autos nuevos:")
+print(f"   - Con categorías no vistas: {tasa_no_vistos:.1%}")
+print(f"   - MAE del modelo activo: ${delta_mae:,.2f} (test: ${metrics.get('test_mae', 0):,.2f})")
+
+rebuild, motivo = should_rebuild(model, metrics, unseen_rate=tasa_no_vistos, delta_mae=delta_mae)
+if rebuild:
+    reconstruir(motivo)
+
+# ============================================================================
+# 4. AGREGAR ÁRBOLES Y PUBLICAR
+# ============================================================================
+n_trees = new_tree_count(metrics.get('base_estimators') or len(model.estimators_),
+                         metrics.get('total_records', len(df)), len(df))
+print(f"\n🌲 Agregando {n_trees} árboles entrenados con {len(df)} autos...")
+extend_forest(model, X_new, y_new, n_trees)
+print(f"✅ Bosque con {len(model.estimators_)} árboles")
+
+metrics = {
+    **metrics,
+    'watermark': nueva_marca,
+    'incremental_updates': metrics.get('incremental_updates', 0) + 1,
+    'last_incremental_update': datetime.now(timezone.utc).isoformat(),
+    'total_records': metrics.get('total_records', 0) + len(df),
+    'delta_mae': delta_mae,
+}
+
+nueva_version = publish_artifacts(model_dir, model, features_pipeline.encoders, metrics,
+                                  features=features_pipeline)
+print(f"\n✅ Versión {nueva_version} publicada (manifest.json actualizado)")
+print(f"   - Marca de agua: {nueva_marca}")
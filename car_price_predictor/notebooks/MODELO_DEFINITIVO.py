@@ -11,23 +11,40 @@ import numpy as np
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
 import os
-import pickle
-from sklearn.model_selection import train_test_split, GridSearchCV, cross_val_score
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.preprocessing import LabelEncoder
+import sys
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from apps.cars.dataset import dataset_dir, has_partitions, read_dataset
+from apps.predictor.ml import INPUT_FIELDS
+from apps.predictor.ml.artifacts import publish_artifacts
+from apps.predictor.ml.backends import (
+    DEFAULT_BACKEND, build_model, feature_importances, feature_options, param_grid,
+)
+from apps.predictor.ml.features import FILL_VALUE, FeatureTransformer
+from apps.predictor.ml.incremental import data_watermark, full_rebuild_metadata
+from apps.predictor.ml.search import EncodedFolds, halving_search, previous_search
+
 load_dotenv()
 
+# Backend del modelo: forest (RandomForest) o hgb (HistGradientBoosting con categóricas nativas)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", DEFAULT_BACKEND)
+# Tiempo máximo de la búsqueda de hiperparámetros más el entrenamiento final (segundos)
+TRAIN_BUDGET_SECONDS = float(os.getenv("TRAIN_BUDGET_SECONDS", "600"))
+
 print("="*80)
 print("MODELO DEFINITIVO - PREDICCIÓN DE PRECIOS DE AUTOS")
 print("="*80)
+print(f"Backend: {MODEL_BACKEND}")
 
 # ============================================================================
 # 1. CARGAR DATOS
 # ============================================================================
+# Dataset Parquet de los scrapings si existe, si no PostgreSQL
+dataset = dataset_dir()
 usuario = os.getenv("DB_USER")
 password = os.getenv("DB_PWD")
 host = os.getenv("DB_HOST")
@@ -36,11 +53,20 @@ base_datos = os.getenv("DB_NAME")
 
 engine = create_engine(f"postgresql+psycopg2://{usuario}:{password}@{host}:{puerto}/{base_datos}")
 
-print("\n📊 Cargando datos de PostgreSQL...")
-df = pd.read_sql("SELECT * FROM tbl_auto_raw_taller", engine)
+if has_partitions(dataset):
+    print(f"\n📊 Cargando datos del dataset Parquet ({dataset})...")
+    # Las particiones conservan los autos retirados después: solo los activos de hoy
+    activos = pd.read_sql("SELECT id FROM tbl_auto_raw_taller WHERE is_active", engine)['id']
+    df = read_dataset(dataset, ids=activos)
+else:
+    print("\n📊 Cargando datos de PostgreSQL...")
+    df = pd.read_sql("SELECT * FROM tbl_auto_raw_taller WHERE is_active", engine)
 engine.dispose()
 print(f"✅ {len(df)} registros cargados")
 
+# Marca de agua: el reentrenamiento incremental parte de los autos posteriores
+watermark = data_watermark(df)
+
 # ============================================================================
 # 2. LIMPIEZA Y FILTRADO AGRESIVO
 # ============================================================================
@@ -65,7 +91,8 @@ print(f"✅ Años 1995-{año_actual}: {len(df)}")
 Q1 = df['price'].quantile(0.25)
 Q3 = df['price'].quantile(0.75)
 IQR = Q3 - Q1
-df = df[(df['price'] >= Q1 - 1.5*IQR) & (df['price'] <= Q3 + 1.5*IQR)].copy()
+limite_inferior, limite_superior = Q1 - 1.5*IQR, Q3 + 1.5*IQR
+df = df[(df['price'] >= limite_inferior) & (df['price'] <= limite_superior)].copy()
 print(f"✅ Sin outliers IQR: {len(df)}")
 
 # Eliminar marcas/categorías con pocos datos (< 5 registros)
@@ -93,31 +120,19 @@ print("\n" + "="*80)
 print("FEATURE ENGINEERING")
 print("="*80)
 
-# Edad del auto
-df['car_age'] = año_actual - df['year']
-
-# Precio por año (depreciación)
-df['price_per_year'] = df['price'] / (df['year'] - 1990 + 1)
+# Pipeline compartido con el predictor (apps/predictor/ml/features.py):
+# car_age, price_per_year y price_category salen solo del año, igual que al
+# predecir (calcularlos con el precio real filtraba el objetivo al modelo)
+features_pipeline = FeatureTransformer.fit(df, **feature_options(MODEL_BACKEND))
+features = features_pipeline.feature_names
 
-# Categoría de precio
-df['price_category'] = pd.cut(df['price'],
-                               bins=[0, 10000, 20000, 35000, 100000],
-                               labels=['economico', 'medio', 'alto', 'premium'])
-
-print(f"✅ Features creados: car_age, price_per_year, price_category")
+print(f"✅ Features creados: car_age, price_per_year, price_category (a partir del año)")
 
 # ============================================================================
 # 4. PREPARAR DATOS
 # ============================================================================
-features = ['brand', 'year', 'fuel', 'transmission', 'location', 'subcategory',
-            'car_age', 'price_per_year', 'price_category']
-
-# Rellenar missing
-for col in features:
-    if df[col].isna().sum() > 0:
-        df[col] = df[col].fillna('Unknown')
-
-X = df[features].copy()
+# Datos originales (con faltantes como 'Unknown') para mostrar ejemplos
+X = df[INPUT_FIELDS].fillna(FILL_VALUE)
 y = df['price'].copy()
 
 print(f"\n✅ Dataset: {len(X)} registros x {len(features)} features")
@@ -129,15 +144,10 @@ print("\n" + "="*80)
 print("ENCODING")
 print("="*80)
 
-encoders = {}
-X_encoded = X.copy()
-
-categorical = ['brand', 'fuel', 'transmission', 'location', 'subcategory', 'price_category']
+X_encoded = features_pipeline.transform_frame(df)
+encoders = features_pipeline.encoders
 
-for col in categorical:
-    le = LabelEncoder()
-    X_encoded[col] = le.fit_transform(X[col].astype(str))
-    encoders[col] = le
+for col, le in encoders.items():
     print(f"✅ {col}: {len(le.classes_)} clases")
 
 # ============================================================================
@@ -150,41 +160,39 @@ X_train, X_test, y_train, y_test = train_test_split(
 print(f"\n✅ Train: {len(X_train)} | Test: {len(X_test)}")
 
 # ============================================================================
-# 7. HYPERPARAMETER TUNING con GridSearchCV
+# 7. HYPERPARAMETER TUNING (successive halving con presupuesto de tiempo)
 # ============================================================================
 print("\n" + "="*80)
-print("OPTIMIZACIÓN DE HIPERPARÁMETROS (esto toma tiempo...)")
+print(f"OPTIMIZACIÓN DE HIPERPARÁMETROS (máximo {TRAIN_BUDGET_SECONDS:.0f} segundos)")
 print("="*80)
 
-param_grid = {
-    'n_estimators': [150, 200, 250],
-    'max_depth': [12, 15, 18],
-    'min_samples_split': [8, 10, 12],
-    'min_samples_leaf': [3, 4, 5],
-    'max_features': ['sqrt', 'log2']
-}
-
-print(f"\n🔍 Probando {3*3*3*3*2} = 162 combinaciones...")
-print("   (Esto puede tomar 5-10 minutos)")
-
-rf = RandomForestRegressor(random_state=42, n_jobs=-1)
+model_dir = os.path.join(os.path.dirname(__file__), '..', 'apps', 'predictor', 'ml')
 
-grid_search = GridSearchCV(
-    estimator=rf,
-    param_grid=param_grid,
-    cv=5,
-    scoring='r2',
-    n_jobs=-1,
-    verbose=1
+# Las mejores configuraciones del modelo activo se evalúan primero
+warm_start = previous_search(model_dir, MODEL_BACKEND)
+if warm_start:
+    print(f"\n🔁 Reutilizando {len(warm_start)} configuraciones de la búsqueda anterior")
+
+# Folds codificados una sola vez para todas las configuraciones y rondas
+folds = EncodedFolds(X_train, y_train, cv=5, random_state=42)
+
+search = halving_search(
+    MODEL_BACKEND,
+    features_pipeline,
+    folds,
+    param_grid(MODEL_BACKEND),
+    budget_seconds=TRAIN_BUDGET_SECONDS,
+    warm_start=warm_start,
+    random_state=42,
+    log=print,
 )
 
-grid_search.fit(X_train, y_train)
-
-print(f"\n✅ Mejores parámetros encontrados:")
-for param, value in grid_search.best_params_.items():
+print(f"\n✅ Mejores parámetros encontrados ({len(search['results'])} evaluaciones en {search['elapsed_seconds']:.0f} s):")
+for param, value in search['best_params'].items():
     print(f"   - {param}: {value}")
 
-best_model = grid_search.best_estimator_
+best_model = build_model(MODEL_BACKEND, features_pipeline, random_state=42, **search['best_params'])
+best_model.fit(X_train, y_train)
 
 # ============================================================================
 # 8. EVALUACIÓN
@@ -215,9 +223,9 @@ print(f"   MAE:  ${test_mae:,.2f}")
 print(f"   RMSE: ${test_rmse:,.2f}")
 print(f"   R²:   {test_r2:.4f}")
 
-# Cross-validation
-cv_scores = cross_val_score(best_model, X_train, y_train, cv=5, scoring='r2')
-print(f"\n📊 CROSS-VALIDATION (5-fold):")
+# Cross-validation de la búsqueda (sin volver a entrenar los 5 folds)
+cv_scores = np.array(search['best_cv_scores'])
+print(f"\n📊 CROSS-VALIDATION (5-fold, {search['best_n_samples']} filas por fold):")
 print(f"   R² promedio: {cv_scores.mean():.4f} ± {cv_scores.std():.4f}")
 
 # Análisis de errores
@@ -230,7 +238,7 @@ print(f"   < $10k: {(errors < 10000).sum()/len(errors)*100:.1f}%")
 # Feature importance
 importances = pd.DataFrame({
     'feature': features,
-    'importance': best_model.feature_importances_
+    'importance': feature_importances(best_model, X_test, y_test)
 }).sort_values('importance', ascending=False)
 
 print(f"\n📊 IMPORTANCIA DE FEATURES:")
@@ -263,19 +271,8 @@ print("\n" + "="*80)
 print("GUARDANDO MODELO DEFINITIVO")
 print("="*80)
 
-model_dir = os.path.join(os.path.dirname(__file__), '..', 'apps', 'predictor', 'ml')
 os.makedirs(model_dir, exist_ok=True)
 
-# Modelo
-with open(os.path.join(model_dir, 'model.pkl'), 'wb') as f:
-    pickle.dump(best_model, f)
-print("✅ model.pkl")
-
-# Encoders
-with open(os.path.join(model_dir, 'encoders.pkl'), 'wb') as f:
-    pickle.dump(encoders, f)
-print("✅ encoders.pkl")
-
 # Métricas
 metrics = {
     'train_mae': train_mae,
@@ -286,15 +283,26 @@ metrics = {
     'test_r2': test_r2,
     'cv_r2_mean': cv_scores.mean(),
     'cv_r2_std': cv_scores.std(),
-    'best_params': grid_search.best_params_,
+    'model_backend': MODEL_BACKEND,
+    'best_params': search['best_params'],
+    'search': search,
+    **full_rebuild_metadata(watermark, best_model),
     'feature_importance': importances.to_dict(),
     'total_records': len(df),
+    # Filtros de este entrenamiento: 05_reentrenar_incremental.py recorta igual los autos nuevos
+    'filters': {'price_min': 3000, 'price_max': 100000, 'year_min': 1995, 'year_max': año_actual,
+                'iqr_factor': 1.5, 'min_category_count': 5},
+    'price_bounds': {'min': float(max(3000, limite_inferior)), 'max': float(min(100000, limite_superior))},
+    'price_range': {
+        'min': float(df['price'].min()),
+        'max': float(df['price'].max()),
+    },
     'features_used': features
 }
 
-with open(os.path.join(model_dir, 'metrics.pkl'), 'wb') as f:
-    pickle.dump(metrics, f)
-print("✅ metrics.pkl")
+# model.pkl, encoders.pkl, metrics.pkl, features.pkl y el bundle mmap forest/ como nueva versión
+version = publish_artifacts(model_dir, best_model, encoders, metrics, features=features_pipeline)
+print(f"✅ Versión {version} publicada (manifest.json actualizado)")
 
 # ============================================================================
 # RESUMEN FINAL
@@ -312,7 +320,7 @@ RESULTADOS:
 - Precisión < $5k: {(errors < 5000).sum()/len(errors)*100:.1f}%
 
 MEJORES PARÁMETROS:
-{chr(10).join([f"- {k}: {v}" for k, v in grid_search.best_params_.items()])}
+{chr(10).join([f"- {k}: {v}" for k, v in search['best_params'].items()])}
 
 FEATURES MÁS IMPORTANTES:
 {importances.head(5).to_string(index=False)}
@@ -107,7 +107,18 @@ echo "EJECUTANDO REENTRENAMIENTO DEL MODELO"
 echo "========================================================================"
 echo ""
 
-python3 notebooks/03_entrenar_modelo_mejorado.py
+# La búsqueda de hiperparámetros se corta al agotar el presupuesto (segundos)
+export TRAIN_BUDGET_SECONDS=${TRAIN_BUDGET_SECONDS:-600}
+echo "Presupuesto de entrenamiento: ${TRAIN_BUDGET_SECONDS} segundos"
+echo ""
+
+# --incremental: solo los autos nuevos desde la marca de agua del modelo activo
+# (el script decide si hace falta una reconstrucción completa)
+if [ "$1" == "--incremental" ]; then
+    python3 notebooks/05_reentrenar_incremental.py
+else
+    python3 notebooks/03_entrenar_modelo_mejorado.py
+fi
 
 if [ $? -eq 0 ]; then
     echo ""
@@ -116,8 +127,9 @@ if [ $? -eq 0 ]; then
     echo "========================================================================"
     echo "PRÓXIMOS PASOS:"
     echo "========================================================================"
-    echo "1. Reinicia el servidor Django:"
-    echo "   python manage.py runserver"
+    echo "1. No hace falta reiniciar el servidor: los workers detectan la nueva"
+    echo "   versión en manifest.json (cada PREDICTOR_RELOAD_INTERVAL segundos)"
+    echo "   y la cargan en segundo plano"
     echo ""
     echo "2. Prueba una predicción en:"
     echo "   http://localhost:5173/predictor"
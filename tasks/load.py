@@ -1,10 +1,15 @@
 import pandas as pd
 import os
+import sys
 
 from prefect import task
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'car_price_predictor'))
+from apps.cars.history import upsert_cars
+from apps.cars.partitions import ensure_partitions
+
 load_dotenv()
 # Datos conexión
 usuario = os.getenv("DB_USER")
@@ -25,20 +30,24 @@ def load(data_df):
         f"postgresql+psycopg2://{usuario}:{password}@{host}:{puerto}/{base_datos}"
     )
 
-    columnas = ['codigo','titulo','link','etiqueta','imagen','combustible','ubicacion','precio','marca','anio','anunciante','categoria','subcategoria','transmision','combustible','tag','slug']
     # Crear un DataFrame de pandas
     df = data_df.copy()
     print("DataFrame creado")
     print(df.head())
-    #agregar columna de fecha de carga
-    df['fecha'] = pd.Timestamp.now()
-    # Cargar el DataFrame en la tabla de la base de datos
-    df.to_sql('tbl_auto_raw_taller', engine, if_exists='replace', index=False)
-    print("Datos cargados correctamente en la base de datos.")
-    resultado = len(df)
+    # Upsert por id (antes to_sql con if_exists='replace' borraba la tabla y el
+    # historial de precios); los cambios de precio quedan en car_price_history
+    conexion = engine.raw_connection()
+    ahora = pd.Timestamp.now(tz='UTC')
+    try:
+        ensure_partitions(conexion, ahora)
+        totales = upsert_cars(conexion, df, now=ahora)
+        conexion.commit()
+    finally:
+        conexion.close()
+    print(f"Datos cargados correctamente en la base de datos: {totales}")
+    resultado = totales['inserted'] + totales['updated']
 
     #cerrar la conexión
     engine.dispose()    
     
     return resultado
-    
\ No newline at end of file